@@ -0,0 +1,99 @@
+"""partition events by month
+
+Adds events.numeric_object_id (object_id as an integer) with an index for the lookups of
+recent objects, and on PostgreSQL 11 or later turns events into a table partitioned by month
+of created_at. The numeric_object_id of existing events is filled in afterwards, in batches,
+by the backfill_event_object_ids job, rather than rewriting the whole table here. The existing events become the events_legacy partition, which holds
+everything up to the end of the current month, so no events are copied. The partitions of
+the following months are created ahead of time by the cleanup_events job.
+
+Revision ID: 3c1a6f9e2b47
+Revises: 89bc7873a3e0
+Create Date: 2026-10-15 18:20:03.481264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3c1a6f9e2b47"
+down_revision = "89bc7873a3e0"
+branch_labels = None
+depends_on = None
+
+
+def supports_partitioning():
+    return op.get_bind().dialect.server_version_info >= (11,)
+
+
+def upgrade():
+    op.add_column(
+        "events", sa.Column("numeric_object_id", sa.BigInteger(), nullable=True)
+    )
+
+    if supports_partitioning():
+        op.execute("UPDATE events SET created_at = now() WHERE created_at IS NULL")
+        op.execute("ALTER TABLE events ALTER COLUMN created_at SET NOT NULL")
+        op.execute("ALTER TABLE events RENAME TO events_legacy")
+        op.execute(
+            "ALTER TABLE events_legacy RENAME CONSTRAINT events_pkey TO events_legacy_pkey"
+        )
+        op.execute(
+            """
+            CREATE TABLE events (LIKE events_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (created_at)
+            """
+        )
+        op.execute("ALTER TABLE events ADD PRIMARY KEY (id, created_at)")
+        op.execute(
+            "ALTER TABLE events ADD FOREIGN KEY (org_id) REFERENCES organizations (id)"
+        )
+        op.execute("ALTER TABLE events ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+        op.execute("ALTER SEQUENCE events_id_seq OWNED BY events.id")
+        op.execute(
+            """
+            DO $$
+            DECLARE legacy_end timestamptz;
+            BEGIN
+                SELECT greatest(
+                    date_trunc('month', now()),
+                    date_trunc('month', max(created_at))
+                ) + interval '1 month'
+                INTO legacy_end FROM events_legacy;
+
+                EXECUTE format(
+                    'ALTER TABLE events ATTACH PARTITION events_legacy '
+                    'FOR VALUES FROM (MINVALUE) TO (%L)',
+                    legacy_end
+                );
+            END
+            $$
+            """
+        )
+        op.execute("CREATE TABLE events_default PARTITION OF events DEFAULT")
+
+    op.create_index(
+        "events_object_type_created_at_numeric_object_id",
+        "events",
+        ["object_type", "created_at", "numeric_object_id"],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "events_object_type_created_at_numeric_object_id", table_name="events"
+    )
+
+    if supports_partitioning():
+        op.execute("ALTER TABLE events DETACH PARTITION events_legacy")
+        op.execute("INSERT INTO events_legacy SELECT * FROM events")
+        op.execute("ALTER SEQUENCE events_id_seq OWNED BY events_legacy.id")
+        op.execute("DROP TABLE events CASCADE")
+        op.execute("ALTER TABLE events_legacy RENAME TO events")
+        op.execute(
+            "ALTER TABLE events RENAME CONSTRAINT events_legacy_pkey TO events_pkey"
+        )
+        op.execute("ALTER TABLE events ALTER COLUMN created_at DROP NOT NULL")
+
+    op.drop_column("events", "numeric_object_id")
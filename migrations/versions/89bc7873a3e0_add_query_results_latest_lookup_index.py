@@ -0,0 +1,31 @@
+"""add query results latest lookup index
+
+Revision ID: 89bc7873a3e0
+Revises: e5c7a4e2df4d
+Create Date: 2026-10-15 09:12:41.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "89bc7873a3e0"
+down_revision = "e5c7a4e2df4d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "query_results_data_source_id_query_hash_retrieved_at",
+        "query_results",
+        ["data_source_id", "query_hash", sa.text("retrieved_at DESC")],
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "query_results_data_source_id_query_hash_retrieved_at",
+        table_name="query_results",
+    )
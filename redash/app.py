@@ -30,6 +30,7 @@ def create_app():
         limiter,
         mail,
         migrate,
+        permissions,
         security,
         tasks,
     )
@@ -47,6 +48,7 @@ def create_app():
 
     security.init_app(app)
     request_metrics.init_app(app)
+    permissions.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
@@ -10,7 +10,7 @@ from redash import models, settings
 from redash.authentication import jwt_auth
 from redash.authentication.org_resolving import current_org
 from redash.settings.organization import settings as org_settings
-from redash.tasks import record_event
+from redash.tasks import enqueue_event
 from sqlalchemy.orm.exc import NoResultFound
 from werkzeug.exceptions import Unauthorized
 
@@ -210,7 +210,7 @@ def log_user_logged_in(app, user):
         "ip": request.remote_addr,
     }
 
-    record_event.delay(event)
+    enqueue_event(event)
 
 
 @login_manager.unauthorized_handler
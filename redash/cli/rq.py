@@ -4,7 +4,7 @@ import sys
 import datetime
 from itertools import chain
 
-from click import argument
+from click import argument, option
 from flask.cli import AppGroup
 from rq import Connection
 from rq.worker import WorkerStatus
@@ -15,6 +15,7 @@ from supervisor_checks.check_modules import base
 from redash import rq_redis_connection
 from redash.tasks import (
     Worker,
+    NonForkingWorker,
     rq_scheduler,
     schedule_periodic_jobs,
     periodic_job_definitions,
@@ -33,7 +34,13 @@ def scheduler():
 
 @manager.command()
 @argument("queues", nargs=-1)
-def worker(queues):
+@option(
+    "--fork/--no-fork",
+    default=True,
+    help="Execute every job in a forked work horse (default) or in the worker process "
+    "itself, reusing its database connections and query runners across jobs.",
+)
+def worker(queues, fork):
     # Configure any SQLAlchemy mappers loaded until now so that the mapping configuration
     # will already be available to the forked work horses and they won't need
     # to spend valuable time re-doing that on every fork.
@@ -44,8 +51,10 @@ def worker(queues):
     else:
         queues = chain(*[queue.split(",") for queue in queues])
 
+    worker_class = Worker if fork else NonForkingWorker
+
     with Connection(rq_redis_connection):
-        w = Worker(queues, log_job_description=False, job_monitoring_interval=5)
+        w = worker_class(queues, log_job_description=False, job_monitoring_interval=5)
         w.work()
 
 
@@ -2,7 +2,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-__all__ = ["BaseDestination", "register", "get_destination", "import_destinations"]
+__all__ = [
+    "BaseDestination",
+    "DeliveryError",
+    "register",
+    "get_destination",
+    "import_destinations",
+]
+
+
+class DeliveryError(Exception):
+    pass
 
 
 class BaseDestination(object):
@@ -1,7 +1,7 @@
 import logging
-import requests
 
 from redash.destinations import *
+from redash.utils.requests_session import requests_session
 
 
 class ChatWork(BaseDestination):
@@ -61,16 +61,19 @@ class ChatWork(BaseDestination):
             headers = {"X-ChatWorkToken": options.get("api_token")}
             payload = {"body": message}
 
-            resp = requests.post(url, headers=headers, data=payload, timeout=5.0)
+            resp = requests_session.post(
+                url, headers=headers, data=payload, timeout=5.0
+            )
             logging.warning(resp.text)
             if resp.status_code != 200:
-                logging.error(
+                raise DeliveryError(
                     "ChatWork send ERROR. status_code => {status}".format(
                         status=resp.status_code
                     )
                 )
         except Exception:
             logging.exception("ChatWork send ERROR.")
+            raise
 
 
 register(ChatWork)
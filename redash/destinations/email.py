@@ -59,6 +59,7 @@ class Email(BaseDestination):
             mail.send(message)
         except Exception:
             logging.exception("Mail send error.")
+            raise
 
 
 register(Email)
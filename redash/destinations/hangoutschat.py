@@ -1,7 +1,7 @@
 import logging
-import requests
 
 from redash.destinations import *
+from redash.utils.requests_session import requests_session
 from redash.utils import json_dumps
 
 
@@ -92,17 +92,18 @@ class HangoutsChat(BaseDestination):
                 )
 
             headers = {"Content-Type": "application/json; charset=UTF-8"}
-            resp = requests.post(
+            resp = requests_session.post(
                 options.get("url"), data=json_dumps(data), headers=headers, timeout=5.0
             )
             if resp.status_code != 200:
-                logging.error(
+                raise DeliveryError(
                     "webhook send ERROR. status_code => {status}".format(
                         status=resp.status_code
                     )
                 )
         except Exception:
             logging.exception("webhook send ERROR.")
+            raise
 
 
 register(HangoutsChat)
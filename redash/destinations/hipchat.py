@@ -1,7 +1,7 @@
 import logging
-import requests
 
 from redash.destinations import *
+from redash.utils.requests_session import requests_session
 from redash.models import Alert
 from redash.utils import json_dumps, deprecated
 
@@ -46,16 +46,17 @@ class HipChat(BaseDestination):
 
             data = {"message": message, "color": colors.get(new_state, "green")}
             headers = {"Content-Type": "application/json"}
-            response = requests.post(
+            response = requests_session.post(
                 options["url"], data=json_dumps(data), headers=headers, timeout=5.0
             )
 
             if response.status_code != 204:
-                logging.error(
-                    "Bad status code received from HipChat: %d", response.status_code
+                raise DeliveryError(
+                    "Bad status code received from HipChat: %d" % response.status_code
                 )
         except Exception:
             logging.exception("HipChat Send ERROR.")
+            raise
 
 
 register(HipChat)
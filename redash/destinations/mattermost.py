@@ -1,7 +1,7 @@
 import logging
-import requests
 
 from redash.destinations import *
+from redash.utils.requests_session import requests_session
 from redash.utils import json_dumps
 
 
@@ -44,19 +44,20 @@ class Mattermost(BaseDestination):
             payload["channel"] = options.get("channel")
 
         try:
-            resp = requests.post(
+            resp = requests_session.post(
                 options.get("url"), data=json_dumps(payload), timeout=5.0
             )
             logging.warning(resp.text)
 
             if resp.status_code != 200:
-                logging.error(
+                raise DeliveryError(
                     "Mattermost webhook send ERROR. status_code => {status}".format(
                         status=resp.status_code
                     )
                 )
         except Exception:
             logging.exception("Mattermost webhook send ERROR.")
+            raise
 
 
 register(Mattermost)
@@ -78,6 +78,7 @@ class PagerDuty(BaseDestination):
 
         except Exception:
             logging.exception("PagerDuty trigger failed!")
+            raise
 
 
 register(PagerDuty)
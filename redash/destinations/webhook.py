@@ -1,8 +1,8 @@
 import logging
-import requests
 from requests.auth import HTTPBasicAuth
 
 from redash.destinations import *
+from redash.utils.requests_session import requests_session
 from redash.utils import json_dumps
 from redash.serializers import serialize_alert
 
@@ -42,7 +42,7 @@ class Webhook(BaseDestination):
                 if options.get("username")
                 else None
             )
-            resp = requests.post(
+            resp = requests_session.post(
                 options.get("url"),
                 data=json_dumps(data),
                 auth=auth,
@@ -50,13 +50,14 @@ class Webhook(BaseDestination):
                 timeout=5.0,
             )
             if resp.status_code != 200:
-                logging.error(
+                raise DeliveryError(
                     "webhook send ERROR. status_code => {status}".format(
                         status=resp.status_code
                     )
                 )
         except Exception:
             logging.exception("webhook send ERROR.")
+            raise
 
 
 register(Webhook)
@@ -8,7 +8,7 @@ from flask_restful import Resource, abort
 from redash import settings
 from redash.authentication import current_org
 from redash.models import db
-from redash.tasks import record_event as record_event_task
+from redash.tasks import enqueue_event
 from redash.utils import json_dumps
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy import cast
@@ -60,7 +60,7 @@ def record_event(org, user, options):
     if "timestamp" not in options:
         options["timestamp"] = int(time.time())
 
-    record_event_task.delay(options)
+    enqueue_event(options)
 
 
 def require_fields(req, fields):
@@ -1,4 +1,4 @@
-from flask import request, url_for
+from flask import current_app, request, url_for
 from funcy import project, partial
 
 from flask_restful import abort
@@ -21,6 +21,7 @@ from redash.serializers import (
     DashboardSerializer,
     public_dashboard,
 )
+from redash.utils import json_dumps
 from sqlalchemy.orm.exc import StaleDataError
 
 
@@ -266,14 +267,35 @@ class PublicDashboardResource(BaseResource):
 
         :param token: An API key for a public dashboard.
         :>json array widgets: An array of arrays of :ref:`public widgets <public-widget-label>`, corresponding to the rows and columns the widgets are displayed in
+
+        Responses carry an ETag; requests with a matching `If-None-Match` header get a 304.
         """
         if not isinstance(self.current_user, models.ApiUser):
             api_key = get_object_or_404(models.ApiKey.get_by_api_key, token)
-            dashboard = api_key.object
+            dashboard_id = api_key.object_id
         else:
-            dashboard = self.current_user.object
+            dashboard_id = self.current_user.object.id
+
+        snapshots = models.public_dashboard_snapshots
+        snapshot = snapshots.get(dashboard_id)
+        if snapshot is None:
+            clock = snapshots.clock()
+            dashboard = get_object_or_404(models.Dashboard.query.get, dashboard_id)
+            payload = public_dashboard(dashboard)
+            query_ids = [
+                w["visualization"]["query"]["id"]
+                for w in payload["widgets"]
+                if "visualization" in w
+            ]
+            snapshot = snapshots.set(
+                dashboard_id, json_dumps(payload), query_ids, clock
+            )
 
-        return public_dashboard(dashboard)
+        response = current_app.response_class(
+            snapshot["payload"], mimetype="application/json"
+        )
+        response.set_etag(snapshot["etag"])
+        return response.make_conditional(request)
 
 
 class DashboardShareResource(BaseResource):
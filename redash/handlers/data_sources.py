@@ -121,6 +121,9 @@ class DataSourceListResource(BaseResource):
                 self.current_org, group_ids=self.current_user.group_ids
             )
 
+        data_sources = data_sources.all()
+        groups = models.DataSource.groups_for(set(ds.id for ds in data_sources))
+
         response = {}
         for ds in data_sources:
             if ds.id in response:
@@ -129,7 +132,7 @@ class DataSourceListResource(BaseResource):
             try:
                 d = ds.to_dict()
                 d["view_only"] = all(
-                    project(ds.groups, self.current_user.group_ids).values()
+                    project(groups[ds.id], self.current_user.group_ids).values()
                 )
                 response[ds.id] = d
             except AttributeError:
@@ -1,12 +1,13 @@
+import hashlib
 import logging
 import time
 
 import unicodedata
-from flask import make_response, request
+from flask import Response, make_response, request, stream_with_context
 from flask_login import current_user
 from flask_restful import abort
 from werkzeug.urls import url_quote
-from redash import models, settings
+from redash import __version__, models, settings
 from redash.handlers.base import BaseResource, get_object_or_404, record_event
 from redash.permissions import (
     has_access,
@@ -21,7 +22,7 @@ from redash.tasks.queries import enqueue_query
 from redash.utils import (
     collect_parameters_from_request,
     gen_query_hash,
-    json_dumps,
+    result_rows,
     utcnow,
     to_filename,
 )
@@ -33,7 +34,8 @@ from redash.models.parameterized_query import (
 )
 from redash.serializers import (
     serialize_query_result,
-    serialize_query_result_to_dsv,
+    serialize_query_result_to_dsv_stream,
+    serialize_query_result_to_json,
     serialize_query_result_to_xlsx,
     serialize_job,
 )
@@ -123,6 +125,35 @@ def run_query(query, parameters, data_source, query_id, max_age=0):
         return serialize_job(job)
 
 
+def get_rows_page(args):
+    offset = args.get("offset")
+    limit = args.get("limit")
+
+    try:
+        offset = int(offset) if offset is not None else None
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        abort(400, message="offset and limit must be integers.")
+
+    if (offset is not None and offset < 0) or (limit is not None and limit < 0):
+        abort(400, message="offset and limit can't be negative.")
+
+    return offset, limit
+
+
+def get_row_format(args):
+    row_format = args.get("row_format", result_rows.OBJECTS)
+    if row_format not in result_rows.ROW_FORMATS:
+        abort(
+            400,
+            message="row_format must be one of: {}.".format(
+                ", ".join(result_rows.ROW_FORMATS)
+            ),
+        )
+
+    return row_format
+
+
 def get_download_filename(query_result, query, filetype):
     retrieved_at = query_result.retrieved_at.strftime("%Y_%m_%d")
     if query:
@@ -132,6 +163,17 @@ def get_download_filename(query_result, query, filetype):
     return "{}_{}.{}".format(filename, retrieved_at, filetype)
 
 
+def get_query_result_etag(
+    query_result, filetype, offset=None, limit=None, row_format=result_rows.OBJECTS
+):
+    # results never change once stored, so their id (along with the requested format and page)
+    # identifies the response; the version covers changes to how results are serialized
+    key = "{}:{}:{}:{}:{}:{}".format(
+        __version__, query_result.id, filetype, offset, limit, row_format
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
 def content_disposition_filenames(attachment_filename):
     if not isinstance(attachment_filename, str):
         attachment_filename = attachment_filename.decode("utf-8")
@@ -314,6 +356,15 @@ class QueryResultResource(BaseResource):
         :param number query_id: The ID of the query whose results should be fetched
         :param number query_result_id: the ID of the query result to fetch
         :param string filetype: Format to return. One of 'json', 'xlsx', or 'csv'. Defaults to 'json'.
+        :qparam number offset: Return rows starting at this offset (JSON only)
+        :qparam number limit: Return at most this many rows (JSON only); pages of rows also
+            include the result's total number of rows as `data.row_count`
+        :qparam string row_format: `objects` (the default) for rows as objects keyed by column
+            name, or `arrays` for rows as arrays of values ordered like the columns, which
+            makes the response considerably smaller (JSON only)
+
+        Responses carry an ETag; requests with a matching `If-None-Match` header get a 304
+        without the result being loaded.
 
         :<json number id: Query result ID
         :<json string query: Query that produced this result
@@ -331,13 +382,18 @@ class QueryResultResource(BaseResource):
 
         parameter_values = collect_parameters_from_request(request.args)
         max_age = int(request.args.get("maxAge", 0))
+        offset, limit = get_rows_page(request.args)
+        row_format = get_row_format(request.args)
 
         query_result = None
         query = None
 
         if query_result_id:
             query_result = get_object_or_404(
-                models.QueryResult.get_by_id_and_org, query_result_id, self.current_org
+                models.QueryResult.get_by_id_and_org,
+                query_result_id,
+                self.current_org,
+                defer_data=True,
             )
 
         if query_id is not None:
@@ -354,6 +410,7 @@ class QueryResultResource(BaseResource):
                     models.QueryResult.get_by_id_and_org,
                     query.latest_query_data_id,
                     self.current_org,
+                    defer_data=True,
                 )
 
             if (
@@ -387,13 +444,25 @@ class QueryResultResource(BaseResource):
 
                 self.record_event(event)
 
-            response_builders = {
-                'json': self.make_json_response,
-                'xlsx': self.make_excel_response,
-                'csv': self.make_csv_response,
-                'tsv': self.make_tsv_response
-            }
-            response = response_builders[filetype](query_result)
+            etag = get_query_result_etag(
+                query_result, filetype, offset, limit, row_format
+            )
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            elif filetype == "json":
+                response = self.make_json_response(
+                    query_result, offset, limit, row_format
+                )
+            else:
+                response_builders = {
+                    'xlsx': self.make_excel_response,
+                    'csv': self.make_csv_response,
+                    'tsv': self.make_tsv_response
+                }
+                response = response_builders[filetype](query_result)
+
+            response.set_etag(etag)
 
             if len(settings.ACCESS_CONTROL_ALLOW_ORIGIN) > 0:
                 self.add_cors_headers(response.headers)
@@ -414,20 +483,30 @@ class QueryResultResource(BaseResource):
             abort(404, message="No cached result found for this query.")
 
     @staticmethod
-    def make_json_response(query_result):
-        data = json_dumps({"query_result": query_result.to_dict()})
+    def make_json_response(
+        query_result, offset=None, limit=None, row_format=result_rows.OBJECTS
+    ):
+        data = serialize_query_result_to_json(query_result, offset, limit, row_format)
         headers = {"Content-Type": "application/json"}
         return make_response(data, 200, headers)
 
     @staticmethod
     def make_csv_response(query_result):
         headers = {"Content-Type": "text/csv; charset=UTF-8"}
-        return make_response(serialize_query_result_to_dsv(query_result, ","), 200, headers)
+        return Response(
+            stream_with_context(serialize_query_result_to_dsv_stream(query_result, ",")),
+            200,
+            headers,
+        )
 
     @staticmethod
     def make_tsv_response(query_result):
         headers = {"Content-Type": "text/tab-separated-values; charset=UTF-8"}
-        return make_response(serialize_query_result_to_dsv(query_result, "\t"), 200, headers)
+        return Response(
+            stream_with_context(serialize_query_result_to_dsv_stream(query_result, "\t")),
+            200,
+            headers,
+        )
 
     @staticmethod
     def make_excel_response(query_result):
@@ -20,10 +20,13 @@ def calculate_metrics(response):
     request_duration = (time.time() - g.start_time) * 1000
     queries_duration = g.get("queries_duration", 0.0)
     queries_count = g.get("queries_count", 0.0)
+    permission_cache_hits = g.get("permission_cache_hits", 0)
+    permission_cache_misses = g.get("permission_cache_misses", 0)
     endpoint = (request.endpoint or "unknown").replace(".", "_")
 
     metrics_logger.info(
-        "method=%s path=%s endpoint=%s status=%d content_type=%s content_length=%d duration=%.2f query_count=%d query_duration=%.2f",
+        "method=%s path=%s endpoint=%s status=%d content_type=%s content_length=%d duration=%.2f query_count=%d query_duration=%.2f "
+        "permission_cache_hits=%d permission_cache_misses=%d",
         request.method,
         request.path,
         endpoint,
@@ -33,6 +36,8 @@ def calculate_metrics(response):
         request_duration,
         queries_count,
         queries_duration,
+        permission_cache_hits,
+        permission_cache_misses,
     )
 
     statsd_client.timing(
@@ -1,15 +1,28 @@
 import datetime
 import calendar
+import hashlib
 import logging
 import time
 import numbers
+import re
 import pytz
+import redis
+import dateutil.parser
 
 from sqlalchemy import distinct, or_, and_, UniqueConstraint
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm import backref, contains_eager, joinedload, subqueryload, load_only
+from sqlalchemy.orm import (
+    backref,
+    contains_eager,
+    defer,
+    joinedload,
+    subqueryload,
+    load_only,
+    object_session,
+    validates,
+)
 from sqlalchemy.orm.exc import NoResultFound  # noqa: F401
 from sqlalchemy import func
 from sqlalchemy_utils import generic_relationship
@@ -17,7 +30,7 @@ from sqlalchemy_utils.types import TSVectorType
 from sqlalchemy_utils.models import generic_repr
 from sqlalchemy_utils.types.encrypted.encrypted_type import FernetEngine
 
-from redash import redis_connection, utils, settings
+from redash import redis_connection, statsd_client, utils, settings
 from redash.destinations import (
     get_configuration_schema_for_destination_type,
     get_destination,
@@ -39,8 +52,11 @@ from redash.utils import (
     base_url,
     sentry,
 )
+from redash.utils import columnar, result_rows
 from redash.utils.configuration import ConfigurationContainer
+from redash.utils.incremental_json import StoredResultReader
 from redash.models.parameterized_query import ParameterizedQuery
+from redash.permissions import data_source_permissions
 
 from .base import db, gfk_type, Column, GFKBase, SearchBaseQuery, key_type, primary_key
 from .changes import ChangeTrackingMixin, Change  # noqa
@@ -65,11 +81,19 @@ class ScheduledQueriesExecutions(object):
     def __init__(self):
         self.executions = {}
 
-    def refresh(self):
-        self.executions = redis_connection.hgetall(self.KEY_NAME)
+    def refresh(self, query_ids=None):
+        if query_ids is None:
+            self.executions = redis_connection.hgetall(self.KEY_NAME)
+        elif query_ids:
+            query_ids = [str(query_id) for query_id in query_ids]
+            timestamps = redis_connection.hmget(self.KEY_NAME, query_ids)
+            self.executions = dict(zip(query_ids, timestamps))
+        else:
+            self.executions = {}
 
     def update(self, query_id):
         redis_connection.hmset(self.KEY_NAME, {query_id: time.time()})
+        scheduled_queries_index.invalidate(query_id)
 
     def get(self, query_id):
         timestamp = self.executions.get(str(query_id))
@@ -82,6 +106,255 @@ class ScheduledQueriesExecutions(object):
 scheduled_queries_executions = ScheduledQueriesExecutions()
 
 
+class ScheduledQueriesIndex(object):
+    """Sorted set of scheduled query ids scored by the time they are due to run next, so
+    `Query.outdated_queries` only has to evaluate the queries that might be outdated.
+
+    Queries are invalidated once a change to their schedule, failure count or latest result
+    commits and whenever they are executed. Invalidated ids are kept in a separate set that is
+    drained on every evaluation, so they can't be lost to a concurrent `update`."""
+
+    KEY_NAME = "sq:next_run_at"
+    INVALIDATED_KEY_NAME = "sq:invalidated"
+    # Scheduled queries missing from the index (e.g. created before it existed) are added
+    # back at most this often.
+    RECONCILED_KEY_NAME = "sq:next_run_at:reconciled"
+    RECONCILE_INTERVAL = 3600
+
+    def needs_reconcile(self):
+        return not redis_connection.exists(self.RECONCILED_KEY_NAME)
+
+    def reconcile(self, query_ids):
+        pipe = redis_connection.pipeline()
+        if query_ids:
+            pipe.zadd(self.KEY_NAME, {query_id: 0 for query_id in query_ids}, nx=True)
+        pipe.set(self.RECONCILED_KEY_NAME, time.time(), ex=self.RECONCILE_INTERVAL)
+        pipe.execute()
+
+    def invalidate(self, *query_ids):
+        if query_ids:
+            redis_connection.sadd(self.INVALIDATED_KEY_NAME, *query_ids)
+
+    def due(self, now):
+        """Returns the ids of queries that are due at `now` or were invalidated."""
+        pipe = redis_connection.pipeline()
+        pipe.smembers(self.INVALIDATED_KEY_NAME)
+        pipe.delete(self.INVALIDATED_KEY_NAME)
+        pipe.zrangebyscore(self.KEY_NAME, "-inf", now.timestamp())
+        invalidated, _, due = pipe.execute()
+        return sorted(set(int(query_id) for query_id in invalidated.union(due)))
+
+    def update(self, next_runs, removed=()):
+        """Sets the next run time (a datetime, or None for never) of the given query ids
+        and removes the `removed` ids from the index."""
+        pipe = redis_connection.pipeline()
+        if next_runs:
+            pipe.zadd(
+                self.KEY_NAME,
+                {
+                    query_id: "+inf" if next_run is None else next_run.timestamp()
+                    for query_id, next_run in next_runs.items()
+                },
+            )
+        if removed:
+            pipe.zrem(self.KEY_NAME, *removed)
+        pipe.execute()
+
+
+scheduled_queries_index = ScheduledQueriesIndex()
+
+
+class LatestQueryResults(object):
+    """Keeps the id and retrieval time of the latest result of every (data source, query hash)
+    in Redis, in front of `QueryResult.get_latest`."""
+
+    KEY_PREFIX = "query_result:latest"
+
+    def _key(self, data_source_id, query_hash):
+        return "{}:{}:{}".format(self.KEY_PREFIX, data_source_id, query_hash)
+
+    @property
+    def enabled(self):
+        return settings.QUERY_RESULTS_LATEST_CACHE_TTL > 0
+
+    def get(self, data_source_id, query_hash):
+        value = redis_connection.get(self._key(data_source_id, query_hash))
+        if value is None:
+            return None
+
+        query_result_id, timestamp = value.split(":")
+        return int(query_result_id), utils.dt_from_timestamp(timestamp)
+
+    # Doesn't replace a cached result with an older one, so a lookup that read the database
+    # before a new result was committed can't cache the result it replaced.
+    _set_script = redis_connection.register_script(
+        """
+        local cached = redis.call('GET', KEYS[1])
+        if cached and tonumber(string.match(cached, ':(.*)$')) > tonumber(ARGV[2]) then
+            return 0
+        end
+        redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'EX', ARGV[3])
+        return 1
+        """
+    )
+
+    def set(self, data_source_id, query_hash, query_result_id, retrieved_at):
+        self._set_script(
+            keys=[self._key(data_source_id, query_hash)],
+            args=[
+                query_result_id,
+                retrieved_at.timestamp(),
+                settings.QUERY_RESULTS_LATEST_CACHE_TTL,
+            ],
+        )
+
+    def invalidate(self, data_source_id, query_hash):
+        redis_connection.delete(self._key(data_source_id, query_hash))
+
+
+latest_query_results = LatestQueryResults()
+
+
+class QueryResultRowIndexes(object):
+    """Keeps the row index (see `StoredResultReader.row_index`) of query results stored as
+    JSON in Redis, so their row count and the pages of their rows are read without walking
+    all the rows before them. Stored results don't change, so the indexes only expire."""
+
+    KEY_PREFIX = "query_result:row_index"
+    # rows between indexed rows
+    STEP = 1000
+    TTL = 3600
+
+    def _key(self, query_result_id):
+        return "{}:{}".format(self.KEY_PREFIX, query_result_id)
+
+    def get(self, query_result_id):
+        value = redis_connection.get(self._key(query_result_id))
+        return None if value is None else json_loads(value)
+
+    def set(self, query_result_id, row_index):
+        redis_connection.set(
+            self._key(query_result_id), json_dumps(row_index), ex=self.TTL
+        )
+
+    def delete(self, query_result_id):
+        redis_connection.delete(self._key(query_result_id))
+
+
+query_result_row_indexes = QueryResultRowIndexes()
+
+
+class PublicDashboardSnapshots(object):
+    """
+    Keeps the serialized payload of public dashboards in Redis, until the dashboard or
+    anything shown on it (widgets, visualizations, queries and their latest results) changes.
+
+    Changes are applied once their transaction commits. Every invalidation ticks a clock, so
+    a snapshot built while a change was being committed is not stored.
+    """
+
+    KEY_PREFIX = "public_dashboard"
+    # invalidation markers only need to outlive the build of a snapshot
+    MARKER_TTL = 300
+
+    def _key(self, *parts):
+        return ":".join([self.KEY_PREFIX] + [str(part) for part in parts])
+
+    @property
+    def enabled(self):
+        return settings.PUBLIC_DASHBOARD_SNAPSHOT_TTL > 0
+
+    def clock(self):
+        if not self.enabled:
+            return 0
+        return int(redis_connection.get(self._key("clock")) or 0)
+
+    def get(self, dashboard_id):
+        """Returns the dashboard's snapshot (a dict with its `payload` and `etag`) or None."""
+        if not self.enabled:
+            return None
+        return redis_connection.hgetall(self._key(dashboard_id)) or None
+
+    def set(self, dashboard_id, payload, query_ids, clock):
+        """Stores the payload of a dashboard, built after `clock` was read, and returns its
+        snapshot."""
+        snapshot = {"payload": payload, "etag": hashlib.md5(payload.encode()).hexdigest()}
+        if not self.enabled:
+            return snapshot
+
+        query_ids = set(query_ids)
+        markers = [self._key("invalidated", "dashboard", dashboard_id)] + [
+            self._key("invalidated", "query", query_id) for query_id in query_ids
+        ]
+        ttl = settings.PUBLIC_DASHBOARD_SNAPSHOT_TTL
+
+        with redis_connection.pipeline() as pipe:
+            try:
+                pipe.watch(*markers)
+                if any(int(m) > clock for m in pipe.mget(markers) if m is not None):
+                    return snapshot
+
+                pipe.multi()
+                pipe.hmset(self._key(dashboard_id), snapshot)
+                pipe.expire(self._key(dashboard_id), ttl)
+                for query_id in query_ids:
+                    pipe.sadd(self._key("query", query_id), dashboard_id)
+                    pipe.expire(self._key("query", query_id), ttl)
+                pipe.execute()
+            except redis.WatchError:
+                pass
+
+        return snapshot
+
+    def invalidate(self, dashboard_ids=(), query_ids=()):
+        if not self.enabled or not (dashboard_ids or query_ids):
+            return
+
+        clock = redis_connection.incr(self._key("clock"))
+
+        query_ids = list(query_ids)
+        pipe = redis_connection.pipeline()
+        for query_id in query_ids:
+            pipe.smembers(self._key("query", query_id))
+        dashboard_ids = set(dashboard_ids).union(
+            *[[int(d) for d in members] for members in pipe.execute()]
+        )
+
+        pipe = redis_connection.pipeline()
+        for dashboard_id in dashboard_ids:
+            pipe.delete(self._key(dashboard_id))
+            pipe.set(
+                self._key("invalidated", "dashboard", dashboard_id),
+                clock,
+                ex=self.MARKER_TTL,
+            )
+        for query_id in query_ids:
+            pipe.set(self._key("invalidated", "query", query_id), clock, ex=self.MARKER_TTL)
+        pipe.execute()
+
+
+public_dashboard_snapshots = PublicDashboardSnapshots()
+
+
+def record_public_dashboard_change(target, dashboard_ids=(), query_ids=()):
+    """Marks the public dashboard snapshots to invalidate once the session commits."""
+    session = object_session(target)
+    if session is None:
+        return
+
+    changed_dashboard_ids, changed_query_ids = session.info.setdefault(
+        "public_dashboard_changes", (set(), set())
+    )
+    changed_dashboard_ids.update(dashboard_ids)
+    changed_query_ids.update(query_ids)
+
+
+@listens_for(db.session, "after_commit")
+def invalidate_public_dashboard_snapshots(session):
+    dashboard_ids, query_ids = session.info.pop("public_dashboard_changes", ((), ()))
+    public_dashboard_snapshots.invalidate(dashboard_ids, query_ids)
+
+
 @generic_repr("id", "name", "type", "org_id", "created_at")
 class DataSource(BelongsToOrgMixin, db.Model):
     id = primary_key("DataSource")
@@ -172,6 +445,12 @@ class DataSource(BelongsToOrgMixin, db.Model):
         return cls.query.filter(cls.id == _id).one()
 
     def delete(self):
+        # bulk updates don't trigger the mapper events that record query changes
+        query_ids = [
+            query_id
+            for (query_id,) in db.session.query(Query.id).filter(Query.data_source == self)
+        ]
+        record_public_dashboard_change(self, query_ids=query_ids)
         Query.query.filter(Query.data_source == self).update(
             dict(data_source_id=None, latest_query_data_id=None)
         )
@@ -236,15 +515,24 @@ class DataSource(BelongsToOrgMixin, db.Model):
     def resume(self):
         redis_connection.delete(self._pause_key)
 
+    def _record_permissions_change(self):
+        # The request sees its own change right away. The cache of the process is invalidated
+        # again once the change commits, so a concurrent request can't cache the groups from
+        # before the change in the meantime.
+        data_source_permissions.invalidate(self.id)
+        db.session.info.setdefault("data_source_permission_changes", set()).add(self.id)
+
     def add_group(self, group, view_only=False):
         dsg = DataSourceGroup(group=group, data_source=self, view_only=view_only)
         db.session.add(dsg)
+        self._record_permissions_change()
         return dsg
 
     def remove_group(self, group):
         DataSourceGroup.query.filter(
             DataSourceGroup.group == group, DataSourceGroup.data_source == self
         ).delete()
+        self._record_permissions_change()
         db.session.commit()
 
     def update_group_permission(self, group, view_only):
@@ -253,6 +541,7 @@ class DataSource(BelongsToOrgMixin, db.Model):
         ).one()
         dsg.view_only = view_only
         db.session.add(dsg)
+        self._record_permissions_change()
         return dsg
 
     @property
@@ -272,11 +561,31 @@ class DataSource(BelongsToOrgMixin, db.Model):
     def get_by_name(cls, name):
         return cls.query.filter(cls.name == name).one()
 
-    # XXX examine call sites to see if a regular SQLA collection would work better
+    @staticmethod
+    def _load_groups(data_source_ids):
+        groups = {data_source_id: {} for data_source_id in data_source_ids}
+        data_source_groups = DataSourceGroup.query.filter(
+            DataSourceGroup.data_source_id.in_(data_source_ids)
+        )
+        for dsg in data_source_groups:
+            groups[dsg.data_source_id][dsg.group_id] = dsg.view_only
+        return groups
+
+    @classmethod
+    def groups_for(cls, data_source_ids):
+        """Returns the `groups` of each of the given data sources, loading the ones that
+        aren't cached with a single query."""
+        return data_source_permissions.get_many(data_source_ids, cls._load_groups)
+
     @property
     def groups(self):
-        groups = DataSourceGroup.query.filter(DataSourceGroup.data_source == self)
-        return dict([(group.group_id, group.view_only) for group in groups])
+        return self.groups_for([self.id])[self.id]
+
+
+@listens_for(db.session, "after_commit")
+def invalidate_data_source_permissions(session):
+    for data_source_id in session.info.pop("data_source_permission_changes", ()):
+        data_source_permissions.invalidate(data_source_id)
 
 
 @generic_repr("id", "data_source_id", "group_id", "view_only")
@@ -293,6 +602,8 @@ class DataSourceGroup(db.Model):
 
 
 DESERIALIZED_DATA_ATTR = "_deserialized_data"
+FIRST_ROW_ATTR = "_first_row"
+ROW_INDEX_ATTR = "_row_index"
 
 
 class DBPersistence(object):
@@ -302,19 +613,200 @@ class DBPersistence(object):
             return None
 
         if not hasattr(self, DESERIALIZED_DATA_ATTR):
-            setattr(self, DESERIALIZED_DATA_ATTR, json_loads(self._data))
+            data = result_rows.convert(json_loads(self._data), result_rows.OBJECTS)
+            setattr(self, DESERIALIZED_DATA_ATTR, data)
 
         return self._deserialized_data
 
     @data.setter
     def data(self, data):
+        for attr in (DESERIALIZED_DATA_ATTR, FIRST_ROW_ATTR, ROW_INDEX_ATTR):
+            if hasattr(self, attr):
+                delattr(self, attr)
+        if getattr(self, "id", None) is not None:
+            query_result_row_indexes.delete(self.id)
+        self._data = data
+
+    @property
+    def data_json(self):
+        """The stored result as JSON text, or None when it isn't stored as JSON."""
+        return self._data
+
+    @property
+    def row_format(self):
+        """The format of the stored rows (see `redash.utils.result_rows`). The rows returned by
+        `data` are always row objects."""
+        if self._data is None:
+            return result_rows.OBJECTS
+        return result_rows.stored_row_format(self._data)
+
+    def _reader(self):
+        return StoredResultReader(self._data)
+
+    def _row_index(self, reader, build=False):
+        """
+        Returns the row index of a stored result that is read sequentially (i.e. stored as
+        JSON), kept in Redis by the result's id. With `build`, it's built (reading all the
+        rows) if it isn't kept yet, otherwise it's None.
+        """
+        if (
+            not isinstance(reader, StoredResultReader)
+            or getattr(self, "id", None) is None
+        ):
+            return None
+
+        if getattr(self, ROW_INDEX_ATTR, None) is None:
+            row_index = query_result_row_indexes.get(self.id)
+            if row_index is None and build:
+                row_index = reader.row_index(query_result_row_indexes.STEP)
+                query_result_row_indexes.set(self.id, row_index)
+            setattr(self, ROW_INDEX_ATTR, row_index)
+
+        return getattr(self, ROW_INDEX_ATTR)
+
+    @staticmethod
+    def _convert_rows(rows, source, stored_format, row_format):
+        # the columns are only read when the rows need converting, as reading them can mean
+        # scanning past the rows of the stored result
+        if stored_format == row_format:
+            return iter(rows)
+
+        names = result_rows.column_names(source.get("columns"))
+        return result_rows.convert_rows(rows, names, stored_format, row_format)
+
+    @property
+    def columns(self):
+        if self._data is None:
+            return None
+
+        if hasattr(self, DESERIALIZED_DATA_ATTR):
+            return self._deserialized_data.get("columns")
+
+        return self._reader().columns
+
+    def iter_rows(self, row_format=result_rows.OBJECTS):
+        """Iterates over the rows of the result in `row_format`, decoding them one at a time
+        unless the whole result was already deserialized."""
+        if self._data is None:
+            return iter([])
+
+        if hasattr(self, DESERIALIZED_DATA_ATTR):
+            data = self._deserialized_data
+            rows = data.get("rows") or []
+            return self._convert_rows(rows, data, result_rows.OBJECTS, row_format)
+
+        reader = self._reader()
+        return self._convert_rows(reader.iter_rows(), reader, self.row_format, row_format)
+
+    @property
+    def row_count(self):
+        if self._data is None:
+            return 0
+
+        if hasattr(self, DESERIALIZED_DATA_ATTR):
+            return len(self._deserialized_data.get("rows") or [])
+
+        reader = self._reader()
+        # counting the rows of a JSON result reads all of them, which also indexes them
+        row_index = self._row_index(reader, build=True)
+        if row_index is not None:
+            return row_index["row_count"]
+
+        return reader.row_count
+
+    def rows_slice(self, offset=0, limit=None, row_format=result_rows.OBJECTS):
+        """Returns `limit` rows (or all remaining rows if `limit` is None) starting at
+        `offset` in `row_format`, without deserializing the rest of the result."""
+        if self._data is None:
+            return []
+
         if hasattr(self, DESERIALIZED_DATA_ATTR):
-            delattr(self, DESERIALIZED_DATA_ATTR)
+            data = self._deserialized_data
+            stop = None if limit is None else offset + limit
+            rows = (data.get("rows") or [])[offset:stop]
+            return list(self._convert_rows(rows, data, result_rows.OBJECTS, row_format))
+
+        reader = self._reader()
+        row_index = self._row_index(reader)
+        if row_index is not None:
+            rows = reader.rows_slice(offset, limit, row_index)
+        else:
+            rows = reader.rows_slice(offset, limit)
+        return list(self._convert_rows(rows, reader, self.row_format, row_format))
+
+    @property
+    def first_row(self):
+        """The first row of the result, or None if it has no rows. It's kept on the instance,
+        as all the alerts of a query evaluate the same row."""
+        if not hasattr(self, FIRST_ROW_ATTR):
+            rows = self.rows_slice(0, 1)
+            setattr(self, FIRST_ROW_ATTR, rows[0] if rows else None)
+
+        return getattr(self, FIRST_ROW_ATTR)
+
+
+class ColumnarPersistence(DBPersistence):
+    """Stores the result in the compressed columnar encoding of `redash.utils.columnar`.
+    Results stored as plain JSON (e.g. before switching persistence) are still readable."""
+
+    @property
+    def data(self):
+        if self._data is None:
+            return None
+
+        if not hasattr(self, DESERIALIZED_DATA_ATTR):
+            if columnar.is_encoded(self._data):
+                data = columnar.decode(self._data)
+            else:
+                data = result_rows.convert(json_loads(self._data), result_rows.OBJECTS)
+            setattr(self, DESERIALIZED_DATA_ATTR, data)
+
+        return self._deserialized_data
+
+    @data.setter
+    def data(self, data):
+        for attr in (DESERIALIZED_DATA_ATTR, FIRST_ROW_ATTR, ROW_INDEX_ATTR):
+            if hasattr(self, attr):
+                delattr(self, attr)
+        if getattr(self, "id", None) is not None:
+            query_result_row_indexes.delete(self.id)
+
+        if isinstance(data, str) and not columnar.is_encoded(data):
+            try:
+                decoded = json_loads(data)
+            except ValueError:
+                decoded = None
+
+            # the columnar encoding already stores each column name once
+            if isinstance(decoded, dict):
+                decoded = result_rows.convert(decoded, result_rows.OBJECTS)
+
+            if columnar.can_encode(decoded):
+                data = columnar.encode(decoded)
+
         self._data = data
 
+    @property
+    def data_json(self):
+        if self._data is None or columnar.is_encoded(self._data):
+            return None
+        return self._data
+
+    def _reader(self):
+        if columnar.is_encoded(self._data):
+            return columnar.ColumnarReader(self._data)
+
+        return super(ColumnarPersistence, self)._reader()
+
+
+query_result_persistence_classes = {
+    "json": DBPersistence,
+    "columnar": ColumnarPersistence,
+}
 
 QueryResultPersistence = (
-    settings.dynamic_settings.QueryResultPersistence or DBPersistence
+    settings.dynamic_settings.QueryResultPersistence
+    or query_result_persistence_classes[settings.QUERY_RESULTS_STORAGE_FORMAT]
 )
 
 
@@ -332,21 +824,50 @@ class QueryResult(db.Model, QueryResultPersistence, BelongsToOrgMixin):
     retrieved_at = Column(db.DateTime(True))
 
     __tablename__ = "query_results"
+    __table_args__ = (
+        db.Index(
+            "query_results_data_source_id_query_hash_retrieved_at",
+            data_source_id,
+            query_hash,
+            retrieved_at.desc(),
+        ),
+    )
 
     def __str__(self):
         return "%d | %s | %s" % (self.id, self.query_hash, self.retrieved_at)
 
-    def to_dict(self):
-        return {
+    @classmethod
+    def get_by_id_and_org(cls, object_id, org, defer_data=False):
+        """With `defer_data`, the result's data is only loaded once it's accessed."""
+        query = cls.query.filter(cls.id == object_id, cls.org == org)
+        if defer_data:
+            query = query.options(defer(cls._data))
+        return query.one()
+
+    def to_dict(
+        self, offset=None, limit=None, with_data=True, row_format=result_rows.OBJECTS
+    ):
+        d = {
             "id": self.id,
             "query_hash": self.query_hash,
             "query": self.query_text,
-            "data": self.data,
             "data_source_id": self.data_source_id,
             "runtime": self.runtime,
             "retrieved_at": self.retrieved_at,
         }
 
+        if with_data and offset is None and limit is None:
+            d["data"] = result_rows.convert(self.data, row_format)
+        elif with_data:
+            # the total, so clients can tell how many pages there are
+            row_count = self.row_count
+            d["data"] = result_rows.document(
+                self.columns, self.rows_slice(offset or 0, limit, row_format), row_format
+            )
+            d["data"]["row_count"] = row_count
+
+        return d
+
     @classmethod
     def unused(cls, days=7):
         age_threshold = datetime.datetime.now() - datetime.timedelta(days=days)
@@ -360,19 +881,50 @@ class QueryResult(db.Model, QueryResultPersistence, BelongsToOrgMixin):
     def get_latest(cls, data_source, query, max_age=0):
         query_hash = utils.gen_query_hash(query)
 
+        if latest_query_results.enabled:
+            cached = latest_query_results.get(data_source.id, query_hash)
+            if cached is not None:
+                statsd_client.incr("query_results.latest_cache.hit")
+                query_result_id, retrieved_at = cached
+
+                # The cached result is the most recent one, so if it's too old there is no
+                # fresh enough result at all.
+                if max_age != -1 and retrieved_at + datetime.timedelta(
+                    seconds=max_age
+                ) < utils.utcnow():
+                    return None
+
+                query_result = cls.query.get(query_result_id)
+                if query_result is not None:
+                    return query_result
+
+                # the result was removed (e.g. by cleanup_query_results)
+                latest_query_results.invalidate(data_source.id, query_hash)
+            else:
+                statsd_client.incr("query_results.latest_cache.miss")
+
+        query_result = cls._get_latest_from_db(data_source, query_hash, max_age)
+
+        if query_result is not None and latest_query_results.enabled:
+            latest_query_results.set(
+                data_source.id, query_hash, query_result.id, query_result.retrieved_at
+            )
+
+        return query_result
+
+    @classmethod
+    def _get_latest_from_db(cls, data_source, query_hash, max_age):
         if max_age == -1:
             query = cls.query.filter(
                 cls.query_hash == query_hash, cls.data_source == data_source
             )
         else:
+            # Compare the bare column with a constant, so the lookup can use the
+            # (data_source_id, query_hash, retrieved_at) index.
             query = cls.query.filter(
                 cls.query_hash == query_hash,
                 cls.data_source == data_source,
-                (
-                    db.func.timezone("utc", cls.retrieved_at)
-                    + datetime.timedelta(seconds=max_age)
-                    >= db.func.timezone("utc", db.func.now())
-                ),
+                cls.retrieved_at >= db.func.now() - datetime.timedelta(seconds=max_age),
             )
 
         return query.order_by(cls.retrieved_at.desc()).first()
@@ -401,14 +953,14 @@ class QueryResult(db.Model, QueryResultPersistence, BelongsToOrgMixin):
         return self.data_source.groups
 
 
-def should_schedule_next(
-    previous_iteration, now, interval, time=None, day_of_week=None, failures=0
-):
+def next_iteration(previous_iteration, interval, time=None, day_of_week=None, failures=0):
+    """Returns when a query that last ran at `previous_iteration` should run next, or None
+    if the failure backoff pushes the next run beyond any representable time."""
     # if time exists then interval > 23 hours (82800s)
     # if day_of_week exists then interval > 6 days (518400s)
     if time is None:
         ttl = int(interval)
-        next_iteration = previous_iteration + datetime.timedelta(seconds=ttl)
+        next_run = previous_iteration + datetime.timedelta(seconds=ttl)
     else:
         hour, minute = time.split(":")
         hour, minute = int(hour), int(minute)
@@ -435,17 +987,24 @@ def should_schedule_next(
                 - normalized_previous_iteration.weekday()
             )
 
-        next_iteration = (
+        next_run = (
             previous_iteration
             + datetime.timedelta(days=days_delay)
             + datetime.timedelta(days=days_to_add)
         ).replace(hour=hour, minute=minute)
     if failures:
         try:
-            next_iteration += datetime.timedelta(minutes=2 ** failures)
+            next_run += datetime.timedelta(minutes=2 ** failures)
         except OverflowError:
-            return False
-    return now > next_iteration
+            return None
+    return next_run
+
+
+def should_schedule_next(
+    previous_iteration, now, interval, time=None, day_of_week=None, failures=0
+):
+    next_run = next_iteration(previous_iteration, interval, time, day_of_week, failures)
+    return next_run is not None and now > next_run
 
 
 @gfk_type
@@ -632,21 +1191,33 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
 
     @classmethod
     def outdated_queries(cls):
+        if scheduled_queries_index.needs_reconcile():
+            scheduled_ids = db.session.query(Query.id).filter(Query.schedule.isnot(None))
+            scheduled_queries_index.reconcile([query_id for (query_id,) in scheduled_ids])
+
+        now = utils.utcnow()
+        due_ids = scheduled_queries_index.due(now)
+        if not due_ids:
+            return []
+
         queries = (
             Query.query.options(
                 joinedload(Query.latest_query_data).load_only("retrieved_at")
             )
+            .filter(Query.id.in_(due_ids))
             .filter(Query.schedule.isnot(None))
             .order_by(Query.id)
-        )
+        ).all()
 
-        now = utils.utcnow()
         outdated_queries = {}
-        scheduled_queries_executions.refresh()
+        next_runs = {}
+        unscheduled_ids = set(due_ids) - set(query.id for query in queries)
+        scheduled_queries_executions.refresh([query.id for query in queries])
 
         for query in queries:
             try:
                 if query.schedule.get("disabled"):
+                    unscheduled_ids.add(query.id)
                     continue
 
                 if query.schedule["until"]:
@@ -655,25 +1226,31 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
                     )
 
                     if schedule_until <= now:
+                        unscheduled_ids.add(query.id)
                         continue
 
                 retrieved_at = scheduled_queries_executions.get(query.id) or (
                     query.latest_query_data and query.latest_query_data.retrieved_at
                 )
 
-                if should_schedule_next(
+                next_run = next_iteration(
                     retrieved_at or now,
-                    now,
                     query.schedule["interval"],
                     query.schedule["time"],
                     query.schedule["day_of_week"],
                     query.schedule_failures,
-                ):
+                )
+                # Without a previous run the next run moves along with `now`, so the query
+                # only becomes due once it gets executed or a result is attached to it.
+                next_runs[query.id] = next_run if retrieved_at else None
+
+                if next_run is not None and now > next_run:
                     key = "{}:{}".format(query.query_hash, query.data_source_id)
                     outdated_queries[key] = query
             except Exception as e:
                 query.schedule["disabled"] = True
                 db.session.commit()
+                unscheduled_ids.add(query.id)
 
                 message = (
                     "Could not determine if query %d is outdated due to %s. The schedule for this query has been disabled."
@@ -684,6 +1261,8 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
                     type(e)(message).with_traceback(e.__traceback__)
                 )
 
+        scheduled_queries_index.update(next_runs, unscheduled_ids)
+
         return list(outdated_queries.values())
 
     @classmethod
@@ -726,7 +1305,7 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
     def recent(cls, group_ids, user_id=None, limit=20):
         query = (
             cls.query.filter(Event.created_at > (db.func.current_date() - 7))
-            .join(Event, Query.id == Event.object_id.cast(db.Integer))
+            .join(Event, Query.id == Event.numeric_object_id)
             .join(
                 DataSourceGroup, Query.data_source_id == DataSourceGroup.data_source_id
             )
@@ -734,13 +1313,13 @@ class Query(ChangeTrackingMixin, TimestampMixin, BelongsToOrgMixin, db.Model):
                 Event.action.in_(
                     ["edit", "execute", "edit_name", "edit_description", "view_source"]
                 ),
-                Event.object_id != None,
+                Event.numeric_object_id != None,
                 Event.object_type == "query",
                 DataSourceGroup.group_id.in_(group_ids),
                 or_(Query.is_draft == False, Query.user_id == user_id),
                 Query.is_archived == False,
             )
-            .group_by(Event.object_id, Query.id)
+            .group_by(Event.numeric_object_id, Query.id)
             .order_by(db.desc(db.func.count(0)))
         )
 
@@ -870,11 +1449,58 @@ def gen_query_hash(target, val, oldval, initiator):
     target.schedule_failures = 0
 
 
+@listens_for(QueryResult, "after_insert")
+def record_latest_query_result(mapper, connection, target):
+    """Marks the result to be cached as the latest one once the session commits, so
+    lookups don't miss it or cache the result it replaced in the meantime."""
+    session = object_session(target)
+    if session is not None and latest_query_results.enabled:
+        session.info.setdefault("latest_query_results", []).append(
+            (target.data_source_id, target.query_hash, target.id, target.retrieved_at)
+        )
+
+
+@listens_for(db.session, "after_commit")
+def cache_latest_query_results(session):
+    for data_source_id, query_hash, query_result_id, retrieved_at in session.info.pop(
+        "latest_query_results", ()
+    ):
+        latest_query_results.set(
+            data_source_id, query_hash, query_result_id, retrieved_at
+        )
+
+
+@listens_for(db.session, "after_rollback")
+def discard_latest_query_results(session):
+    session.info.pop("latest_query_results", None)
+
+
 @listens_for(Query.user_id, "set")
 def query_last_modified_by(target, val, oldval, initiator):
     target.last_modified_by_id = val
 
 
+@listens_for(Query, "after_insert")
+@listens_for(Query, "after_update")
+def record_scheduled_query_change(mapper, connection, target):
+    """Marks the query to be re-evaluated by `Query.outdated_queries` once the session
+    commits, so it isn't evaluated from the row as it was before the change."""
+    session = object_session(target)
+    if session is not None and target.schedule is not None:
+        session.info.setdefault("scheduled_query_changes", set()).add(target.id)
+
+
+@listens_for(db.session, "after_commit")
+def invalidate_scheduled_queries(session):
+    scheduled_queries_index.invalidate(*session.info.pop("scheduled_query_changes", ()))
+
+
+@listens_for(Query, "after_update")
+@listens_for(Query, "after_delete")
+def record_query_change(mapper, connection, target):
+    record_public_dashboard_change(target, query_ids=[target.id])
+
+
 @generic_repr("id", "object_type", "object_id", "user_id", "org_id")
 class Favorite(TimestampMixin, db.Model):
     id = primary_key("Favorite")
@@ -994,12 +1620,12 @@ class Alert(TimestampMixin, BelongsToOrgMixin, db.Model):
         return super(Alert, cls).get_by_id_and_org(object_id, org, Query)
 
     def evaluate(self):
-        data = self.query_rel.latest_query_data.data
+        row = self.query_rel.latest_query_data.first_row
 
-        if data["rows"] and self.options["column"] in data["rows"][0]:
+        if row and self.options["column"] in row:
             op = OPERATORS.get(self.options["op"], lambda v, t: False)
 
-            value = data["rows"][0][self.options["column"]]
+            value = row[self.options["column"]]
             threshold = self.options["value"]
 
             new_state = next_state(op, value, threshold)
@@ -1017,12 +1643,13 @@ class Alert(TimestampMixin, BelongsToOrgMixin, db.Model):
         if template is None:
             return ""
 
-        data = self.query_rel.latest_query_data.data
+        query_result = self.query_rel.latest_query_data
         host = base_url(self.query_rel.org)
 
+        row = query_result.first_row
         col_name = self.options["column"]
-        if data["rows"] and col_name in data["rows"][0]:
-            result_value = data["rows"][0][col_name]
+        if row and col_name in row:
+            result_value = row[col_name]
         else:
             result_value = None
 
@@ -1037,9 +1664,14 @@ class Alert(TimestampMixin, BelongsToOrgMixin, db.Model):
                 host=host, query_id=self.query_rel.id
             ),
             "QUERY_RESULT_VALUE": result_value,
-            "QUERY_RESULT_ROWS": data["rows"],
-            "QUERY_RESULT_COLS": data["columns"],
         }
+
+        # the whole result is only read for the templates that show it
+        if "QUERY_RESULT_ROWS" in template:
+            context["QUERY_RESULT_ROWS"] = list(query_result.iter_rows())
+        if "QUERY_RESULT_COLS" in template:
+            context["QUERY_RESULT_COLS"] = query_result.columns
+
         return mustache_render(template, context)
 
     @property
@@ -1234,6 +1866,25 @@ class Widget(TimestampMixin, BelongsToOrgMixin, db.Model):
         return super(Widget, cls).get_by_id_and_org(object_id, org, Dashboard)
 
 
+@listens_for(Dashboard, "after_update")
+@listens_for(Dashboard, "after_delete")
+def record_dashboard_change(mapper, connection, target):
+    record_public_dashboard_change(target, dashboard_ids=[target.id])
+
+
+@listens_for(Visualization, "after_update")
+@listens_for(Visualization, "after_delete")
+def record_visualization_change(mapper, connection, target):
+    record_public_dashboard_change(target, query_ids=[target.query_id])
+
+
+@listens_for(Widget, "after_insert")
+@listens_for(Widget, "after_update")
+@listens_for(Widget, "after_delete")
+def record_widget_change(mapper, connection, target):
+    record_public_dashboard_change(target, dashboard_ids=[target.dashboard_id])
+
+
 @generic_repr(
     "id", "object_type", "object_id", "action", "user_id", "org_id", "created_at"
 )
@@ -1246,12 +1897,22 @@ class Event(db.Model):
     action = Column(db.String(255))
     object_type = Column(db.String(255))
     object_id = Column(db.String(255), nullable=True)
+    # object_id as an integer, when it is one (like the ids of queries or dashboards)
+    numeric_object_id = Column(db.BigInteger, nullable=True)
     additional_properties = Column(
         MutableDict.as_mutable(PseudoJSON), nullable=True, default={}
     )
     created_at = Column(db.DateTime(True), default=db.func.now())
 
     __tablename__ = "events"
+    __table_args__ = (
+        db.Index(
+            "events_object_type_created_at_numeric_object_id",
+            "object_type",
+            "created_at",
+            "numeric_object_id",
+        ),
+    )
 
     def __str__(self):
         return "%s,%s,%s,%s" % (
@@ -1272,8 +1933,23 @@ class Event(db.Model):
             "created_at": self.created_at.isoformat(),
         }
 
-    @classmethod
-    def record(cls, event):
+    @staticmethod
+    def numeric_id(object_id):
+        try:
+            value = int(object_id)
+        except (TypeError, ValueError):
+            return None
+
+        # keep it within the range of BIGINT
+        return value if -(2 ** 63) <= value < 2 ** 63 else None
+
+    @validates("object_id")
+    def validate_object_id(self, key, object_id):
+        self.numeric_object_id = self.numeric_id(object_id)
+        return object_id
+
+    @staticmethod
+    def _columns(event):
         org_id = event.pop("org_id")
         user_id = event.pop("user_id", None)
         action = event.pop("action")
@@ -1282,18 +1958,100 @@ class Event(db.Model):
 
         created_at = datetime.datetime.utcfromtimestamp(event.pop("timestamp"))
 
-        event = cls(
+        return dict(
             org_id=org_id,
             user_id=user_id,
             action=action,
             object_type=object_type,
             object_id=object_id,
+            numeric_object_id=Event.numeric_id(object_id),
             additional_properties=event,
             created_at=created_at,
         )
+
+    @classmethod
+    def record(cls, event):
+        event = cls(**cls._columns(event))
         db.session.add(event)
         return event
 
+    @classmethod
+    def partitions(cls):
+        """
+        Returns the (name, end) of the range partitions of the events table, where end is the
+        (exclusive) upper bound of the events they hold. Returns an empty list if the table
+        isn't partitioned.
+        """
+        partitioned = db.session.execute(
+            "SELECT relkind = 'p' FROM pg_class WHERE relname = 'events'"
+        ).scalar()
+        if not partitioned:
+            return []
+
+        bounds = db.session.execute(
+            """SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+               FROM pg_inherits
+               JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+               JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+               WHERE parent.relname = 'events'"""
+        )
+
+        partitions = []
+        for name, bound in bounds:
+            end = re.search(r"TO \('([^']+)'\)", bound)
+            # the default partition has no bounds
+            if end:
+                partitions.append((name, dateutil.parser.parse(end.group(1))))
+
+        return sorted(partitions, key=lambda p: p[1])
+
+    @classmethod
+    def create_partition(cls, month):
+        """Creates the partition for the events of the given month, unless it exists."""
+        start = month.replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+        db.session.execute(
+            "CREATE TABLE IF NOT EXISTS events_{:%Y_%m} PARTITION OF events "
+            "FOR VALUES FROM ('{:%Y-%m-%d} 00:00+00') "
+            "TO ('{:%Y-%m-%d} 00:00+00')".format(start, start, end)
+        )
+
+    @classmethod
+    def drop_partition(cls, name):
+        db.session.execute('DROP TABLE "{}"'.format(name))
+
+    @classmethod
+    def id_range(cls):
+        """Returns the (lowest, highest) id of the events, or (None, None) without events."""
+        return db.session.query(db.func.min(cls.id), db.func.max(cls.id)).one()
+
+    @classmethod
+    def backfill_numeric_object_ids(cls, start_id, end_id):
+        """Fills in numeric_object_id of the events with ids in [start_id, end_id) that were
+        recorded before the column was added."""
+        db.session.execute(
+            "UPDATE events SET numeric_object_id = object_id::bigint "
+            "WHERE id >= :start_id AND id < :end_id AND numeric_object_id IS NULL "
+            "AND object_id ~ '^-?[0-9]{1,18}$'",
+            {"start_id": start_id, "end_id": end_id},
+        )
+
+    @classmethod
+    def record_many(cls, events):
+        """
+        Inserts the given raw events with a single multi-row INSERT statement and returns
+        them as (transient) events.
+        """
+        rows = [cls._columns(dict(event)) for event in events]
+        for row in rows:
+            if row["object_id"] is not None:
+                row["object_id"] = str(row["object_id"])
+
+        if rows:
+            db.session.execute(cls.__table__.insert().values(rows))
+
+        return [cls(**row) for row in rows]
+
 
 @generic_repr("id", "created_by_id", "org_id", "active")
 class ApiKey(TimestampMixin, GFKBase, db.Model):
@@ -1,9 +1,13 @@
 import functools
+import time
 
+from flask import g, has_request_context
 from flask_login import current_user
 from flask_restful import abort
 from funcy import flatten
 
+from redash import settings
+
 view_only = True
 not_view_only = False
 
@@ -118,3 +122,89 @@ def can_modify(obj, user):
 def require_object_modify_permission(obj, user):
     if not can_modify(obj, user):
         abort(403)
+
+
+class DataSourcePermissionsCache(object):
+    """
+    Memoizes the groups that have access to each data source (`{group_id: view_only}`)
+    for the duration of a request and, when `ttl` is set, for `ttl` seconds in this
+    process. Hits and misses are counted in the request metrics.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._cache = {}
+
+    def _request_cache(self):
+        if not has_request_context():
+            return None
+
+        if "data_source_permissions" not in g:
+            g.data_source_permissions = {}
+        return g.data_source_permissions
+
+    def _record(self, hits, misses):
+        if has_request_context():
+            g.permission_cache_hits = g.get("permission_cache_hits", 0) + hits
+            g.permission_cache_misses = g.get("permission_cache_misses", 0) + misses
+
+    def get_many(self, data_source_ids, load):
+        """
+        Returns the groups of each of the given data sources. `load` is called with the ids
+        missing from the cache and returns their groups.
+        """
+        request_cache = self._request_cache()
+        now = time.time()
+        groups = {}
+        missing = []
+
+        for data_source_id in data_source_ids:
+            if request_cache is not None and data_source_id in request_cache:
+                groups[data_source_id] = request_cache[data_source_id]
+                continue
+
+            expires_at, cached = self._cache.get(data_source_id, (0, None))
+            if expires_at > now:
+                groups[data_source_id] = cached
+                if request_cache is not None:
+                    request_cache[data_source_id] = cached
+            else:
+                missing.append(data_source_id)
+
+        self._record(len(groups), len(missing))
+
+        if missing:
+            loaded = load(missing)
+            for data_source_id in missing:
+                groups[data_source_id] = loaded.get(data_source_id, {})
+                if request_cache is not None:
+                    request_cache[data_source_id] = groups[data_source_id]
+                if self.ttl:
+                    self._cache[data_source_id] = (now + self.ttl, groups[data_source_id])
+
+        # callers get their own copies, so the cached groups can't be changed by mistake
+        return {
+            data_source_id: dict(data_source_groups)
+            for data_source_id, data_source_groups in groups.items()
+        }
+
+    def invalidate(self, data_source_id):
+        self._cache.pop(data_source_id, None)
+
+        request_cache = self._request_cache()
+        if request_cache is not None:
+            request_cache.pop(data_source_id, None)
+
+    def reset_request_cache(self):
+        for name in ("data_source_permissions", "permission_cache_hits", "permission_cache_misses"):
+            g.pop(name, None)
+
+
+data_source_permissions = DataSourcePermissionsCache(
+    ttl=settings.DATA_SOURCE_PERMISSIONS_CACHE_TTL
+)
+
+
+def init_app(app):
+    # the application context (and `g`) may outlive a single request, e.g. in tests
+    app.before_request(data_source_permissions.reset_request_cache)
@@ -1,6 +1,11 @@
+import datetime
 import logging
+import os
+import re
+import threading
+import time
 
-from contextlib import ExitStack
+from contextlib import contextmanager, ExitStack
 from dateutil import parser
 from functools import wraps
 import socket
@@ -10,7 +15,7 @@ from urllib.parse import urlparse
 from six import text_type
 from sshtunnel import open_tunnel
 from redash import settings
-from redash.utils import json_loads
+from redash.utils import json_dumps, json_loads, result_rows
 from rq.timeouts import JobTimeoutException
 
 from redash.utils.requests_session import requests, requests_session
@@ -23,6 +28,8 @@ __all__ = [
     "InterruptException",
     "JobTimeoutException",
     "BaseSQLQueryRunner",
+    "ResultBudget",
+    "ResultStream",
     "TYPE_DATETIME",
     "TYPE_BOOLEAN",
     "TYPE_INTEGER",
@@ -30,10 +37,12 @@ __all__ = [
     "TYPE_DATE",
     "TYPE_FLOAT",
     "SUPPORTED_COLUMN_TYPES",
+    "FETCH_BATCH_SIZE",
     "register",
     "get_query_runner",
     "import_query_runners",
     "guess_type",
+    "ColumnTypes",
 ]
 
 # Valid types of columns returned in results:
@@ -48,6 +57,9 @@ SUPPORTED_COLUMN_TYPES = set(
     [TYPE_INTEGER, TYPE_FLOAT, TYPE_BOOLEAN, TYPE_STRING, TYPE_DATETIME, TYPE_DATE]
 )
 
+# How many rows query runners fetch at a time when they fetch results incrementally
+FETCH_BATCH_SIZE = 1000
+
 
 class InterruptException(Exception):
     pass
@@ -57,10 +69,184 @@ class NotSupported(Exception):
     pass
 
 
+class ResultBudget(object):
+    """
+    Limits the number of rows and the size (serialized as JSON) of a query result. Query runners
+    pass the rows they fetch through `take` and stop fetching once the result is truncated.
+    """
+
+    def __init__(self, max_rows=0, max_bytes=0):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.row_count = 0
+        self.byte_count = 0
+        self.truncated = False
+
+    def admit(self, size):
+        """Accounts for one more row of `size` serialized bytes, if it fits in the budget."""
+        if self.truncated:
+            return False
+
+        if (self.max_rows and self.row_count >= self.max_rows) or (
+            self.max_bytes and self.byte_count + size > self.max_bytes
+        ):
+            self.truncated = True
+            return False
+
+        self.row_count += 1
+        self.byte_count += size
+        return True
+
+    def take(self, rows, cls=None):
+        """Returns the leading rows of `rows` that fit in the budget."""
+        if self.truncated:
+            return []
+
+        if self.max_rows and self.row_count + len(rows) > self.max_rows:
+            rows = rows[: self.max_rows - self.row_count]
+            self.truncated = True
+
+        if self.max_bytes and rows:
+            size = len(json_dumps(rows, cls=cls, ignore_nan=True))
+            if self.byte_count + size > self.max_bytes:
+                # find the rows that fit, one at a time (+2 for the separator)
+                for i, row in enumerate(rows):
+                    size = len(json_dumps(row, cls=cls, ignore_nan=True)) + 2
+                    if self.byte_count + size > self.max_bytes:
+                        rows = rows[:i]
+                        self.truncated = True
+                        break
+                    self.byte_count += size
+            else:
+                self.byte_count += size
+
+        self.row_count += len(rows)
+        return rows
+
+    def fetch(self, cursor, columns, cls=None, batch_size=FETCH_BATCH_SIZE):
+        """
+        Fetches the rows of a DB-API `cursor` in batches, as dicts keyed by the names of
+        `columns`, until the cursor is exhausted or the result is truncated.
+        """
+        names = [column["name"] for column in columns]
+        rows = []
+        while not self.truncated:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            rows.extend(self.take([dict(zip(names, row)) for row in batch], cls=cls))
+
+        return rows
+
+    def enforce(self, json_data):
+        """
+        Truncates a serialized query result, for query runners that fetch results without
+        enforcing the budget.
+        """
+        if not (self.max_rows or self.max_bytes) or json_data is None:
+            return json_data
+        if not self.max_rows and len(json_data) <= self.max_bytes:
+            return json_data
+
+        data = json_loads(json_data)
+        if not isinstance(data, dict) or not isinstance(data.get("rows"), list):
+            return json_data
+
+        data["rows"] = self.take(data["rows"])
+        if not self.truncated:
+            return json_data
+
+        return json_dumps(self.mark(data))
+
+    def mark(self, data):
+        """Flags `data` (a query result) as truncated, if it was."""
+        if self.truncated:
+            data.setdefault("metadata", {})["truncated"] = True
+        return data
+
+
+class ResultStream(object):
+    """
+    The result of `BaseQueryRunner.run_query_stream`: the `columns` of the result, the row
+    `batches` (an iterable of lists of tuples, ordered like the columns) and the result's
+    `metadata`. Query runners may update the columns (like their types) and the metadata until
+    the batches are exhausted.
+    """
+
+    def __init__(self, columns, batches, metadata=None, json_encoder=None):
+        self.columns = columns
+        self.batches = batches
+        self.metadata = metadata or {}
+        self.json_encoder = json_encoder
+        self._close_callbacks = []
+
+    def add_close_callback(self, callback):
+        """Registers `callback` to be called once the stream is closed, even if its batches
+        weren't iterated."""
+        self._close_callbacks.append(callback)
+
+    def close(self):
+        close = getattr(self.batches, "close", None)
+        try:
+            if close is not None:
+                close()
+        finally:
+            callbacks, self._close_callbacks = self._close_callbacks, []
+            for callback in callbacks:
+                callback()
+
+    def to_json(self, budget=None, row_format=result_rows.OBJECTS):
+        """
+        Serializes the result row by row, into the same document as
+        `json_dumps({"columns": ..., "rows": ..., "metadata": ...})` with the rows in
+        `row_format` (see `redash.utils.result_rows`), keeping the rows that fit in `budget`.
+        """
+        budget = budget or ResultBudget()
+        names = [column["name"] for column in self.columns]
+        as_arrays = row_format == result_rows.ARRAYS
+        rows = []
+
+        try:
+            for batch in self.batches:
+                for row in batch:
+                    text = json_dumps(
+                        row if as_arrays else dict(zip(names, row)),
+                        cls=self.json_encoder,
+                        ignore_nan=True,
+                    )
+                    if not budget.admit(len(text) + 2):
+                        break
+                    rows.append(text)
+
+                if budget.truncated:
+                    break
+        finally:
+            self.close()
+
+        document = '{"row_format": "arrays", ' if as_arrays else "{"
+        document += '"columns": ' + json_dumps(self.columns) + ', "rows": ['
+        document += ", ".join(rows)
+        del rows
+
+        metadata = budget.mark({"metadata": dict(self.metadata)})["metadata"]
+        if metadata:
+            return document + '], "metadata": ' + json_dumps(metadata) + "}"
+        return document + "]}"
+
+
 class BaseQueryRunner(object):
     deprecated = False
     should_annotate_query = True
     noop_query = None
+    # Whether the query runner implements run_query_stream, which query execution jobs then
+    # use instead of run_query.
+    streams_results = False
+    # Whether run_query enforces result_limits while fetching results. Results of other query
+    # runners are truncated after they are fetched.
+    limits_results = False
+    # The (maximum rows, maximum bytes) of the results of run_query, where 0 means no limit.
+    # Set by the query execution job from dynamic_settings.query_result_limits.
+    result_limits = (0, 0)
 
     def __init__(self, configuration):
         self.syntax = "sql"
@@ -153,6 +339,40 @@ class BaseQueryRunner(object):
     def run_query(self, query, user):
         raise NotImplementedError()
 
+    def run_query_stream(self, query, user):
+        """
+        Runs `query` and returns a ResultStream, raising an exception if the query fails.
+        Consumers must close the stream (`ResultStream.to_json` does), which releases the
+        query's resources.
+
+        This default implementation adapts run_query, so the whole result is fetched before the
+        stream is returned. Query runners that can fetch results incrementally override it
+        and set `streams_results`.
+        """
+        json_data, error = self.run_query(query, user)
+        if error is not None and json_data is None:
+            raise Exception(error)
+
+        data = json_loads(json_data)
+        columns = data.pop("columns")
+        names = [column["name"] for column in columns]
+        rows = [tuple(row.get(name) for name in names) for row in data.pop("rows")]
+
+        return ResultStream(columns, [rows], data.get("metadata"))
+
+    def run_query_from_stream(self, query, user):
+        """An implementation of run_query for query runners that implement run_query_stream."""
+        try:
+            stream = self.run_query_stream(query, user)
+            return stream.to_json(self.result_budget()), None
+        except (InterruptException, JobTimeoutException):
+            raise
+        except Exception as e:
+            return None, str(e)
+
+    def result_budget(self):
+        return ResultBudget(*self.result_limits)
+
     def fetch_columns(self, columns):
         column_names = []
         duplicates_counter = 1
@@ -346,10 +566,54 @@ def guess_type(value):
     return guess_type_from_string(value)
 
 
+_INTEGER = re.compile(r"[+-]?[0-9]+\Z")
+_FLOAT = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\Z")
+_ISO_DATETIME = re.compile(
+    r"(?P<year>[0-9]{4})-(?P<month>[0-9]{2})-(?P<day>[0-9]{2})"
+    r"(?:[T ](?P<hour>[0-9]{2}):(?P<minute>[0-9]{2})"
+    r"(?::(?P<second>[0-9]{2})(?:\.[0-9]+)?)?"
+    r"(?:Z|[+-](?P<offset_hour>[0-9]{2})(?::?(?P<offset_minute>[0-9]{2}))?)?)?\Z"
+)
+_TIME_FIELD_LIMITS = [
+    ("hour", 24),
+    ("minute", 60),
+    ("second", 60),
+    ("offset_hour", 24),
+    ("offset_minute", 60),
+]
+
+
+def _is_iso_datetime(string_value):
+    match = _ISO_DATETIME.match(string_value)
+    if match is None:
+        return False
+
+    fields = match.groupdict()
+    try:
+        datetime.date(int(fields["year"]), int(fields["month"]), int(fields["day"]))
+    except ValueError:
+        return False
+
+    return all(
+        fields[name] is None or int(fields[name]) < limit
+        for name, limit in _TIME_FIELD_LIMITS
+    )
+
+
 def guess_type_from_string(string_value):
     if string_value == "" or string_value is None:
         return TYPE_STRING
 
+    # common spellings of numbers and ISO 8601 dates are recognized without going through the
+    # (exception raising) conversions below, and dateutil in particular
+    if isinstance(string_value, str):
+        if _INTEGER.match(string_value):
+            return TYPE_INTEGER
+        if _FLOAT.match(string_value):
+            return TYPE_FLOAT
+        if _is_iso_datetime(string_value):
+            return TYPE_DATETIME
+
     try:
         int(string_value)
         return TYPE_INTEGER
@@ -374,44 +638,298 @@ def guess_type_from_string(string_value):
     return TYPE_STRING
 
 
+_PYTHON_TYPES = {bool: TYPE_BOOLEAN, int: TYPE_INTEGER, float: TYPE_FLOAT}
+
+
+class ColumnTypes(object):
+    """
+    Guesses the types of the columns of a result from its rows, a batch of rows at a time.
+
+    The verdicts are the same as guessing the type of every value with `guess_type`: a column
+    has the type of its first value, and becomes a string column as soon as one of its values
+    has another type. Values are checked a column at a time though, by their Python type
+    where possible, and string columns aren't checked any further. The guesses of string
+    values are cached, as results tend to repeat them.
+    """
+
+    max_cached_strings = 10000
+
+    def __init__(self, column_count):
+        self.types = [None] * column_count
+        self._string_types = {}
+
+    def update(self, rows):
+        """Updates (and returns) `types` with `rows`, sequences of values ordered like the
+        columns."""
+        for j, column_type in enumerate(self.types):
+            if column_type != TYPE_STRING:
+                self.types[j] = self._column_type([row[j] for row in rows], column_type)
+
+        return self.types
+
+    def _column_type(self, values, column_type):
+        kinds = set(map(type, values))
+        if len(kinds) == 1:
+            guess = _PYTHON_TYPES.get(kinds.pop())
+            if guess is not None:
+                return guess if column_type in (None, guess) else TYPE_STRING
+
+        for value in values:
+            guess = self._guess(value)
+            if column_type is None:
+                column_type = guess
+            elif guess != column_type:
+                return TYPE_STRING
+
+        return column_type
+
+    def _guess(self, value):
+        if type(value) is not str:
+            return guess_type(value)
+
+        guess = self._string_types.get(value)
+        if guess is None:
+            if len(self._string_types) >= self.max_cached_strings:
+                self._string_types.clear()
+            guess = self._string_types[value] = guess_type_from_string(value)
+
+        return guess
+
+
+class SSHTunnelManager(object):
+    """
+    Keeps SSH tunnels open between queries, one per (bastion host, bastion port, SSH user,
+    remote host, remote port), so queries don't have to go through a full SSH handshake.
+
+    Tunnels are closed once they weren't used for `idle_timeout` seconds and replaced when
+    their SSH transport is no longer active. When `max_tunnels` tunnels are already open
+    and none of them is idle, a tunnel is opened for the duration of a single call.
+    Setting `idle_timeout` to 0 opens a tunnel for every call.
+
+    Tunnels are kept by each process and never shared with processes forked after they
+    were opened. Forking workers close them at the end of every job (see
+    `redash.tasks.worker.HardLimitingWorker`), so tunnels are only reused across jobs by
+    non-forking workers (`rq worker --no-fork`).
+    """
+
+    keepalive_interval = 30
+
+    def __init__(self, idle_timeout, max_tunnels):
+        self.idle_timeout = idle_timeout
+        self.max_tunnels = max_tunnels
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Forked processes (e.g. work horses) don't get the threads serving the tunnels,
+        # and must not close the transports they share with their parent.
+        self._lock = threading.RLock()
+        self._tunnels = {}
+        # tunnels are opened outside of `_lock`, holding the lock of their key instead
+        self._opening_locks = {}
+        self._opening = set()
+        self._reaper = None
+
+    def _open(self, bastion_address, remote_address, auth):
+        server = open_tunnel(
+            bastion_address,
+            remote_bind_address=remote_address,
+            block_on_close=False,
+            set_keepalive=self.keepalive_interval,
+            **auth
+        )
+        server.start()
+        return server
+
+    def _close(self, key):
+        tunnel = self._tunnels.pop(key)
+        try:
+            tunnel["server"].stop()
+        except Exception:
+            logger.warning("Failed closing SSH tunnel to %s.", key, exc_info=True)
+
+    def _close_idle(self):
+        idle_since = time.time() - self.idle_timeout
+        for key, tunnel in list(self._tunnels.items()):
+            if not tunnel["users"] and tunnel["last_used_at"] < idle_since:
+                self._close(key)
+
+    def _reap(self):
+        while True:
+            time.sleep(self.idle_timeout)
+            with self._lock:
+                self._close_idle()
+
+    def close_all(self):
+        """Closes the open tunnels that aren't in use."""
+        with self._lock:
+            for key, tunnel in list(self._tunnels.items()):
+                if not tunnel["users"]:
+                    self._close(key)
+
+    def _reserve(self, key):
+        """Returns the open tunnel for `key`, None when there is a slot to open it, or False
+        when there is no slot for it."""
+        with self._lock:
+            self._close_idle()
+
+            tunnel = self._tunnels.get(key)
+            if tunnel and not tunnel["server"].is_active:
+                if tunnel["users"]:
+                    return False
+
+                logger.info("SSH tunnel to %s is no longer active, reopening it.", key)
+                self._close(key)
+                tunnel = None
+
+            if tunnel:
+                tunnel["users"] += 1
+                tunnel["last_used_at"] = time.time()
+                return tunnel
+
+            if len(self._tunnels) + len(self._opening) >= self.max_tunnels:
+                idle = [k for k, t in self._tunnels.items() if not t["users"]]
+                if not idle:
+                    return False
+                self._close(min(idle, key=lambda k: self._tunnels[k]["last_used_at"]))
+
+            self._opening.add(key)
+            return None
+
+    def _checkout(self, key, bastion_address, remote_address, auth):
+        with self._lock:
+            opening_lock = self._opening_locks.setdefault(key, threading.Lock())
+
+        # Calls for the same key wait for the tunnel being opened, calls for other keys
+        # don't wait for the SSH handshake.
+        with opening_lock:
+            tunnel = self._reserve(key)
+            if tunnel is not None:
+                return tunnel or None
+
+            try:
+                server = self._open(bastion_address, remote_address, auth)
+            finally:
+                with self._lock:
+                    self._opening.discard(key)
+
+            with self._lock:
+                tunnel = {"server": server, "users": 1, "last_used_at": time.time()}
+                self._tunnels[key] = tunnel
+
+                if self._reaper is None:
+                    self._reaper = threading.Thread(target=self._reap, daemon=True)
+                    self._reaper.start()
+
+            return tunnel
+
+    def _checkin(self, tunnel):
+        with self._lock:
+            tunnel["users"] -= 1
+            tunnel["last_used_at"] = time.time()
+
+    @contextmanager
+    def tunnel(self, details, remote_address):
+        """Yields the local address of a tunnel to `remote_address` through the bastion
+        described by the data source's `ssh_tunnel` options."""
+        bastion_address = (details["ssh_host"], details.get("ssh_port", 22))
+        auth = {
+            "ssh_username": details["ssh_username"],
+            **settings.dynamic_settings.ssh_tunnel_auth(),
+        }
+
+        try:
+            tunnel = None
+            if self.idle_timeout > 0:
+                key = (
+                    bastion_address + (details["ssh_username"],) + tuple(remote_address)
+                )
+                tunnel = self._checkout(key, bastion_address, remote_address, auth)
+            server = (
+                tunnel["server"]
+                if tunnel
+                else self._open(bastion_address, remote_address, auth)
+            )
+        except Exception as error:
+            raise type(error)("SSH tunnel: {}".format(str(error)))
+
+        try:
+            yield server.local_bind_address
+        finally:
+            if tunnel:
+                self._checkin(tunnel)
+            else:
+                server.stop()
+
+
+ssh_tunnels = SSHTunnelManager(
+    settings.SSH_TUNNEL_IDLE_TIMEOUT, settings.SSH_TUNNEL_MAX_TUNNELS
+)
+
+
+def _releasing(batches, release):
+    yield from batches
+    release()
+
+
 def with_ssh_tunnel(query_runner, details):
+    # get_schema may call run_query, which should use the tunnel that is already open
+    tunneled = {"depth": 0}
+
+    def remote_address():
+        try:
+            return query_runner.host, query_runner.port
+        except NotImplementedError:
+            raise NotImplementedError(
+                "SSH tunneling is not implemented for this query runner yet."
+            )
+
+    @contextmanager
+    def through(local_address, remote):
+        tunneled["depth"] += 1
+        try:
+            query_runner.host, query_runner.port = local_address
+            yield
+        finally:
+            tunneled["depth"] -= 1
+            query_runner.host, query_runner.port = remote
+
     def tunnel(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            try:
-                remote_host, remote_port = query_runner.host, query_runner.port
-            except NotImplementedError:
-                raise NotImplementedError(
-                    "SSH tunneling is not implemented for this query runner yet."
-                )
+            if tunneled["depth"]:
+                return f(*args, **kwargs)
 
-            stack = ExitStack()
-            try:
-                bastion_address = (details["ssh_host"], details.get("ssh_port", 22))
-                remote_address = (remote_host, remote_port)
-                auth = {
-                    "ssh_username": details["ssh_username"],
-                    **settings.dynamic_settings.ssh_tunnel_auth(),
-                }
-                server = stack.enter_context(
-                    open_tunnel(
-                        bastion_address, remote_bind_address=remote_address, **auth
-                    )
-                )
-            except Exception as error:
-                raise type(error)("SSH tunnel: {}".format(str(error)))
+            remote = remote_address()
+            with ssh_tunnels.tunnel(details, remote) as local_address:
+                with through(local_address, remote):
+                    return f(*args, **kwargs)
 
-            with stack:
-                try:
-                    query_runner.host, query_runner.port = server.local_bind_address
-                    result = f(*args, **kwargs)
-                finally:
-                    query_runner.host, query_runner.port = remote_host, remote_port
+        return wrapper
 
-                return result
+    def tunnel_stream(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if tunneled["depth"]:
+                return f(*args, **kwargs)
+
+            remote = remote_address()
+            with ExitStack() as stack:
+                local_address = stack.enter_context(ssh_tunnels.tunnel(details, remote))
+                with through(local_address, remote):
+                    stream = f(*args, **kwargs)
+                # the stream's connection goes through the tunnel until the stream is
+                # exhausted or closed
+                release = stack.pop_all().close
+
+            stream.batches = _releasing(stream.batches, release)
+            stream.add_close_callback(release)
+            return stream
 
         return wrapper
 
     query_runner.run_query = tunnel(query_runner.run_query)
+    query_runner.run_query_stream = tunnel_stream(query_runner.run_query_stream)
+    query_runner.get_schema = tunnel(query_runner.get_schema)
 
     return query_runner
@@ -3,7 +3,7 @@ import os
 
 from redash.query_runner import *
 from redash.settings import parse_boolean
-from redash.utils import json_dumps, json_loads
+from redash.utils import json_loads
 
 logger = logging.getLogger(__name__)
 ANNOTATE_QUERY = parse_boolean(os.environ.get("ATHENA_ANNOTATE_QUERY", "true"))
@@ -49,6 +49,7 @@ class SimpleFormatter(object):
 
 class Athena(BaseQueryRunner):
     noop_query = "SELECT 1"
+    streams_results = True
 
     @classmethod
     def name(cls):
@@ -214,7 +215,7 @@ class Athena(BaseQueryRunner):
 
         return list(schema.values())
 
-    def run_query(self, query, user):
+    def run_query_stream(self, query, user):
         cursor = pyathena.connect(
             s3_staging_dir=self.configuration["s3_staging_dir"],
             schema_name=self.configuration.get("schema", "default"),
@@ -231,10 +232,6 @@ class Athena(BaseQueryRunner):
                 (i[0], _TYPE_MAPPINGS.get(i[1], None)) for i in cursor.description
             ]
             columns = self.fetch_columns(column_tuples)
-            rows = [
-                dict(zip(([c["name"] for c in columns]), r))
-                for i, r in enumerate(cursor.fetchall())
-            ]
             qbytes = None
             athena_query_id = None
             try:
@@ -247,24 +244,28 @@ class Athena(BaseQueryRunner):
                 logger.debug("Athena Upstream can't get query_id: %s", e)
 
             price = self.configuration.get("cost_per_tb", 5)
-            data = {
-                "columns": columns,
-                "rows": rows,
-                "metadata": {
-                    "data_scanned": qbytes,
-                    "athena_query_id": athena_query_id,
-                    "query_cost": price * qbytes * 10e-12,
-                },
+            metadata = {
+                "data_scanned": qbytes,
+                "athena_query_id": athena_query_id,
+                "query_cost": price * qbytes * 10e-12,
             }
-
-            json_data = json_dumps(data, ignore_nan=True)
-            error = None
         except Exception:
             if cursor.query_id:
                 cursor.cancel()
             raise
 
-        return json_data, error
+        return ResultStream(columns, self._batches(cursor), metadata)
+
+    def _batches(self, cursor):
+        # the results are paginated, fetched from the query's output location as needed
+        while True:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            yield batch
+
+    def run_query(self, query, user):
+        return self.run_query_from_stream(query, user)
 
 
 register(Athena)
@@ -86,6 +86,7 @@ def _get_query_results(jobs, project_id, location, job_id, start_index):
 class BigQuery(BaseQueryRunner):
     should_annotate_query = False
     noop_query = "SELECT 1"
+    limits_results = True
 
     @classmethod
     def enabled(cls):
@@ -205,10 +206,19 @@ class BigQuery(BaseQueryRunner):
         logger.debug("bigquery replied: %s", query_reply)
 
         rows = []
+        budget = self.result_budget()
 
         while ("rows" in query_reply) and current_row < int(query_reply["totalRows"]):
-            for row in query_reply["rows"]:
-                rows.append(transform_row(row, query_reply["schema"]["fields"]))
+            rows.extend(
+                budget.take(
+                    [
+                        transform_row(row, query_reply["schema"]["fields"])
+                        for row in query_reply["rows"]
+                    ]
+                )
+            )
+            if budget.truncated:
+                break
 
             current_row += len(query_reply["rows"])
 
@@ -240,7 +250,7 @@ class BigQuery(BaseQueryRunner):
             "metadata": {"data_scanned": int(query_reply["totalBytesProcessed"])},
         }
 
-        return data
+        return budget.mark(data)
 
     def _get_columns_schema(self, table_data):
         columns = []
@@ -101,6 +101,8 @@ def parse_json(data, path, fields):
 
     rows = []
     columns = []
+    # columns get the type of their first value, so values of known columns aren't checked
+    column_names = set()
 
     for row in data:
         parsed_row = {}
@@ -113,14 +115,18 @@ def parse_json(data, path, fields):
                         continue
 
                     value = row[key][inner_key]
-                    add_column(columns, column_name, _get_type(value))
+                    if column_name not in column_names:
+                        column_names.add(column_name)
+                        add_column(columns, column_name, _get_type(value))
                     parsed_row[column_name] = value
             else:
                 if fields and key not in fields:
                     continue
 
                 value = row[key]
-                add_column(columns, key, _get_type(value))
+                if key not in column_names:
+                    column_names.add(key)
+                    add_column(columns, key, _get_type(value))
                 parsed_row[key] = row[key]
 
         rows.append(parsed_row)
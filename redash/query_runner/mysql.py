@@ -1,7 +1,10 @@
 import logging
 import os
+import queue
 import threading
 
+import sqlparse
+
 from redash.query_runner import (
     TYPE_FLOAT,
     TYPE_INTEGER,
@@ -9,15 +12,18 @@ from redash.query_runner import (
     TYPE_STRING,
     TYPE_DATE,
     BaseSQLQueryRunner,
+    FETCH_BATCH_SIZE,
     InterruptException,
     JobTimeoutException,
+    ResultStream,
     register,
 )
 from redash.settings import parse_boolean
-from redash.utils import json_dumps, json_loads
+from redash.utils import json_loads
 
 try:
     import MySQLdb
+    import MySQLdb.cursors
 
     enabled = True
 except ImportError:
@@ -44,13 +50,22 @@ types_map = {
 }
 
 
-class Result(object):
-    def __init__(self):
-        pass
+def _is_single_select(query):
+    """
+    Whether `query` is a single SELECT statement, which returns a single result set that can
+    be read from the server as it is fetched.
+    """
+    statements = [
+        statement
+        for statement in sqlparse.parse(sqlparse.format(query, strip_comments=True))
+        if str(statement).strip(" \t\r\n;")
+    ]
+    return len(statements) == 1 and statements[0].get_type() == "SELECT"
 
 
 class Mysql(BaseSQLQueryRunner):
     noop_query = "SELECT 1"
+    streams_results = True
 
     @classmethod
     def configuration_schema(cls):
@@ -152,69 +167,133 @@ class Mysql(BaseSQLQueryRunner):
         return list(schema.values())
 
 
-    def run_query(self, query, user):
-        ev = threading.Event()
-        thread_id = ""
-        r = Result()
-        t = None
+    def run_query_stream(self, query, user):
+        connection = self._connection()
+        thread_id = connection.thread_id()
+        # the query runs in a thread (so it can be killed), which hands over a few batches
+        # of rows at a time
+        results = queue.Queue(maxsize=2)
+        stopped = threading.Event()
+        finished = threading.Event()
+        t = threading.Thread(
+            target=self._run_query,
+            args=(query, connection, results, stopped, finished),
+        )
+        t.start()
+
+        def stop():
+            stopped.set()
+            if not finished.is_set():
+                self._cancel(thread_id)
+            t.join()
 
         try:
-            connection = self._connection()
-            thread_id = connection.thread_id()
-            t = threading.Thread(
-                target=self._run_query, args=(query, user, connection, r, ev)
-            )
-            t.start()
-            while not ev.wait(1):
-                pass
+            kind, value = self._receive(results)
         except (KeyboardInterrupt, InterruptException, JobTimeoutException):
-            self._cancel(thread_id)
+            stop()
+            raise
+
+        if kind == "error":
             t.join()
+            raise Exception(value)
+
+        columns, metadata = value
+        stream = ResultStream(columns, self._batches(results, stop), metadata)
+        stream.add_close_callback(stop)
+        return stream
+
+    def run_query(self, query, user):
+        return self.run_query_from_stream(query, user)
+
+    def _receive(self, results):
+        # waits in short intervals, so the job can be interrupted
+        while True:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                pass
+
+    def _batches(self, results, stop):
+        try:
+            while True:
+                kind, value = self._receive(results)
+                if kind == "error":
+                    raise Exception(value)
+                if kind == "done":
+                    break
+                yield value
+        except (KeyboardInterrupt, InterruptException, JobTimeoutException):
+            stop()
             raise
 
-        return r.json_data, r.error
+    def _columns(self, description):
+        return self.fetch_columns(
+            [(i[0], types_map.get(i[1], None)) for i in description]
+        )
 
-    def _run_query(self, query, user, connection, r, ev):
+    def _run_query(self, query, connection, results, stopped, finished):
+        def put(message):
+            # gives up once the stream is closed
+            while not stopped.is_set():
+                try:
+                    results.put(message, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        message = ("done", None)
         try:
-            cursor = connection.cursor()
             logger.debug("MySQL running query: %s", query)
-            cursor.execute(query)
-
-            data = cursor.fetchall()
-            desc = cursor.description
-
-            while cursor.nextset():
-                if cursor.description is not None:
-                    data = cursor.fetchall()
-                    desc = cursor.description
-
-            # TODO - very similar to pg.py
-            if desc is not None:
-                columns = self.fetch_columns(
-                    [(i[0], types_map.get(i[1], None)) for i in desc]
-                )
-                rows = [
-                    dict(zip((column["name"] for column in columns), row))
-                    for row in data
-                ]
-
-                data = {"columns": columns, "rows": rows}
-                r.json_data = json_dumps(data)
-                r.error = None
+            if _is_single_select(query):
+                # an unbuffered cursor reads the rows from the server as they are fetched
+                cursor = connection.cursor(MySQLdb.cursors.SSCursor)
+                cursor.execute(query)
+                if put(("columns", (self._columns(cursor.description), None))):
+                    while True:
+                        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+                        if not batch or not put(("rows", batch)):
+                            break
             else:
-                r.json_data = None
-                r.error = "No data was returned."
-
-            cursor.close()
+                message = self._run_statements(query, connection, put)
         except MySQLdb.Error as e:
-            if cursor:
-                cursor.close()
-            r.json_data = None
-            r.error = e.args[1]
+            message = ("error", e.args[1])
         finally:
-            ev.set()
-            if connection:
-                connection.close()
+            finished.set()
+            put(message)
+            connection.close()
+
+    def _run_statements(self, query, connection, put):
+        """
+        Runs a query of several statements (or other statements than SELECT), which returns
+        the rows of its last result set with columns. The result sets before it have to be
+        read to tell it apart, so the rows of each are fetched (within the result budget) before
+        they're handed over.
+        """
+        cursor = connection.cursor()
+        cursor.execute(query)
+
+        desc = None
+        while True:
+            if cursor.description is not None:
+                desc = cursor.description
+                columns = self._columns(desc)
+                budget = self.result_budget()
+                rows = budget.fetch(cursor, columns)
+            if not cursor.nextset():
+                break
+
+        cursor.close()
+
+        # TODO - very similar to pg.py
+        if desc is None:
+            return ("error", "No data was returned.")
+
+        names = [column["name"] for column in columns]
+        metadata = budget.mark({}).get("metadata")
+        if put(("columns", (columns, metadata))) and rows:
+            put(("rows", [tuple(row[name] for name in names) for row in rows]))
+        return ("done", None)
 
     def _get_ssl_parameters(self):
         if not self.configuration.get("use_ssl"):
@@ -7,10 +7,12 @@ from tempfile import NamedTemporaryFile
 from uuid import uuid4
 
 import psycopg2
+import sqlparse
 from psycopg2.extras import Range
+from sqlparse import tokens
 
 from redash.query_runner import *
-from redash.utils import JSONEncoder, json_dumps, json_loads
+from redash.utils import JSONEncoder, json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +72,41 @@ def _wait(conn, timeout=None):
             raise psycopg2.OperationalError("select.error received")
 
 
+def _is_single_select(query):
+    """
+    Whether `query` is a single SELECT statement (possibly with a WITH clause) that doesn't
+    modify data, so it can be declared as a cursor.
+    """
+    statements = [
+        statement
+        for statement in sqlparse.parse(sqlparse.format(query, strip_comments=True))
+        if str(statement).strip(" \t\r\n;")
+    ]
+    if len(statements) != 1 or statements[0].get_type() != "SELECT":
+        return False
+
+    for token in statements[0].flatten():
+        # data-modifying WITH clauses, SELECT ... FOR UPDATE
+        if token.ttype in tokens.DML and token.normalized != "SELECT":
+            return False
+        # SELECT ... INTO creates a table
+        if token.ttype in tokens.Keyword and token.normalized == "INTO":
+            return False
+
+    return True
+
+
+@contextmanager
+def _interruptible(connection):
+    try:
+        yield
+    except (select.error, OSError):
+        raise Exception("Query interrupted. Please retry.")
+    except (KeyboardInterrupt, InterruptException, JobTimeoutException):
+        connection.cancel()
+        raise
+
+
 def full_table_name(schema, name):
     if "." in name:
         name = u'"{}"'.format(name)
@@ -135,6 +172,8 @@ def _get_ssl_config(configuration):
 
 class PostgreSQL(BaseSQLQueryRunner):
     noop_query = "SELECT 1"
+    streams_results = True
+    use_server_side_cursor = True
 
     @classmethod
     def configuration_schema(cls):
@@ -248,48 +287,90 @@ class PostgreSQL(BaseSQLQueryRunner):
 
         return connection
 
-    def run_query(self, query, user):
-        connection = self._get_connection()
-        _wait(connection, timeout=10)
-
-        cursor = connection.cursor()
+    def _execute(self, connection, cursor, query):
+        """
+        Executes `query` and returns a function that fetches the next batch of its rows, and
+        whether it runs through a server-side cursor.
 
-        try:
-            cursor.execute(query)
+        Single SELECT statements run through a server-side cursor, so rows are transferred in
+        batches. Other queries (like ones with several statements, which return the rows of
+        the last one) run as they are.
+        """
+        if self.use_server_side_cursor and _is_single_select(query):
+            cursor.execute("BEGIN")
+            _wait(connection)
+            cursor.execute("DECLARE redash_rows NO SCROLL CURSOR FOR {}".format(query))
             _wait(connection)
 
-            if cursor.description is not None:
-                columns = self.fetch_columns(
-                    [(i[0], types_map.get(i[1], None)) for i in cursor.description]
+            def fetch():
+                cursor.execute(
+                    "FETCH FORWARD {} FROM redash_rows".format(FETCH_BATCH_SIZE)
                 )
-                rows = [
-                    dict(zip((column["name"] for column in columns), row))
-                    for row in cursor
-                ]
-
-                data = {"columns": columns, "rows": rows}
-                error = None
-                json_data = json_dumps(data, ignore_nan=True, cls=PostgreSQLJSONEncoder)
-            else:
-                error = "Query completed but it returned no data."
-                json_data = None
-        except (select.error, OSError) as e:
-            error = "Query interrupted. Please retry."
-            json_data = None
-        except psycopg2.DatabaseError as e:
-            error = str(e)
-            json_data = None
-        except (KeyboardInterrupt, InterruptException, JobTimeoutException):
-            connection.cancel()
-            raise
+                _wait(connection)
+                return cursor.fetchall()
+
+            return fetch, True
+
+        cursor.execute(query)
+        _wait(connection)
+
+        def fetch():
+            # statements that don't return rows have no description
+            if cursor.description is None:
+                return []
+            return cursor.fetchmany(FETCH_BATCH_SIZE)
+
+        return fetch, False
+
+    def _batches(self, connection, cursor, fetch, declared, batch):
+        try:
+            with _interruptible(connection):
+                while batch:
+                    yield batch
+                    batch = fetch()
+
+                # statements running without a server-side cursor are autocommitted
+                if declared:
+                    cursor.execute("COMMIT")
+                    _wait(connection)
         finally:
             connection.close()
             _cleanup_ssl_certs(self.ssl_config)
 
-        return json_data, error
+    def run_query_stream(self, query, user):
+        connection = self._get_connection()
+
+        try:
+            with _interruptible(connection):
+                _wait(connection, timeout=10)
+                cursor = connection.cursor()
+                fetch, declared = self._execute(connection, cursor, query)
+                batch = fetch()
+
+            if cursor.description is None:
+                raise Exception("Query completed but it returned no data.")
+
+            columns = self.fetch_columns(
+                [(i[0], types_map.get(i[1], None)) for i in cursor.description]
+            )
+        except BaseException:
+            connection.close()
+            _cleanup_ssl_certs(self.ssl_config)
+            raise
+
+        return ResultStream(
+            columns,
+            self._batches(connection, cursor, fetch, declared, batch),
+            json_encoder=PostgreSQLJSONEncoder,
+        )
+
+    def run_query(self, query, user):
+        return self.run_query_from_stream(query, user)
 
 
 class Redshift(PostgreSQL):
+    # Redshift materializes the results of cursors on its leader node first
+    use_server_side_cursor = False
 
     @classmethod
     def type(cls):
@@ -529,6 +610,8 @@ class RedshiftIAM(Redshift):
 
 
 class CockroachDB(PostgreSQL):
+    use_server_side_cursor = False
+
     @classmethod
     def type(cls):
         return "cockroach"
@@ -1,17 +1,24 @@
+import hashlib
 import logging
+import os
 import re
 import sqlite3
+import tempfile
 
-from redash import models
+from redash import models, settings
 from redash.permissions import has_access, view_only
 from redash.query_runner import (
     BaseQueryRunner,
-    TYPE_STRING,
-    guess_type,
+    ColumnTypes,
+    FETCH_BATCH_SIZE,
+    ResultStream,
+    TYPE_BOOLEAN,
+    TYPE_FLOAT,
+    TYPE_INTEGER,
     register,
     JobTimeoutException,
 )
-from redash.utils import json_dumps, json_loads
+from redash.utils import json_dumps, json_loads, result_rows
 
 logger = logging.getLogger(__name__)
 
@@ -67,16 +74,39 @@ def get_query_results(user, query_id, bring_from_cache):
     return results
 
 
+def _load_cached_query_result(user, query_id):
+    query = _load_query(user, query_id)
+    if query.latest_query_data_id is None:
+        raise Exception("No cached result available for query {}.".format(query.id))
+
+    return query
+
+
 def create_tables_from_query_ids(user, connection, query_ids, cached_query_ids=[]):
+    """
+    Creates a `cached_query_N` table for every id in `cached_query_ids` and a `query_N` table
+    for every id in `query_ids`. Returns the `(schema, table)` each table is stored in, which
+    differ from `("main", table_name)` for results attached from the cache.
+    """
+    tables = {}
+    cache_files = set()
+
     for query_id in set(cached_query_ids):
-        results = get_query_results(user, query_id, True)
+        query = _load_cached_query_result(user, query_id)
         table_name = "cached_query_{query_id}".format(query_id=query_id)
-        create_table(connection, table_name, results)
+        tables[table_name] = attach_cached_table(connection, table_name, query)
+        cache_files.add(_cache_file(query.latest_query_data_id))
+
+    if settings.QUERY_RESULTS_RUNNER_CACHE_PATH and cache_files:
+        evict_cached_results(keep=cache_files)
 
     for query_id in set(query_ids):
         results = get_query_results(user, query_id, False)
         table_name = "query_{query_id}".format(query_id=query_id)
         create_table(connection, table_name, results)
+        tables[table_name] = ("main", table_name)
+
+    return tables
 
 
 def fix_column_name(name):
@@ -90,14 +120,37 @@ def flatten(value):
         return value
 
 
+# Column types of the tables results are loaded into, so values compare (and are indexed)
+# as numbers. Columns of other types have no type, which keeps their values as they are.
+SQLITE_COLUMN_TYPES = {
+    TYPE_INTEGER: "INTEGER",
+    TYPE_BOOLEAN: "INTEGER",
+    TYPE_FLOAT: "REAL",
+}
+
+
 def create_table(connection, table_name, query_results):
-    try:
-        columns = [column["name"] for column in query_results["columns"]]
-        safe_columns = [fix_column_name(column) for column in columns]
+    columns = [column["name"] for column in query_results["columns"]]
+    rows = ([row.get(column) for column in columns] for row in query_results["rows"])
+    load_table(connection, table_name, query_results["columns"], rows)
 
-        column_list = ", ".join(safe_columns)
-        create_table = "CREATE TABLE {table_name} ({column_list})".format(
-            table_name=table_name, column_list=column_list
+
+def load_table(connection, table_name, columns, rows):
+    """
+    Creates `table_name` with `columns` and loads `rows` (sequences of values ordered like the
+    columns) into it with a single statement, in one transaction.
+    """
+    try:
+        column_list = ", ".join(fix_column_name(column["name"]) for column in columns)
+        column_definitions = ", ".join(
+            "{} {}".format(
+                fix_column_name(column["name"]),
+                SQLITE_COLUMN_TYPES.get(column.get("type"), ""),
+            ).strip()
+            for column in columns
+        )
+        create_table = "CREATE TABLE {table_name} ({column_definitions})".format(
+            table_name=table_name, column_definitions=column_definitions
         )
         logger.debug("CREATE TABLE query: %s", create_table)
         connection.execute(create_table)
@@ -112,14 +165,169 @@ def create_table(connection, table_name, query_results):
         place_holders=",".join(["?"] * len(columns)),
     )
 
-    for row in query_results["rows"]:
-        values = [flatten(row.get(column)) for column in columns]
-        connection.execute(insert_template, values)
+    with connection:
+        connection.executemany(
+            insert_template, ([flatten(value) for value in row] for row in rows)
+        )
+
+
+CACHE_TABLE = "result"
+CACHE_MMAP_SIZE = 256 * 1024 * 1024
+
+
+def _cache_file(query_result_id):
+    return os.path.join(
+        settings.QUERY_RESULTS_RUNNER_CACHE_PATH,
+        "query_result_{}.sqlite".format(query_result_id),
+    )
+
+
+def materialize_query_result(query_result, path):
+    """Writes the rows of `query_result` into the `result` table of a new SQLite database at
+    `path`. The database is written next to it first, so it's never read half written."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+
+    try:
+        connection = sqlite3.connect(temp_path)
+        try:
+            load_table(
+                connection,
+                CACHE_TABLE,
+                query_result.columns or [],
+                query_result.iter_rows(result_rows.ARRAYS),
+            )
+        finally:
+            connection.close()
+
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def evict_cached_results(keep=()):
+    """Removes the least recently used cached results (other than the ones at the paths in
+    `keep`) over QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE."""
+    files = []
+    for entry in os.scandir(settings.QUERY_RESULTS_RUNNER_CACHE_PATH):
+        if not entry.name.endswith(".sqlite"):
+            continue
+
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            # removed by another worker
+            continue
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    size = sum(file_size for _, file_size, _ in files)
+    max_size = settings.QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE * 1024 * 1024
+    for _, file_size, path in sorted(files):
+        if size <= max_size:
+            break
+        if path in keep:
+            continue
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        size -= file_size
+
+
+def _load_latest_query_result(connection, table_name, query):
+    query_result = query.latest_query_data
+    rows = query_result.iter_rows(result_rows.ARRAYS)
+    load_table(connection, table_name, query_result.columns or [], rows)
+    return ("main", table_name)
+
+
+def attach_cached_table(connection, table_name, query):
+    """
+    Makes the latest result of `query` available as `table_name`: when the cache is enabled,
+    by attaching the database of the result (materializing it first if needed) and creating
+    a view of its table, and otherwise by loading the result into `connection`.
+    """
+    if not settings.QUERY_RESULTS_RUNNER_CACHE_PATH:
+        return _load_latest_query_result(connection, table_name, query)
+
+    path = _cache_file(query.latest_query_data_id)
+    try:
+        # the modification time tells which results were used last
+        os.utime(path)
+    except FileNotFoundError:
+        materialize_query_result(query.latest_query_data, path)
+
+    schema = "{}_db".format(table_name)
+    try:
+        connection.execute("ATTACH DATABASE ? AS {}".format(schema), (path,))
+    except sqlite3.OperationalError:
+        # e.g. more cached tables than databases SQLite can attach (10 by default)
+        logger.warning(
+            "Couldn't attach the cached result of %s.", table_name, exc_info=True
+        )
+        return _load_latest_query_result(connection, table_name, query)
+
+    connection.execute("PRAGMA {}.mmap_size = {}".format(schema, CACHE_MMAP_SIZE))
+    connection.execute(
+        "CREATE TEMP VIEW {} AS SELECT * FROM {}.{}".format(
+            table_name, schema, CACHE_TABLE
+        )
+    )
+
+    return (schema, CACHE_TABLE)
+
+
+def extract_index_hints(query):
+    """
+    Returns the `(table_name, columns)` of the indexes requested with comments like
+    `-- index: cached_query_123(user_id, created_at)`, which create an index on those columns
+    of a table before running the query. Indexes of cached tables are kept with the cached
+    result, so they're only created once.
+    """
+    hints = re.findall(
+        r"--\s*index:\s*((?:cached_)?query_\d+)\s*\(([^)]*)\)", query, re.IGNORECASE
+    )
+    return [
+        (table_name.lower(), [column.strip() for column in columns.split(",")])
+        for table_name, columns in hints
+    ]
+
+
+def create_indexes(connection, tables, index_hints):
+    for table_name, columns in index_hints:
+        if table_name not in tables:
+            raise Exception(
+                "Can't create an index on {}: the query doesn't use it.".format(
+                    table_name
+                )
+            )
+
+        schema, table = tables[table_name]
+        column_list = ", ".join(fix_column_name(column) for column in columns)
+        index_name = "index_{}".format(
+            hashlib.md5(column_list.encode("utf-8")).hexdigest()[:12]
+        )
+        try:
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS {}.{} ON {} ({})".format(
+                    schema, index_name, table, column_list
+                )
+            )
+        except sqlite3.OperationalError:
+            if schema == "main":
+                raise
+            # the cached result is locked or was evicted by another worker after it was
+            # attached: the query runs without the index
+            logger.warning("Couldn't create index on %s.", table_name, exc_info=True)
 
 
 class Results(BaseQueryRunner):
     should_annotate_query = False
     noop_query = "SELECT 1"
+    streams_results = True
 
     @classmethod
     def configuration_schema(cls):
@@ -129,47 +337,50 @@ class Results(BaseQueryRunner):
     def name(cls):
         return "Query Results"
 
-    def run_query(self, query, user):
+    def run_query_stream(self, query, user):
         connection = sqlite3.connect(":memory:")
 
-        query_ids = extract_query_ids(query)
-        cached_query_ids = extract_cached_query_ids(query)
-        create_tables_from_query_ids(user, connection, query_ids, cached_query_ids)
-
-        cursor = connection.cursor()
-
         try:
+            query_ids = extract_query_ids(query)
+            cached_query_ids = extract_cached_query_ids(query)
+            tables = create_tables_from_query_ids(
+                user, connection, query_ids, cached_query_ids
+            )
+            create_indexes(connection, tables, extract_index_hints(query))
+
+            cursor = connection.cursor()
             cursor.execute(query)
 
-            if cursor.description is not None:
-                columns = self.fetch_columns([(i[0], None) for i in cursor.description])
+            if cursor.description is None:
+                raise Exception("Query completed but it returned no data.")
 
-                rows = []
-                column_names = [c["name"] for c in columns]
+            columns = self.fetch_columns([(i[0], None) for i in cursor.description])
+        except BaseException:
+            connection.close()
+            raise
 
-                for i, row in enumerate(cursor):
-                    for j, col in enumerate(row):
-                        guess = guess_type(col)
+        return ResultStream(columns, self._batches(connection, cursor, columns))
 
-                        if columns[j]["type"] is None:
-                            columns[j]["type"] = guess
-                        elif columns[j]["type"] != guess:
-                            columns[j]["type"] = TYPE_STRING
+    def _batches(self, connection, cursor, columns):
+        column_types = ColumnTypes(len(columns))
+        try:
+            while True:
+                batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not batch:
+                    break
 
-                    rows.append(dict(zip(column_names, row)))
+                for column, column_type in zip(columns, column_types.update(batch)):
+                    column["type"] = column_type
 
-                data = {"columns": columns, "rows": rows}
-                error = None
-                json_data = json_dumps(data)
-            else:
-                error = "Query completed but it returned no data."
-                json_data = None
+                yield batch
         except (KeyboardInterrupt, JobTimeoutException):
             connection.cancel()
             raise
         finally:
             connection.close()
-        return json_data, error
+
+    def run_query(self, query, user):
+        return self.run_query_from_stream(query, user)
 
 
 register(Results)
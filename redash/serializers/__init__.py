@@ -8,6 +8,7 @@ from funcy import project
 from flask_login import current_user
 from rq.job import JobStatus
 from rq.timeouts import JobTimeoutException
+from sqlalchemy.orm import joinedload
 
 from redash import models
 from redash.permissions import has_access, view_only
@@ -18,6 +19,8 @@ from redash.models.parameterized_query import ParameterizedQuery
 from .query_result import (
     serialize_query_result,
     serialize_query_result_to_dsv,
+    serialize_query_result_to_dsv_stream,
+    serialize_query_result_to_json,
     serialize_query_result_to_xlsx,
 )
 
@@ -46,6 +49,7 @@ def public_widget(widget):
                 "name": v.query_rel.name,
                 "description": v.query_rel.description,
                 "options": v.query_rel.options,
+                "latest_query_data_id": v.query_rel.latest_query_data_id,
             },
         }
 
@@ -215,16 +219,45 @@ def serialize_alert(alert, full=True):
     return d
 
 
+def has_access_to_widget(widget, user, data_source_groups):
+    query = widget.visualization.query_rel
+    if user.is_api_user():
+        return has_access(query, user, view_only)
+
+    groups = data_source_groups.get(query.data_source_id, {})
+    return has_access(groups, user, view_only)
+
+
 def serialize_dashboard(obj, with_widgets=False, user=None, with_favorite_state=True):
     layout = json_loads(obj.layout)
 
     widgets = []
 
     if with_widgets:
-        for w in obj.widgets:
+        dashboard_widgets = (
+            obj.widgets.options(
+                joinedload(models.Widget.visualization)
+                .joinedload(models.Visualization.query_rel)
+                .joinedload(models.Query.user),
+                joinedload(models.Widget.visualization)
+                .joinedload(models.Visualization.query_rel)
+                .joinedload(models.Query.last_modified_by),
+            )
+            .order_by(models.Widget.id)
+            .all()
+        )
+        data_source_groups = models.DataSource.groups_for(
+            set(
+                w.visualization.query_rel.data_source_id
+                for w in dashboard_widgets
+                if w.visualization_id is not None
+            )
+        )
+
+        for w in dashboard_widgets:
             if w.visualization_id is None:
                 widgets.append(serialize_widget(w))
-            elif user and has_access(w.visualization.query_rel, user, view_only):
+            elif user and has_access_to_widget(w, user, data_source_groups):
                 widgets.append(serialize_widget(w))
             else:
                 widget = project(
@@ -1,12 +1,27 @@
 import io
 import csv
+import re
 import xlsxwriter
 from funcy import rpartial, project
 from dateutil.parser import isoparse as parse_date
-from redash.utils import json_loads, UnicodeWriter
+from redash.utils import json_dumps, json_loads, UnicodeWriter, result_rows
 from redash.query_runner import TYPE_BOOLEAN, TYPE_DATE, TYPE_DATETIME
 from redash.authentication.org_resolving import current_org
 
+DSV_STREAM_CHUNK_SIZE = 64 * 1024
+
+# A NaN or Infinity value, which isn't valid JSON. Values follow "[", "," or ":", so the
+# words within strings (like "Infinity War") don't match, unless they follow one of those
+# (which only sends the result through the encoder).
+NON_FINITE_NUMBER_RE = re.compile(r"[\[,:]\s*-?(?:NaN|Infinity)\s*[,}\]]")
+
+
+def _has_non_finite_numbers(json_text):
+    # the substring search rules most results out faster than the pattern
+    if "NaN" not in json_text and "Infinity" not in json_text:
+        return False
+    return NON_FINITE_NUMBER_RE.search(json_text) is not None
+
 
 def _convert_format(fmt):
     return (
@@ -71,6 +86,32 @@ def _get_column_lists(columns):
     return fieldnames, special_columns
 
 
+def serialize_query_result_to_json(
+    query_result, offset=None, limit=None, row_format=result_rows.OBJECTS
+):
+    """
+    Returns the `{"query_result": {...}}` response document of a result as JSON text, with
+    the rows in `row_format`.
+
+    When the whole result is requested and it's stored as JSON in the requested row format,
+    the stored text is spliced into the document as is, instead of being decoded and encoded
+    again.
+    """
+    data_json = None
+    if offset is None and limit is None and query_result.row_format == row_format:
+        data_json = query_result.data_json
+
+    # NaN/Infinity aren't valid JSON, and results stored by older versions may contain them:
+    # those go through the encoder, which replaces them with nulls
+    if data_json is None or _has_non_finite_numbers(data_json):
+        return json_dumps(
+            {"query_result": query_result.to_dict(offset, limit, row_format=row_format)}
+        )
+
+    document = json_dumps({"query_result": query_result.to_dict(with_data=False)})
+    return "".join([document[:-2], ', "data": ', data_json, "}}"])
+
+
 def serialize_query_result(query_result, is_api_user):
     if is_api_user:
         publicly_needed_keys = ["data", "retrieved_at"]
@@ -79,41 +120,53 @@ def serialize_query_result(query_result, is_api_user):
         return query_result.to_dict()
 
 
-def serialize_query_result_to_dsv(query_result, delimiter):
+def serialize_query_result_to_dsv_stream(query_result, delimiter):
+    """Yields the result as delimiter separated values in chunks of roughly
+    DSV_STREAM_CHUNK_SIZE characters, decoding one row at a time."""
+    fieldnames, special_columns = _get_column_lists(query_result.columns or [])
+    converters = [
+        (i, special_columns[name])
+        for i, name in enumerate(fieldnames)
+        if name in special_columns
+    ]
+
     s = io.StringIO()
+    writer = csv.writer(s, delimiter=delimiter)
+    writer.writerow(fieldnames)
 
-    query_data = query_result.data
+    # rows as arrays ordered like the columns, with None (written as an empty field) for
+    # the values missing from row objects
+    for values in query_result.iter_rows(result_rows.ARRAYS):
+        if converters:
+            values = list(values)
+            for i, converter in converters:
+                values[i] = converter(values[i])
 
-    fieldnames, special_columns = _get_column_lists(query_data["columns"] or [])
+        writer.writerow(values)
 
-    writer = csv.DictWriter(s, extrasaction="ignore", fieldnames=fieldnames, delimiter=delimiter)
-    writer.writeheader()
+        if s.tell() >= DSV_STREAM_CHUNK_SIZE:
+            yield s.getvalue()
+            s.seek(0)
+            s.truncate()
 
-    for row in query_data["rows"]:
-        for col_name, converter in special_columns.items():
-            if col_name in row:
-                row[col_name] = converter(row[col_name])
+    yield s.getvalue()
 
-        writer.writerow(row)
 
-    return s.getvalue()
+def serialize_query_result_to_dsv(query_result, delimiter):
+    return "".join(serialize_query_result_to_dsv_stream(query_result, delimiter))
 
 
 def serialize_query_result_to_xlsx(query_result):
     output = io.BytesIO()
 
-    query_data = query_result.data
     book = xlsxwriter.Workbook(output, {"constant_memory": True})
     sheet = book.add_worksheet("result")
 
-    column_names = []
-    for c, col in enumerate(query_data["columns"]):
+    for c, col in enumerate(query_result.columns or []):
         sheet.write(0, c, col["name"])
-        column_names.append(col["name"])
 
-    for r, row in enumerate(query_data["rows"]):
-        for c, name in enumerate(column_names):
-            v = row.get(name)
+    for r, row in enumerate(query_result.iter_rows(result_rows.ARRAYS)):
+        for c, v in enumerate(row):
             if isinstance(v, (dict, list)):
                 v = str(v)
             sheet.write(r + 1, c, v)
@@ -55,6 +55,35 @@ QUERY_RESULTS_CLEANUP_MAX_AGE = int(
     os.environ.get("REDASH_QUERY_RESULTS_CLEANUP_MAX_AGE", "7")
 )
 
+# The library used by redash.utils.json_dumps/json_loads: "simplejson", or "orjson" (faster, needs the
+# orjson package). Calls with options orjson doesn't support always use simplejson.
+JSON_BACKEND = os.environ.get("REDASH_JSON_BACKEND", "simplejson")
+
+# How query results are stored: "json" (as returned by the query runner) or "columnar"
+# (compressed columnar encoding, see redash.utils.columnar). Results stored in either format
+# remain readable when switching to "columnar".
+QUERY_RESULTS_STORAGE_FORMAT = os.environ.get(
+    "REDASH_QUERY_RESULTS_STORAGE_FORMAT", "json"
+)
+
+# The row format of the results stored by query runners that stream their results: "objects"
+# (a row object keyed by column name per row) or "arrays" (rows as arrays of values, about 40%
+# smaller; see redash.utils.result_rows). Results stored in either format are served in the
+# format requested by API clients.
+QUERY_RESULTS_ROW_FORMAT = os.environ.get("REDASH_QUERY_RESULTS_ROW_FORMAT", "objects")
+
+# For how long (in seconds) to keep the id of the latest result of each query in Redis, so executions
+# that can use a cached result don't need to search the query_results table. Set to 0 to disable.
+QUERY_RESULTS_LATEST_CACHE_TTL = int(
+    os.environ.get("REDASH_QUERY_RESULTS_LATEST_CACHE_TTL", "3600")
+)
+
+# For how long (in seconds) to keep the rendered payload of public dashboards in Redis. Snapshots are
+# replaced as soon as the dashboard or its queries' results change. Set to 0 to disable.
+PUBLIC_DASHBOARD_SNAPSHOT_TTL = int(
+    os.environ.get("REDASH_PUBLIC_DASHBOARD_SNAPSHOT_TTL", "3600")
+)
+
 SCHEMAS_REFRESH_SCHEDULE = int(os.environ.get("REDASH_SCHEMAS_REFRESH_SCHEDULE", 30))
 
 AUTH_TYPE = os.environ.get("REDASH_AUTH_TYPE", "api_key")
@@ -238,6 +267,48 @@ SCHEDULED_QUERY_TIME_LIMIT = int(
 # Time limit (in seconds) for adhoc queries. Set this to -1 to execute without a time limit.
 ADHOC_QUERY_TIME_LIMIT = int(os.environ.get("REDASH_ADHOC_QUERY_TIME_LIMIT", -1))
 
+# Maximum number of queries of a single data source/organization executed at the same time.
+# Queries over the limit wait in their queue without occupying a work horse. Set to 0 to
+# execute without a limit (see also dynamic_settings.query_concurrency_limits).
+DATA_SOURCE_QUERY_CONCURRENCY_LIMIT = int(
+    os.environ.get("REDASH_DATA_SOURCE_QUERY_CONCURRENCY_LIMIT", 0)
+)
+ORG_QUERY_CONCURRENCY_LIMIT = int(
+    os.environ.get("REDASH_ORG_QUERY_CONCURRENCY_LIMIT", 0)
+)
+
+# Maximum number of rows and size (in bytes, serialized as JSON) of query results. Results over
+# the limit are truncated and flagged with metadata.truncated. Set to 0 to store results of any
+# size (see also dynamic_settings.query_result_limits).
+QUERY_RESULTS_MAX_ROWS = int(os.environ.get("REDASH_QUERY_RESULTS_MAX_ROWS", 0))
+QUERY_RESULTS_MAX_BYTES = int(os.environ.get("REDASH_QUERY_RESULTS_MAX_BYTES", 0))
+
+# Directory where the Query Results data source keeps the results it loads as cached_query_N
+# tables, as SQLite databases that later queries of the same results attach instead of loading
+# them again (stored results never change, so they never go stale). The least recently used
+# databases are removed once they take more than QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE megabytes.
+# Results aren't kept on disk when the path is empty.
+QUERY_RESULTS_RUNNER_CACHE_PATH = os.environ.get(
+    "REDASH_QUERY_RESULTS_RUNNER_CACHE_PATH", ""
+)
+QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE = int(
+    os.environ.get("REDASH_QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE", 1024)
+)
+
+# Data sources connecting through SSH tunnels reuse open tunnels until they are idle for
+# this many seconds (0 opens a new tunnel for every query). At most SSH_TUNNEL_MAX_TUNNELS
+# tunnels are kept open by each process. Forking workers close them at the end of every job,
+# so they are only reused across jobs by non-forking workers (`rq worker --no-fork`).
+SSH_TUNNEL_IDLE_TIMEOUT = int(os.environ.get("REDASH_SSH_TUNNEL_IDLE_TIMEOUT", 300))
+SSH_TUNNEL_MAX_TUNNELS = int(os.environ.get("REDASH_SSH_TUNNEL_MAX_TUNNELS", 10))
+
+# The groups that have access to a data source are loaded once per request. Set this to keep
+# them in each process' memory for this many seconds as well; permission changes made in
+# other processes only apply there after it expires.
+DATA_SOURCE_PERMISSIONS_CACHE_TTL = int(
+    os.environ.get("REDASH_DATA_SOURCE_PERMISSIONS_CACHE_TTL", 0)
+)
+
 JOB_EXPIRY_TIME = int(os.environ.get("REDASH_JOB_EXPIRY_TIME", 3600 * 12))
 JOB_DEFAULT_FAILURE_TTL = int(
     os.environ.get("REDASH_JOB_DEFAULT_FAILURE_TTL", 7 * 24 * 60 * 60)
@@ -290,6 +361,20 @@ ALERTS_DEFAULT_MAIL_SUBJECT_TEMPLATE = os.environ.get(
     "REDASH_ALERTS_DEFAULT_MAIL_SUBJECT_TEMPLATE", "({state}) {alert_name}"
 )
 
+# Alert notifications are delivered by a job per subscription. A failed delivery is
+# retried up to ALERT_NOTIFICATION_MAX_RETRIES times, waiting
+# ALERT_NOTIFICATION_RETRY_BACKOFF seconds before the first retry and doubling the wait
+# before each of the next ones.
+ALERT_NOTIFICATION_TIMEOUT = int(
+    os.environ.get("REDASH_ALERT_NOTIFICATION_TIMEOUT", 60)
+)
+ALERT_NOTIFICATION_MAX_RETRIES = int(
+    os.environ.get("REDASH_ALERT_NOTIFICATION_MAX_RETRIES", 3)
+)
+ALERT_NOTIFICATION_RETRY_BACKOFF = int(
+    os.environ.get("REDASH_ALERT_NOTIFICATION_RETRY_BACKOFF", 30)
+)
+
 # How many requests are allowed per IP to the login page before
 # being throttled?
 # See https://flask-limiter.readthedocs.io/en/stable/#rate-limit-string-notation
@@ -410,6 +495,14 @@ EVENT_REPORTING_WEBHOOKS = array_from_string(
     os.environ.get("REDASH_EVENT_REPORTING_WEBHOOKS", "")
 )
 
+# Events are buffered in Redis and recorded in batches every EVENTS_FLUSH_INTERVAL seconds
+EVENTS_FLUSH_INTERVAL = int(os.environ.get("REDASH_EVENTS_FLUSH_INTERVAL", 10))
+EVENTS_FLUSH_BATCH_SIZE = int(os.environ.get("REDASH_EVENTS_FLUSH_BATCH_SIZE", 1000))
+# For how many days to keep events (0 keeps them forever). When the events table is partitioned
+# by month, whole partitions are dropped once all their events are older than that.
+EVENTS_RETENTION_DAYS = int(os.environ.get("REDASH_EVENTS_RETENTION_DAYS", 0))
+EVENTS_CLEANUP_COUNT = int(os.environ.get("REDASH_EVENTS_CLEANUP_COUNT", 10000))
+
 # Support for Sentry (https://getsentry.com/). Just set your Sentry DSN to enable it:
 SENTRY_DSN = os.environ.get("REDASH_SENTRY_DSN", "")
 SENTRY_ENVIRONMENT = os.environ.get("REDASH_SENTRY_ENVIRONMENT")
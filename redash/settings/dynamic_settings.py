@@ -10,6 +10,25 @@ def query_time_limit(is_scheduled, user_id, org_id):
         return settings.ADHOC_QUERY_TIME_LIMIT
 
 
+# Replace this method with your own implementation in case you want different concurrency limits for certain
+# data sources or organizations. Returns a (data source limit, organization limit) tuple, where 0 means no limit.
+def query_concurrency_limits(data_source_id, org_id):
+    from redash import settings
+
+    return (
+        settings.DATA_SOURCE_QUERY_CONCURRENCY_LIMIT,
+        settings.ORG_QUERY_CONCURRENCY_LIMIT,
+    )
+
+
+# Replace this method with your own implementation in case you want different result size limits for certain
+# data sources or organizations. Returns a (maximum rows, maximum bytes) tuple, where 0 means no limit.
+def query_result_limits(data_source_id, org_id):
+    from redash import settings
+
+    return settings.QUERY_RESULTS_MAX_ROWS, settings.QUERY_RESULTS_MAX_BYTES
+
+
 def periodic_jobs():
     """Schedule any custom periodic jobs here. For example:
 
@@ -25,7 +44,8 @@ def periodic_jobs():
 
 
 # This provides the ability to override the way we store QueryResult's data column.
-# Reference implementation: redash.models.DBPersistence
+# Reference implementations: redash.models.DBPersistence and redash.models.ColumnarPersistence
+# (the latter can also be selected with REDASH_QUERY_RESULTS_STORAGE_FORMAT=columnar).
 QueryResultPersistence = None
 
 
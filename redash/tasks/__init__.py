@@ -1,5 +1,9 @@
 from .general import (
     record_event,
+    enqueue_event,
+    flush_events,
+    cleanup_events,
+    backfill_event_object_ids,
     version_check,
     send_mail,
     sync_user_details,
@@ -7,6 +11,7 @@ from .general import (
 )
 from .queries import (
     enqueue_query,
+    enqueue_queries,
     execute_query,
     refresh_queries,
     refresh_schemas,
@@ -15,7 +20,7 @@ from .queries import (
 )
 from .alerts import check_alerts_for_query
 from .failure_report import send_aggregated_errors
-from .worker import Worker, Queue, Job
+from .worker import Worker, NonForkingWorker, Queue, Job
 from .schedule import rq_scheduler, schedule_periodic_jobs, periodic_job_definitions
 
 from redash import rq_redis_connection
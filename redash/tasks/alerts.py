@@ -1,21 +1,75 @@
 from flask import current_app
 import datetime
+import time
 from redash.worker import job, get_job_logger
-from redash import models, utils
+from redash import models, settings, statsd_client, utils
 
 
 logger = get_job_logger(__name__)
 
 
 def notify_subscriptions(alert, new_state):
-    host = utils.base_url(alert.query_rel.org)
     for subscription in alert.subscriptions:
-        try:
-            subscription.notify(
-                alert, alert.query_rel, subscription.user, new_state, current_app, host
-            )
-        except Exception as e:
-            logger.exception("Error with processing destination")
+        deliver_notification.delay(subscription.id, new_state)
+
+
+def retry_notification(subscription_id, new_state, attempt):
+    from redash.tasks.schedule import rq_scheduler
+
+    if attempt > settings.ALERT_NOTIFICATION_MAX_RETRIES:
+        logger.error(
+            "Giving up on notification of subscription %d after %d attempts.",
+            subscription_id,
+            attempt,
+        )
+        return
+
+    delay = settings.ALERT_NOTIFICATION_RETRY_BACKOFF * 2 ** (attempt - 1)
+    logger.warning(
+        "Notification of subscription %d failed, retrying in %d seconds.",
+        subscription_id,
+        delay,
+    )
+    rq_scheduler.enqueue_in(
+        datetime.timedelta(seconds=delay),
+        deliver_notification,
+        subscription_id,
+        new_state,
+        attempt=attempt + 1,
+        queue_name="default",
+        timeout=settings.ALERT_NOTIFICATION_TIMEOUT,
+    )
+
+
+@job("default", timeout=settings.ALERT_NOTIFICATION_TIMEOUT)
+def deliver_notification(subscription_id, new_state, attempt=1):
+    subscription = models.AlertSubscription.query.get(subscription_id)
+    if subscription is None:
+        logger.debug("Subscription %d no longer exists.", subscription_id)
+        return
+
+    alert = subscription.alert
+    host = utils.base_url(alert.query_rel.org)
+    destination_type = (
+        subscription.destination.type if subscription.destination else "email"
+    )
+
+    started_at = time.time()
+    try:
+        subscription.notify(
+            alert, alert.query_rel, subscription.user, new_state, current_app, host
+        )
+    except Exception:
+        logger.exception("Error with processing destination")
+        statsd_client.incr("alerts.notifications.failed.{}".format(destination_type))
+        retry_notification(subscription_id, new_state, attempt)
+    else:
+        statsd_client.incr("alerts.notifications.delivered.{}".format(destination_type))
+    finally:
+        statsd_client.timing(
+            "alerts.notifications.latency.{}".format(destination_type),
+            int((time.time() - started_at) * 1000),
+        )
 
 
 def should_notify(alert, new_state):
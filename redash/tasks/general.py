@@ -1,12 +1,16 @@
+import pytz
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from flask_mail import Message
 from rq import Connection, Queue
+from sqlalchemy.exc import InterfaceError, OperationalError
 from rq.registry import FailedJobRegistry
 from rq.job import Job
-from redash import mail, models, settings, rq_redis_connection
+from redash import mail, models, settings, utils, redis_connection, rq_redis_connection
 from redash.models import users
+from redash.utils import json_dumps, json_loads
+from redash.utils.requests_session import requests_session
 from redash.version_check import run_version_check
 from redash.worker import job, get_job_logger, default_operational_queues
 from redash.tasks.worker import Queue
@@ -15,23 +19,201 @@ from redash.query_runner import NotSupported
 logger = get_job_logger(__name__)
 
 
+EVENTS_BUFFER_KEY = "events:buffer"
+# the events that couldn't be recorded, newest first
+EVENTS_FAILED_KEY = "events:failed"
+EVENTS_FAILED_MAX_COUNT = 10000
+EVENTS_PARTITIONS_AHEAD = 2
+# the progress of backfill_event_object_ids
+EVENTS_BACKFILL_KEY = "events:numeric_object_id_backfill"
+EVENTS_BACKFILL_BATCH_SIZE = 10000
+EVENTS_BACKFILL_MAX_BATCHES = 100
+
+
+def enqueue_event(raw_event):
+    """
+    Buffers an event in Redis, to be recorded with the next batch by `flush_events`.
+    """
+    redis_connection.rpush(EVENTS_BUFFER_KEY, json_dumps(raw_event))
+
+
+def pop_buffered_events(count):
+    pipe = redis_connection.pipeline()
+    pipe.lrange(EVENTS_BUFFER_KEY, 0, count - 1)
+    pipe.ltrim(EVENTS_BUFFER_KEY, count, -1)
+    raw_events, _ = pipe.execute()
+
+    return [json_loads(raw_event) for raw_event in raw_events]
+
+
+def forward_events(events):
+    for hook in settings.EVENT_REPORTING_WEBHOOKS:
+        logger.debug("Forwarding %d events to: %s", len(events), hook)
+        for event in events:
+            try:
+                data = {
+                    "schema": "iglu:io.redash.webhooks/event/jsonschema/1-0-0",
+                    "data": event.to_dict(),
+                }
+                response = requests_session.post(hook, json=data)
+                if response.status_code != 200:
+                    logger.error("Failed posting to %s: %s", hook, response.content)
+            except Exception:
+                logger.exception("Failed posting to %s", hook)
+
+
+def requeue_events(raw_events):
+    # put the events back at the head of the buffer, so they're recorded by the next flush
+    redis_connection.lpush(
+        EVENTS_BUFFER_KEY, *[json_dumps(e) for e in reversed(raw_events)]
+    )
+
+
+def record_events(raw_events):
+    """
+    Records the given raw events one at a time and returns the ones that were recorded.
+    Events that can't be recorded are moved to EVENTS_FAILED_KEY, so they don't block the
+    buffer.
+    """
+    events = []
+    for i, raw_event in enumerate(raw_events):
+        try:
+            events.extend(models.Event.record_many([raw_event]))
+            models.db.session.commit()
+        except (OperationalError, InterfaceError):
+            models.db.session.rollback()
+            requeue_events(raw_events[i:])
+            raise
+        except Exception:
+            models.db.session.rollback()
+            logger.exception("Failed recording event: %s", raw_event)
+            pipe = redis_connection.pipeline()
+            pipe.lpush(EVENTS_FAILED_KEY, json_dumps(raw_event))
+            pipe.ltrim(EVENTS_FAILED_KEY, 0, EVENTS_FAILED_MAX_COUNT - 1)
+            pipe.execute()
+
+    return events
+
+
+def flush_events():
+    """
+    Records the buffered events in batches of EVENTS_FLUSH_BATCH_SIZE and forwards them
+    to the event reporting webhooks.
+    """
+    while True:
+        raw_events = pop_buffered_events(settings.EVENTS_FLUSH_BATCH_SIZE)
+        if not raw_events:
+            break
+
+        try:
+            events = models.Event.record_many(raw_events)
+            models.db.session.commit()
+        except (OperationalError, InterfaceError):
+            # the database isn't available
+            models.db.session.rollback()
+            requeue_events(raw_events)
+            raise
+        except Exception:
+            # some of the events can't be recorded (like ones of a deleted user)
+            models.db.session.rollback()
+            events = record_events(raw_events)
+
+        logger.info("Recorded %d events.", len(events))
+        forward_events(events)
+
+        if len(raw_events) < settings.EVENTS_FLUSH_BATCH_SIZE:
+            break
+
+
+def cleanup_events():
+    """
+    Job to enforce settings.EVENTS_RETENTION_DAYS on the events table.
+
+    When the table is partitioned by month, it creates the partitions of the coming months
+    and drops the partitions that only hold events older than the retention period. Otherwise
+    each run deletes at most settings.EVENTS_CLEANUP_COUNT old events.
+    """
+    partitions = models.Event.partitions()
+    now = utils.utcnow()
+
+    if partitions:
+        # months before the end of the last partition are already covered (the legacy
+        # partition holds everything up to the end of the month it was created in), and
+        # creating an overlapping partition fails
+        covered_until = partitions[-1][1]
+        for months_ahead in range(EVENTS_PARTITIONS_AHEAD + 1):
+            month = (now.replace(day=1) + timedelta(days=32 * months_ahead)).date()
+            month_start = datetime(month.year, month.month, 1, tzinfo=pytz.utc)
+            if month_start >= covered_until:
+                models.Event.create_partition(month)
+        models.db.session.commit()
+
+    if not settings.EVENTS_RETENTION_DAYS:
+        return
+
+    cutoff = now - timedelta(days=settings.EVENTS_RETENTION_DAYS)
+
+    if partitions:
+        for name, end in partitions:
+            if end <= cutoff:
+                logger.info("Dropping events partition %s.", name)
+                models.Event.drop_partition(name)
+        models.db.session.commit()
+    else:
+        old_events = models.Event.query.with_entities(models.Event.id).filter(
+            models.Event.created_at < cutoff
+        )
+        deleted_count = models.Event.query.filter(
+            models.Event.id.in_(
+                old_events.limit(settings.EVENTS_CLEANUP_COUNT).subquery()
+            )
+        ).delete(synchronize_session=False)
+        models.db.session.commit()
+        logger.info("Deleted %d old events.", deleted_count)
+
+
+def backfill_event_object_ids():
+    """
+    Job to fill in numeric_object_id of the events recorded before the column was added, a
+    range of EVENTS_BACKFILL_BATCH_SIZE ids per transaction, newest first (recent events are
+    the ones looked up). Its progress is kept in Redis.
+    """
+    progress = redis_connection.hgetall(EVENTS_BACKFILL_KEY)
+    if progress.get("done"):
+        return
+
+    if progress:
+        end_id, first_id = int(progress["end_id"]), int(progress["first_id"])
+    else:
+        first_id, last_id = models.Event.id_range()
+        if last_id is None:
+            redis_connection.hset(EVENTS_BACKFILL_KEY, "done", 1)
+            return
+        end_id = last_id + 1
+
+    for _ in range(EVENTS_BACKFILL_MAX_BATCHES):
+        if end_id <= first_id:
+            break
+
+        start_id = max(first_id, end_id - EVENTS_BACKFILL_BATCH_SIZE)
+        models.Event.backfill_numeric_object_ids(start_id, end_id)
+        models.db.session.commit()
+        end_id = start_id
+        redis_connection.hmset(
+            EVENTS_BACKFILL_KEY, {"end_id": end_id, "first_id": first_id}
+        )
+
+    if end_id <= first_id:
+        logger.info("Backfilled the numeric object ids of events.")
+        redis_connection.hset(EVENTS_BACKFILL_KEY, "done", 1)
+
+
 @job("default")
 def record_event(raw_event):
     event = models.Event.record(raw_event)
     models.db.session.commit()
 
-    for hook in settings.EVENT_REPORTING_WEBHOOKS:
-        logger.debug("Forwarding event to: %s", hook)
-        try:
-            data = {
-                "schema": "iglu:io.redash.webhooks/event/jsonschema/1-0-0",
-                "data": event.to_dict(),
-            }
-            response = requests.post(hook, json=data)
-            if response.status_code != 200:
-                logger.error("Failed posting to %s: %s", hook, response.content)
-        except Exception:
-            logger.exception("Failed posting to %s", hook)
+    forward_events([event])
 
 
 def version_check():
@@ -1,14 +1,17 @@
+import hashlib
 import signal
 import time
 import redis
 
 from rq import get_current_job
+from rq.compat import as_text
+from rq.connections import resolve_connection
 from rq.job import JobStatus
 from rq.timeouts import JobTimeoutException
 from rq.exceptions import NoSuchJobError
 
 from redash import models, redis_connection, settings
-from redash.query_runner import InterruptException
+from redash.query_runner import BaseQueryRunner, InterruptException
 from redash.tasks.worker import Queue, Job
 from redash.tasks.alerts import check_alerts_for_query
 from redash.tasks.failure_report import track_failure
@@ -17,6 +20,7 @@ from redash.worker import get_job_logger
 
 logger = get_job_logger(__name__)
 TIMEOUT_MESSAGE = "Query exceeded Redash query execution time limit."
+ENQUEUE_BATCH_SIZE = 500
 
 
 def _job_lock_id(query_hash, data_source_id):
@@ -27,6 +31,41 @@ def _unlock(query_hash, data_source_id):
     redis_connection.delete(_job_lock_id(query_hash, data_source_id))
 
 
+def _job_options(data_source, user_id, is_api_key, scheduled_query, metadata):
+    """Returns the queue name, `execute_query` keyword arguments and RQ job options of a
+    query execution job."""
+    if scheduled_query:
+        queue_name = data_source.scheduled_queue_name
+        scheduled_query_id = scheduled_query.id
+    else:
+        queue_name = data_source.queue_name
+        scheduled_query_id = None
+
+    time_limit = settings.dynamic_settings.query_time_limit(
+        scheduled_query, user_id, data_source.org_id
+    )
+    metadata["Queue"] = queue_name
+
+    kwargs = {
+        "user_id": user_id,
+        "scheduled_query_id": scheduled_query_id,
+        "is_api_key": is_api_key,
+    }
+    options = {
+        "timeout": time_limit,
+        "result_ttl": None if scheduled_query else settings.JOB_EXPIRY_TIME,
+        "meta": {
+            "data_source_id": data_source.id,
+            "org_id": data_source.org_id,
+            "scheduled": scheduled_query_id is not None,
+            "query_id": metadata.get("Query ID"),
+            "user_id": user_id,
+        },
+    }
+
+    return queue_name, kwargs, options
+
+
 def enqueue_query(
     query, data_source, user_id, is_api_key=False, scheduled_query=None, metadata={}
 ):
@@ -72,38 +111,19 @@ def enqueue_query(
             if not job:
                 pipe.multi()
 
-                if scheduled_query:
-                    queue_name = data_source.scheduled_queue_name
-                    scheduled_query_id = scheduled_query.id
-                else:
-                    queue_name = data_source.queue_name
-                    scheduled_query_id = None
-
-                time_limit = settings.dynamic_settings.query_time_limit(
-                    scheduled_query, user_id, data_source.org_id
+                queue_name, kwargs, options = _job_options(
+                    data_source, user_id, is_api_key, scheduled_query, metadata
                 )
-                metadata["Queue"] = queue_name
-
                 queue = Queue(queue_name)
-                enqueue_kwargs = {
-                    "user_id": user_id,
-                    "scheduled_query_id": scheduled_query_id,
-                    "is_api_key": is_api_key,
-                    "job_timeout": time_limit,
-                    "meta": {
-                        "data_source_id": data_source.id,
-                        "org_id": data_source.org_id,
-                        "scheduled": scheduled_query_id is not None,
-                        "query_id": metadata.get("Query ID"),
-                        "user_id": user_id,
-                    },
-                }
-
-                if not scheduled_query:
-                    enqueue_kwargs["result_ttl"] = settings.JOB_EXPIRY_TIME
-
                 job = queue.enqueue(
-                    execute_query, query, data_source.id, metadata, **enqueue_kwargs
+                    execute_query,
+                    query,
+                    data_source.id,
+                    metadata,
+                    job_timeout=options["timeout"],
+                    result_ttl=options["result_ttl"],
+                    meta=options["meta"],
+                    **kwargs
                 )
 
                 logger.info("[%s] Created new job: %s", query_hash, job.id)
@@ -124,6 +144,145 @@ def enqueue_query(
     return job
 
 
+def _lock_is_relevant(job, status):
+    return (
+        job is not None
+        and status not in [JobStatus.FINISHED, JobStatus.FAILED]
+        and not job.is_cancelled
+    )
+
+
+def _enqueue_batch(requests):
+    lock_ids = [
+        _job_lock_id(gen_query_hash(r["query"]), r["data_source"].id) for r in requests
+    ]
+    unique_lock_ids = list(dict.fromkeys(lock_ids))
+    connection = resolve_connection()
+
+    for _ in range(5):
+        pipe = redis_connection.pipeline()
+        created = []
+        try:
+            pipe.watch(*unique_lock_ids)
+            job_ids = dict(zip(unique_lock_ids, pipe.mget(unique_lock_ids)))
+            locked = [job_id for job_id in job_ids.values() if job_id]
+            jobs = dict(zip(locked, Job.fetch_many(locked, connection=connection)))
+
+            status_pipe = connection.pipeline()
+            for job_id in locked:
+                status_pipe.hget(Job.key_for(job_id), "status")
+            statuses = dict(zip(locked, map(as_text, status_pipe.execute())))
+
+            jobs_by_lock = {}
+            for lock_id, job_id in job_ids.items():
+                if job_id and _lock_is_relevant(jobs[job_id], statuses[job_id]):
+                    jobs_by_lock[lock_id] = jobs[job_id]
+
+            # The new jobs are saved before their locks are set, so the locks never point
+            # to missing jobs, but only pushed to their queues once the locks are set. If
+            # another process changed any of the locks, the new jobs are deleted and the
+            # batch is retried without having enqueued anything.
+            jobs_pipe = connection.pipeline()
+            for lock_id, r in zip(lock_ids, requests):
+                if lock_id in jobs_by_lock:
+                    continue
+
+                metadata = r.get("metadata", {})
+                queue_name, kwargs, options = _job_options(
+                    r["data_source"],
+                    r["user_id"],
+                    r.get("is_api_key", False),
+                    r.get("scheduled_query"),
+                    metadata,
+                )
+                queue = Queue(queue_name)
+                job = queue.job_class.create(
+                    execute_query,
+                    args=(r["query"], r["data_source"].id, metadata),
+                    kwargs=kwargs,
+                    connection=queue.connection,
+                    origin=queue.name,
+                    status=JobStatus.QUEUED,
+                    **options
+                )
+                job.save(pipeline=jobs_pipe)
+                jobs_by_lock[lock_id] = job
+                created.append((lock_id, queue, job))
+            jobs_pipe.execute()
+
+            pipe.multi()
+            for lock_id, queue, job in created:
+                pipe.set(lock_id, job.id, settings.JOB_EXPIRY_TIME)
+            pipe.execute()
+        except redis.WatchError:
+            if created:
+                connection.delete(*[job.key for _, _, job in created])
+            continue
+        finally:
+            pipe.reset()
+
+        jobs_pipe = connection.pipeline()
+        for lock_id, queue, job in created:
+            queue.enqueue_job(job, pipeline=jobs_pipe)
+        jobs_pipe.execute()
+
+        logger.info("Created %d new jobs for %d queries.", len(created), len(requests))
+        return [jobs_by_lock[lock_id] for lock_id in lock_ids]
+
+    logger.error("[Manager] Failed adding jobs for %d queries.", len(requests))
+    return [None] * len(requests)
+
+
+def enqueue_queries(requests):
+    """Bulk version of `enqueue_query`, used to enqueue many queries at once.
+
+    `requests` is a list of dicts with the arguments of `enqueue_query` (`query`,
+    `data_source`, `user_id` and optionally `is_api_key`, `scheduled_query` and
+    `metadata`). Requests for the same query text and data source share a single job and
+    queries that already have a pending job reuse it, like with `enqueue_query`. Locks and
+    jobs are read and written with pipelined Redis commands, in batches of
+    `ENQUEUE_BATCH_SIZE` requests.
+
+    Returns the jobs in the order of `requests` (None for requests of batches that could
+    not be enqueued).
+    """
+    jobs = []
+    for start in range(0, len(requests), ENQUEUE_BATCH_SIZE):
+        jobs.extend(_enqueue_batch(requests[start : start + ENQUEUE_BATCH_SIZE]))
+    return jobs
+
+
+class QueryRunnerCache(object):
+    """
+    Per process cache of the query runners of data sources, so workers that execute many
+    jobs in the same process (see `redash.tasks.worker.NonForkingWorker`) don't have to
+    build a runner for every query. Runners are rebuilt when the type or the options of
+    their data source change.
+    """
+
+    def __init__(self):
+        self._runners = {}
+
+    def _version(self, data_source):
+        config = "{}:{}".format(data_source.type, data_source.options.to_json())
+        return hashlib.sha1(config.encode("utf-8")).hexdigest()
+
+    def get(self, data_source):
+        version = self._version(data_source)
+        cached = self._runners.get(data_source.id)
+        if cached is None or cached[0] != version:
+            cached = (version, data_source.query_runner)
+            self._runners[data_source.id] = cached
+
+        return cached[1]
+
+    def clear(self):
+        self._runners.clear()
+
+
+query_runners = QueryRunnerCache()
+
+
 def signal_handler(*args):
     raise InterruptException
 
@@ -174,11 +333,23 @@ class QueryExecutor(object):
         logger.debug("Executing query:\n%s", self.query)
         self._log_progress("executing_query")
 
-        query_runner = self.data_source.query_runner
+        query_runner = query_runners.get(self.data_source)
         annotated_query = self._annotate_query(query_runner)
+        query_runner.result_limits = settings.dynamic_settings.query_result_limits(
+            self.data_source.id, self.data_source.org_id
+        )
 
         try:
-            data, error = query_runner.run_query(annotated_query, self.user)
+            if query_runner.streams_results:
+                # serialize rows as they are fetched, instead of building the whole result first
+                stream = query_runner.run_query_stream(annotated_query, self.user)
+                budget = query_runner.result_budget()
+                data = stream.to_json(budget, settings.QUERY_RESULTS_ROW_FORMAT)
+                error = None
+            else:
+                data, error = query_runner.run_query(annotated_query, self.user)
+                if not query_runner.limits_results:
+                    data = query_runner.result_budget().enforce(data)
         except Exception as e:
             if isinstance(e, JobTimeoutException):
                 error = TIMEOUT_MESSAGE
@@ -187,6 +358,9 @@ class QueryExecutor(object):
 
             data = None
             logger.warning("Unexpected error while running query:", exc_info=1)
+        finally:
+            # the runner is reused by other jobs of this process
+            query_runner.result_limits = BaseQueryRunner.result_limits
 
         run_time = time.time() - started_at
 
@@ -11,7 +11,7 @@ from redash.tasks.failure_report import track_failure
 from redash.utils import json_dumps, sentry
 from redash.worker import job, get_job_logger
 
-from .execution import enqueue_query
+from .execution import enqueue_queries
 
 logger = get_job_logger(__name__)
 
@@ -77,26 +77,37 @@ class RefreshQueriesError(Exception):
 
 def refresh_queries():
     logger.info("Refreshing queries...")
-    enqueued = []
+    requests = []
     for query in models.Query.outdated_queries():
         if not _should_refresh_query(query):
             continue
 
         try:
-            enqueue_query(
-                _apply_default_parameters(query),
-                query.data_source,
-                query.user_id,
-                scheduled_query=query,
-                metadata={"Query ID": query.id, "Username": "Scheduled"},
+            requests.append(
+                {
+                    "query": _apply_default_parameters(query),
+                    "data_source": query.data_source,
+                    "user_id": query.user_id,
+                    "scheduled_query": query,
+                    "metadata": {"Query ID": query.id, "Username": "Scheduled"},
+                }
             )
-            enqueued.append(query)
         except Exception as e:
             message = "Could not enqueue query %d due to %s" % (query.id, repr(e))
             logging.info(message)
             error = RefreshQueriesError(message).with_traceback(e.__traceback__)
             sentry.capture_exception(error)
 
+    enqueued = []
+    try:
+        jobs = enqueue_queries(requests)
+        enqueued = [r["scheduled_query"] for r, job in zip(requests, jobs) if job]
+    except Exception as e:
+        message = "Could not enqueue %d queries due to %s" % (len(requests), repr(e))
+        logging.info(message)
+        error = RefreshQueriesError(message).with_traceback(e.__traceback__)
+        sentry.capture_exception(error)
+
     status = {
         "outdated_queries_count": len(enqueued),
         "last_refresh_at": time.time(),
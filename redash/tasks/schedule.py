@@ -17,6 +17,9 @@ from redash.tasks import (
     purge_failed_jobs,
     version_check,
     send_aggregated_errors,
+    flush_events,
+    cleanup_events,
+    backfill_event_object_ids,
     Queue,
 )
 
@@ -67,6 +70,13 @@ def periodic_job_definitions():
             "interval": timedelta(minutes=settings.SCHEMAS_REFRESH_SCHEDULE),
         },
         {"func": sync_user_details, "timeout": 60, "interval": timedelta(minutes=1),},
+        {"func": flush_events, "interval": settings.EVENTS_FLUSH_INTERVAL},
+        {"func": cleanup_events, "timeout": 3600, "interval": timedelta(hours=1)},
+        {
+            "func": backfill_event_object_ids,
+            "timeout": 600,
+            "interval": timedelta(minutes=10),
+        },
         {"func": purge_failed_jobs, "timeout": 3600, "interval": timedelta(days=1)},
         {
             "func": send_aggregated_errors,
@@ -2,8 +2,8 @@ import errno
 import os
 import signal
 import time
-from redash import statsd_client
-from rq import Worker as BaseWorker, Queue as BaseQueue, get_current_job
+from redash import redis_connection, settings, statsd_client
+from rq import Worker as BaseWorker, Queue as BaseQueue, SimpleWorker, get_current_job
 from rq.utils import utcnow
 from rq.timeouts import UnixSignalDeathPenalty, HorseMonitorTimeoutException
 from rq.job import Job as BaseJob, JobStatus
@@ -31,6 +31,12 @@ class StatsdRecordingQueue(BaseQueue):
     def enqueue_job(self, *args, **kwargs):
         job = super().enqueue_job(*args, **kwargs)
         statsd_client.incr("rq.jobs.created.{}".format(self.name))
+        if "data_source_id" in job.meta:
+            statsd_client.gauge(
+                "rq.jobs.queued.data_source.{}".format(job.meta["data_source_id"]),
+                1,
+                delta=True,
+            )
         return job
 
 
@@ -79,6 +85,15 @@ class HardLimitingWorker(BaseWorker):
     queue_class = CancellableQueue
     job_class = CancellableJob
 
+    def perform_job(self, job, queue, heartbeat_ttl=None):
+        try:
+            return super().perform_job(job, queue, heartbeat_ttl=heartbeat_ttl)
+        finally:
+            # The work horse exits once the job is done, close the SSH tunnels it opened
+            from redash.query_runner import ssh_tunnels
+
+            ssh_tunnels.close_all()
+
     def stop_executing_job(self, job):
         os.kill(self.horse_pid, signal.SIGINT)
         self.log.warning("Job %s has been cancelled.", job.id)
@@ -164,10 +179,175 @@ class HardLimitingWorker(BaseWorker):
             )
 
 
-class RedashWorker(StatsdRecordingWorker, HardLimitingWorker):
+class QueryConcurrencyLimits(object):
+    """
+    Tracks the query execution jobs running for every data source and organization, in
+    sorted sets of job ids scored by the time their slot expires (in case the worker
+    running them dies without releasing it).
+    """
+
+    KEY_PREFIX = "query_concurrency"
+    # Slot lifetime of jobs without a time limit
+    DEFAULT_SLOT_TTL = 3600 * 6
+
+    _acquire_script = redis_connection.register_script(
+        """
+        local now, expires_at, job_id = ARGV[1], ARGV[2], ARGV[3]
+        for i, key in ipairs(KEYS) do
+            redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+            if not redis.call('ZSCORE', key, job_id)
+                    and redis.call('ZCARD', key) >= tonumber(ARGV[3 + i]) then
+                return 0
+            end
+        end
+        for _, key in ipairs(KEYS) do
+            redis.call('ZADD', key, expires_at, job_id)
+        end
+        return 1
+        """
+    )
+
+    def _keys(self, job):
+        return (
+            "{}:data_source:{}".format(self.KEY_PREFIX, job.meta["data_source_id"]),
+            "{}:org:{}".format(self.KEY_PREFIX, job.meta.get("org_id")),
+        )
+
+    def applies_to(self, job):
+        return "data_source_id" in job.meta
+
+    def acquire(self, job):
+        """Takes an execution slot for `job`, returns False when the data source or the
+        organization of the job are already running as many queries as they are allowed to."""
+        limits = settings.dynamic_settings.query_concurrency_limits(
+            job.meta["data_source_id"], job.meta.get("org_id")
+        )
+        keys = []
+        args = []
+        for key, limit in zip(self._keys(job), limits):
+            if limit:
+                keys.append(key)
+                args.append(limit)
+        if not keys:
+            return True
+
+        now = time.time()
+        ttl = job.timeout if job.timeout and job.timeout > 0 else self.DEFAULT_SLOT_TTL
+        return bool(
+            self._acquire_script(keys=keys, args=[now, now + ttl, job.id] + args)
+        )
+
+    def release(self, job):
+        pipe = redis_connection.pipeline()
+        for key in self._keys(job):
+            pipe.zrem(key, job.id)
+        pipe.execute()
+
+
+query_concurrency_limits = QueryConcurrencyLimits()
+
+
+class ConcurrencyLimitingWorker(BaseWorker):
+    """
+    Enforces the concurrency limits of data sources and organizations on query execution
+    jobs (see `QueryConcurrencyLimits`).
+
+    A job that is over its limits is pushed back to the end of its queue before a work horse
+    is forked for it, so the jobs of other data sources waiting behind it get executed
+    first. Once every queued job was deferred, the worker waits `deferral_interval`
+    seconds before trying again.
+    """
+
+    deferral_interval = 1
+
+    def dequeue_job_and_maintain_ttl(self, timeout):
+        deferred = set()
+        while True:
+            result = super().dequeue_job_and_maintain_ttl(timeout)
+            if result is None:
+                return result
+
+            job, queue = result
+            if not query_concurrency_limits.applies_to(job):
+                return result
+
+            data_source_id = job.meta["data_source_id"]
+            if query_concurrency_limits.acquire(job):
+                statsd_client.gauge(
+                    "rq.jobs.queued.data_source.{}".format(data_source_id),
+                    -1,
+                    delta=True,
+                )
+                return result
+
+            self.log.info("Job %s is over its concurrency limits, deferring.", job.id)
+            statsd_client.incr("rq.jobs.deferred.data_source.{}".format(data_source_id))
+            queue.push_job_id(job.id)
+
+            if job.id in deferred:
+                deferred.clear()
+                time.sleep(self.deferral_interval)
+            deferred.add(job.id)
+
+    def execute_job(self, job, queue):
+        if not query_concurrency_limits.applies_to(job):
+            return super().execute_job(job, queue)
+
+        metric = "rq.jobs.running.data_source.{}".format(job.meta["data_source_id"])
+        statsd_client.gauge(metric, 1, delta=True)
+        try:
+            super().execute_job(job, queue)
+        finally:
+            statsd_client.gauge(metric, -1, delta=True)
+            query_concurrency_limits.release(job)
+
+
+class InProcessExecutionWorker(SimpleWorker):
+    """
+    Executes jobs in the worker process itself instead of forking a work horse for every
+    job, so per process state (the database connection pool, cached query runners) is
+    reused across jobs.
+
+    Time limits are enforced by the job's death penalty alone and running jobs can't be
+    cancelled (queued jobs still can), as there is no work horse to kill.
+    """
+
+    queue_class = CancellableQueue
+    job_class = CancellableJob
+
+    def execute_job(self, job, queue):
+        # The worker can't send heartbeats while it executes a job
+        if job.timeout and job.timeout > 0:
+            heartbeat_ttl = job.timeout + 60
+        else:
+            heartbeat_ttl = settings.JOB_EXPIRY_TIME
+
+        # Query execution replaces the SIGINT handler (to interrupt the running query), restore
+        # the worker's one afterwards
+        sigint_handler = signal.getsignal(signal.SIGINT)
+        try:
+            self.perform_job(job, queue, heartbeat_ttl=heartbeat_ttl)
+        finally:
+            signal.signal(signal.SIGINT, sigint_handler)
+
+            from redash.models import db
+
+            db.session.remove()
+
+
+class RedashWorker(
+    StatsdRecordingWorker, ConcurrencyLimitingWorker, HardLimitingWorker
+):
+    queue_class = RedashQueue
+
+
+class RedashNonForkingWorker(
+    StatsdRecordingWorker, ConcurrencyLimitingWorker, InProcessExecutionWorker
+):
     queue_class = RedashQueue
 
 
 Job = CancellableJob
 Queue = RedashQueue
 Worker = RedashWorker
+NonForkingWorker = RedashNonForkingWorker
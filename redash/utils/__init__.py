@@ -4,6 +4,7 @@ import csv
 import datetime
 import decimal
 import hashlib
+import logging
 import os
 import random
 import re
@@ -20,6 +21,11 @@ from sqlalchemy.orm.query import Query
 
 from .human_time import parse_human_time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 COMMENTS_REGEX = re.compile("/\*.*?\*/")
 WRITER_ENCODING = os.environ.get("REDASH_CSV_WRITER_ENCODING", "utf-8")
@@ -104,9 +110,47 @@ class JSONEncoder(simplejson.JSONEncoder):
         return result
 
 
+def _json_backend(name):
+    if name == "orjson" and orjson is None:
+        logging.warning("REDASH_JSON_BACKEND is orjson, but it isn't installed; using simplejson.")
+        return "simplejson"
+
+    if name not in ("simplejson", "orjson"):
+        raise ValueError("Unknown REDASH_JSON_BACKEND: {}".format(name))
+
+    return name
+
+
+JSON_BACKEND = _json_backend(settings.JSON_BACKEND)
+
+
+def _orjson_dumps(data, cls=JSONEncoder, sort_keys=False):
+    encoder = cls()
+
+    def default(o):
+        # simplejson writes Decimals exactly, not as floats. Without orjson.Fragment
+        # (orjson 3.9.15 or later) this fails, and json_dumps falls back to simplejson.
+        if isinstance(o, decimal.Decimal):
+            return orjson.Fragment(str(o))
+        return encoder.default(o)
+
+    # datetimes are passed to the encoder's `default`, so they are formatted the same way
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(data, default=default, option=option).decode()
+
+
 def json_loads(data, *args, **kwargs):
     """A custom JSON loading function which passes all parameters to the
     simplejson.loads function."""
+    if JSON_BACKEND == "orjson" and not args and not kwargs:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or Infinity values, which only simplejson accepts
+            pass
+
     return simplejson.loads(data, *args, **kwargs)
 
 
@@ -118,6 +162,21 @@ def json_dumps(data, *args, **kwargs):
     # Float value nan or inf in Python should be render to None or null in json.
     # Using ignore_nan = False will make Python render nan as NaN, leading to parse error in front-end
     kwargs.setdefault('ignore_nan', True)
+
+    # orjson always renders nan and inf as null
+    if (
+        JSON_BACKEND == "orjson"
+        and not args
+        and kwargs["encoding"] is None
+        and kwargs["ignore_nan"]
+        and set(kwargs) <= {"cls", "encoding", "ignore_nan", "sort_keys"}
+    ):
+        try:
+            return _orjson_dumps(data, kwargs["cls"], kwargs.get("sort_keys", False))
+        except orjson.JSONEncodeError:
+            # e.g. integers that don't fit in 64 bits, or Decimals on older orjson versions
+            pass
+
     return simplejson.dumps(data, *args, **kwargs)
 
 
@@ -0,0 +1,251 @@
+"""
+Compact columnar encoding for query results.
+
+Results produced by query runners are `{"columns": [...], "rows": [{...}, ...]}` documents
+where every row repeats every column name. This module transposes the rows into one array
+per key and packs each array with the cheapest lossless representation:
+
+* integer and float columns are packed as 64 bit arrays,
+* string columns with repeating values are dictionary encoded (packed indices into a list
+  of distinct values),
+* everything else is kept as a JSON array.
+
+The arrays and a small JSON header are concatenated into a single binary block, which is
+compressed (zstd when the `zstandard` package is installed, zlib otherwise) and base64
+encoded so it can be kept in the existing text column. Decoding returns exactly the
+document that was encoded.
+"""
+import base64
+import struct
+import sys
+import zlib
+from array import array
+
+import simplejson
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PREFIX = "columnar1:"
+
+_HEADER_LENGTH = struct.Struct("<I")
+_INDEX_TYPECODES = [("B", 0xFF), ("H", 0xFFFF), ("I", 0xFFFFFFFF)]
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+_MISSING = object()
+
+
+def _compress(payload):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(payload)
+    return "zlib", zlib.compress(payload, 6)
+
+
+def _decompress(codec, payload):
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError(
+                "Result was stored with zstd compression, but the zstandard package is not installed."
+            )
+        return zstandard.ZstdDecompressor().decompress(payload)
+
+    raise ValueError("Unknown columnar result codec: {}".format(codec))
+
+
+def _packed(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpacked(typecode, blob):
+    values = array(typecode)
+    values.frombytes(blob)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def _encode_column(values):
+    """Returns `(descriptor, blob)` for a single column."""
+    count = len(values)
+    kinds = set(type(v) for v in values)
+
+    if kinds == {int} and all(_INT64_MIN <= v <= _INT64_MAX for v in values):
+        return {"kind": "int64"}, _packed("q", values)
+
+    if kinds == {float}:
+        return {"kind": "float64"}, _packed("d", values)
+
+    if kinds <= {str, type(None)}:
+        dictionary = {}
+        indices = [dictionary.setdefault(v, len(dictionary)) for v in values]
+        if len(dictionary) * 2 <= count:
+            for typecode, max_value in _INDEX_TYPECODES:
+                if len(dictionary) <= max_value:
+                    break
+            descriptor = {
+                "kind": "dictionary",
+                "dictionary": list(dictionary),
+                "index_type": typecode,
+            }
+            return descriptor, _packed(typecode, indices)
+
+    blob = simplejson.dumps(values, separators=(",", ":")).encode("utf-8")
+    return {"kind": "json"}, blob
+
+
+def _unpacked_slice(typecode, blob, start, stop):
+    # packed values have a fixed size, so a slice of them is a slice of the blob
+    size = array(typecode).itemsize
+    return _unpacked(
+        typecode, blob[start * size : None if stop is None else stop * size]
+    )
+
+
+def _decode_column(descriptor, blob, start=0, stop=None):
+    """Decodes the values `start` to `stop` of a column from its `blob` (bytes or a
+    memoryview)."""
+    kind = descriptor["kind"]
+    if kind == "int64":
+        return _unpacked_slice("q", blob, start, stop)
+    if kind == "float64":
+        return _unpacked_slice("d", blob, start, stop)
+    if kind == "dictionary":
+        dictionary = descriptor["dictionary"]
+        indices = _unpacked_slice(descriptor["index_type"], blob, start, stop)
+        return [dictionary[i] for i in indices]
+    if kind == "json":
+        return simplejson.loads(str(blob, "utf-8"))[start:stop]
+
+    raise ValueError("Unknown columnar column kind: {}".format(kind))
+
+
+def can_encode(data):
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("rows"), list)
+        and all(isinstance(row, dict) for row in data["rows"])
+    )
+
+
+def encode(data):
+    """Encodes a result document (as returned by `json_loads` of a query runner's output)."""
+    rows = data["rows"]
+
+    keys = {}
+    for row in rows:
+        for key in row:
+            keys.setdefault(key, None)
+    keys = list(keys)
+
+    descriptors = []
+    blobs = []
+    for key in keys:
+        values = [row.get(key, _MISSING) for row in rows]
+        missing = [i for i, v in enumerate(values) if v is _MISSING]
+        if missing:
+            values = [None if v is _MISSING else v for v in values]
+
+        descriptor, blob = _encode_column(values)
+        descriptor["length"] = len(blob)
+        if missing:
+            descriptor["missing"] = missing
+
+        descriptors.append(descriptor)
+        blobs.append(blob)
+
+    header = {
+        "attributes": {k: v for k, v in data.items() if k != "rows"},
+        "row_count": len(rows),
+        "keys": keys,
+        "columns": descriptors,
+    }
+    header = simplejson.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    payload = b"".join([_HEADER_LENGTH.pack(len(header)), header] + blobs)
+    codec, compressed = _compress(payload)
+
+    return "{}{}:{}".format(PREFIX, codec, base64.b64encode(compressed).decode("ascii"))
+
+
+def is_encoded(text):
+    return isinstance(text, str) and text.startswith(PREFIX)
+
+
+class ColumnarReader(object):
+    """Decodes a columnar encoded result. Offers the same interface as
+    `redash.utils.incremental_json.StoredResultReader`."""
+
+    def __init__(self, text):
+        codec, _, encoded = text[len(PREFIX) :].partition(":")
+        self._payload = _decompress(codec, base64.b64decode(encoded))
+
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._payload)
+        self._blobs_offset = _HEADER_LENGTH.size + header_length
+        self._header = simplejson.loads(
+            self._payload[_HEADER_LENGTH.size : self._blobs_offset].decode("utf-8")
+        )
+
+    @property
+    def row_count(self):
+        return self._header["row_count"]
+
+    def get(self, key, default=None):
+        return self._header["attributes"].get(key, default)
+
+    @property
+    def columns(self):
+        return self.get("columns")
+
+    def _column_values(self, start=0, stop=None):
+        payload = memoryview(self._payload)
+        offset = self._blobs_offset
+        for descriptor in self._header["columns"]:
+            end = offset + descriptor["length"]
+            yield descriptor, _decode_column(
+                descriptor, payload[offset:end], start, stop
+            )
+            offset = end
+
+    def _iter_rows(self, offset=0, stop=None):
+        keys = self._header["keys"]
+        columns = []
+        missing = []
+        for descriptor, values in self._column_values(offset, stop):
+            columns.append(values)
+            missing.append(set(descriptor.get("missing", [])))
+
+        if not columns:
+            for _ in range(len(range(self.row_count)[offset:stop])):
+                yield {}
+            return
+
+        has_missing = any(missing)
+        for i, values in enumerate(zip(*columns), offset):
+            row = dict(zip(keys, values))
+            if has_missing:
+                for key, missing_rows in zip(keys, missing):
+                    if i in missing_rows:
+                        del row[key]
+            yield row
+
+    def iter_rows(self):
+        return self._iter_rows()
+
+    def rows_slice(self, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        return list(self._iter_rows(offset, stop))
+
+    def decode(self):
+        data = dict(self._header["attributes"])
+        data["rows"] = list(self.iter_rows())
+        return data
+
+
+def decode(text):
+    return ColumnarReader(text).decode()
@@ -0,0 +1,183 @@
+"""
+Incremental reader for the JSON documents stored in `query_results.data`.
+
+Stored results are a single top level object (usually `{"columns": [...], "rows": [...]}`),
+so instead of decoding the whole document into Python objects at once, we walk its top
+level with the (C accelerated) scanner of `simplejson` and decode only the values we need.
+Arrays are traversed element by element, so memory use is bounded by the largest row
+rather than by the size of the result.
+"""
+import itertools
+import re
+
+import simplejson
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+_decoder = simplejson.JSONDecoder()
+
+
+def _skip_whitespace(text, idx):
+    return WHITESPACE.match(text, idx).end()
+
+
+def _expect(text, idx, char):
+    idx = _skip_whitespace(text, idx)
+    if text[idx : idx + 1] != char:
+        raise simplejson.JSONDecodeError("Expecting '{}'".format(char), text, idx)
+    return idx + 1
+
+
+class StoredResultReader(object):
+    """Gives access to the top level values of a stored query result without decoding
+    the entire document.
+
+    Offsets of the top level values are discovered lazily and cached, so reading the
+    `columns` of a result whose `columns` key comes first never touches the rows.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._offsets = {}
+        self._array_lengths = {}
+        self._position = _expect(text, 0, "{")
+        self._pending = None
+        self._exhausted = False
+
+    def _iter_array(self, idx):
+        """Yields `(start, value, end)` for every element of the array that starts at `idx`."""
+        text = self.text
+        idx = _expect(text, idx, "[")
+        idx = _skip_whitespace(text, idx)
+        if text[idx : idx + 1] == "]":
+            return iter([])
+
+        return self._iter_elements(idx)
+
+    def _iter_elements(self, idx):
+        """Yields `(start, value, end)` for the elements of an array, from the element that
+        starts at `idx` to the end of the array."""
+        text = self.text
+        while True:
+            value, end = _decoder.raw_decode(text, idx)
+            yield idx, value, end
+            idx = _skip_whitespace(text, end)
+            char = text[idx : idx + 1]
+            if char == "]":
+                return
+            if char != ",":
+                raise simplejson.JSONDecodeError("Expecting ',' delimiter", text, idx)
+            idx = _skip_whitespace(text, idx + 1)
+
+    def _skip_value(self, key, idx):
+        text = self.text
+        idx = _skip_whitespace(text, idx)
+        if text[idx : idx + 1] != "[":
+            return _decoder.raw_decode(text, idx)[1]
+
+        count = 0
+        end = idx + 1
+        for _, _, end in self._iter_array(idx):
+            count += 1
+        self._array_lengths[key] = count
+        return _expect(text, end, "]")
+
+    def _skip_pending(self):
+        # The value of the last discovered key is skipped only when scanning further,
+        # so a caller asking for that key doesn't pay for walking over it twice.
+        if self._pending is None:
+            return
+
+        text = self.text
+        idx = _skip_whitespace(text, self._skip_value(self._pending, self._position))
+        if text[idx : idx + 1] == ",":
+            idx += 1
+        self._position = idx
+        self._pending = None
+
+    def _scan_until(self, wanted):
+        text = self.text
+        while not self._exhausted and wanted not in self._offsets:
+            self._skip_pending()
+
+            idx = _skip_whitespace(text, self._position)
+            if text[idx : idx + 1] == "}":
+                self._exhausted = True
+                break
+
+            key, idx = _decoder.raw_decode(text, idx)
+            idx = _skip_whitespace(text, _expect(text, idx, ":"))
+            self._offsets[key] = idx
+            self._position = idx
+            self._pending = key
+
+        return self._offsets.get(wanted)
+
+    def get(self, key, default=None):
+        idx = self._scan_until(key)
+        if idx is None:
+            return default
+        return _decoder.raw_decode(self.text, idx)[0]
+
+    def array_length(self, key):
+        if self._scan_until(key) is None:
+            return 0
+
+        if self._pending == key:
+            self._skip_pending()
+
+        return self._array_lengths.get(key, 0)
+
+    def iter_array(self, key):
+        idx = self._scan_until(key)
+        if idx is None or self.text[idx : idx + 1] != "[":
+            return
+
+        for _, value, _ in self._iter_array(idx):
+            yield value
+
+    @property
+    def columns(self):
+        return self.get("columns")
+
+    def iter_rows(self):
+        return self.iter_array("rows")
+
+    @property
+    def row_count(self):
+        return self.array_length("rows")
+
+    def row_index(self, step):
+        """
+        Returns the number of rows and the offsets (in the text) of every `step`th row, which
+        `rows_slice` starts reading from instead of walking all the rows before the slice.
+        It's a plain dict, so it can be cached.
+        """
+        idx = self._scan_until("rows")
+        offsets = []
+        row_count = 0
+        if idx is not None and self.text[idx : idx + 1] == "[":
+            for start, _, _ in self._iter_array(idx):
+                if row_count % step == 0:
+                    offsets.append(start)
+                row_count += 1
+
+        return {"step": step, "row_count": row_count, "offsets": offsets}
+
+    def rows_slice(self, offset=0, limit=None, row_index=None):
+        """Returns `limit` rows (or all remaining rows if `limit` is None) starting at
+        `offset`, reading from the closest row of `row_index` when it's given."""
+        stop = None if limit is None else offset + limit
+        if row_index is None:
+            return list(itertools.islice(self.iter_rows(), offset, stop))
+
+        step, offsets = row_index["step"], row_index["offsets"]
+        if offset >= row_index["row_count"]:
+            return []
+
+        first = offset // step
+        rows = (value for _, value, _ in self._iter_elements(offsets[first]))
+        skip = offset - first * step
+        return list(
+            itertools.islice(rows, skip, None if limit is None else skip + limit)
+        )
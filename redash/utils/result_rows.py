@@ -0,0 +1,81 @@
+"""
+Row formats of query results.
+
+Results are traditionally documents with a row object per row, keyed by column name:
+
+    {"columns": [...], "rows": [{"name": value, ...}, ...]}
+
+which repeats every column name in every row. In the "arrays" format, rows are arrays of
+values ordered like the columns instead:
+
+    {"row_format": "arrays", "columns": [...], "rows": [[value, ...], ...]}
+
+The `row_format` key always comes first, so the format of a stored result can be told from
+the start of its text without decoding it. Documents without it have object rows.
+"""
+import re
+
+ROW_FORMAT_KEY = "row_format"
+OBJECTS = "objects"
+ARRAYS = "arrays"
+ROW_FORMATS = (OBJECTS, ARRAYS)
+
+_STORED_ROW_FORMAT = re.compile(r'\s*\{\s*"row_format"\s*:\s*"(\w+)"')
+
+
+def stored_row_format(text):
+    """The row format of a result document stored as JSON `text`."""
+    match = _STORED_ROW_FORMAT.match(text)
+    return match.group(1) if match else OBJECTS
+
+
+def row_format(data):
+    return data.get(ROW_FORMAT_KEY, OBJECTS)
+
+
+def column_names(columns):
+    return [column["name"] for column in columns or []]
+
+
+def convert_rows(rows, names, source, target):
+    """
+    Returns an iterator over `rows` (in the `source` format) in the `target` format. Values of
+    keys of row objects that aren't in `names` are left out of row arrays.
+    """
+    if source == target:
+        return iter(rows)
+
+    if target == ARRAYS:
+        return ([row.get(name) for name in names] for row in rows)
+
+    return (dict(zip(names, row)) for row in rows)
+
+
+def document(columns, rows, target):
+    """A result document of `columns` and `rows` (already in the `target` format)."""
+    data = {ROW_FORMAT_KEY: ARRAYS} if target == ARRAYS else {}
+    data["columns"] = columns
+    data["rows"] = rows
+    return data
+
+
+def convert(data, target):
+    """Returns the result document `data` with its rows in the `target` format."""
+    if not isinstance(data, dict) or not isinstance(data.get("rows"), list):
+        return data
+
+    source = row_format(data)
+    if source == target:
+        return data
+
+    names = column_names(data.get("columns"))
+    converted = document(
+        data.get("columns"),
+        list(convert_rows(data["rows"], names, source, target)),
+        target,
+    )
+    for key, value in data.items():
+        if key not in converted and key != ROW_FORMAT_KEY:
+            converted[key] = value
+
+    return converted
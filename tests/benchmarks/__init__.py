@@ -0,0 +1,72 @@
+"""
+Benchmarks for performance sensitive code paths.
+
+Benchmark modules are not collected by pytest (their names don't start with `test_`).
+Run them directly against an environment configured like the one used by the test suite
+(PostgreSQL and Redis), for example:
+
+    python -m tests.benchmarks.benchmark_dsv_export
+"""
+import gc
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from tests import BaseTestCase
+
+
+class BenchmarkCase(BaseTestCase):
+    def runTest(self):
+        pass
+
+
+@contextmanager
+def benchmark_environment():
+    """Sets up a clean database and app context the same way `BaseTestCase` does,
+    and yields the test case so benchmarks can use its `factory` and `client`."""
+    case = BenchmarkCase()
+    case.setUp()
+    try:
+        yield case
+    finally:
+        case.tearDown()
+
+
+def measure(fn, *args, **kwargs):
+    """Runs `fn` and returns `(result, seconds, peak_allocated_bytes)`."""
+    gc.collect()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - started_at
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(title, rows, headers):
+    widths = [
+        max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)
+    ]
+    print(title)
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+    print()
+
+
+def megabytes(size):
+    return "{:.1f} MB".format(size / 1024.0 / 1024.0)
+
+
+def seconds(value):
+    return "{:.3f}s".format(value)
@@ -0,0 +1,99 @@
+"""
+Measures the cost of checking the alerts of a query (evaluating them and rendering their
+notification template) for results of growing size, compared with reading the whole result
+like alerts used to.
+
+    python -m tests.benchmarks.benchmark_alerts [alert_count]
+"""
+import sys
+
+from redash.models import Alert, OPERATORS, db, next_state
+from redash.utils import json_dumps, mustache_render
+from tests.benchmarks import benchmark_environment, measure, megabytes, report, seconds
+
+ROW_COUNTS = [1000, 100000, 1000000]
+TEMPLATE = "{{ALERT_NAME}} is {{ALERT_STATUS}}: {{QUERY_RESULT_VALUE}}"
+
+
+def generate_result(row_count):
+    return json_dumps(
+        {
+            "columns": [
+                {"name": "count", "friendly_name": "count", "type": "integer"},
+                {"name": "name", "friendly_name": "name", "type": "string"},
+            ],
+            "rows": [
+                {"count": i, "name": "row {}".format(i)} for i in range(row_count)
+            ],
+        }
+    )
+
+
+def check_alerts_legacy(alerts):
+    """Alert evaluation and rendering as it was, reading the whole result every time."""
+    for alert in alerts:
+        data = alert.query_rel.latest_query_data.data
+        rows = data["rows"]
+        column = alert.options["column"]
+        if rows and column in rows[0]:
+            op = OPERATORS.get(alert.options["op"], lambda v, t: False)
+            next_state(op, rows[0][column], alert.options["value"])
+
+        data = alert.query_rel.latest_query_data.data
+        mustache_render(
+            TEMPLATE,
+            {
+                "ALERT_NAME": alert.name,
+                "ALERT_STATUS": alert.state.upper(),
+                "QUERY_RESULT_VALUE": data["rows"][0][column],
+                "QUERY_RESULT_ROWS": data["rows"],
+                "QUERY_RESULT_COLS": data["columns"],
+            },
+        )
+
+
+def check_alerts(alerts):
+    for alert in alerts:
+        alert.evaluate()
+        alert.render_template(TEMPLATE)
+
+
+def load_alerts(query_id):
+    db.session.expunge_all()
+    return Alert.query.filter(Alert.query_id == query_id).all()
+
+
+def run(alert_count):
+    results = []
+
+    with benchmark_environment() as env:
+        factory = env.factory
+
+        for row_count in ROW_COUNTS:
+            query_result = factory.create_query_result(data=generate_result(row_count))
+            query = factory.create_query(latest_query_data=query_result)
+            for i in range(alert_count):
+                factory.create_alert(
+                    query_rel=query, options={"op": ">", "column": "count", "value": i},
+                )
+            db.session.commit()
+
+            for name, check in [
+                ("before", check_alerts_legacy),
+                ("after", check_alerts),
+            ]:
+                alerts = load_alerts(query.id)
+                # load the stored result once, like the first alert of a query does
+                alerts[0].query_rel.latest_query_data._data
+                _, elapsed, peak = measure(check, alerts)
+                results.append((row_count, name, seconds(elapsed), megabytes(peak)))
+
+    report(
+        "Checking {} alerts of a query".format(alert_count),
+        results,
+        ["rows", "", "duration", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
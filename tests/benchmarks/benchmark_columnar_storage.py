@@ -0,0 +1,105 @@
+"""
+Compares the size and encode/decode time of the JSON and columnar storage formats of
+query results over synthetic narrow, wide and long results.
+
+    python -m tests.benchmarks.benchmark_columnar_storage
+"""
+import random
+import string
+
+from redash.utils import columnar, json_dumps, json_loads
+from tests.benchmarks import measure, megabytes, report, seconds
+
+
+def random_word(rnd, length=8):
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_result(row_count, column_count, seed=0):
+    rnd = random.Random(seed)
+    categories = [random_word(rnd) for _ in range(20)]
+    kinds = ["integer", "float", "string", "category", "datetime", "boolean"]
+
+    columns = [
+        {
+            "name": "col_{}".format(i),
+            "friendly_name": "col_{}".format(i),
+            "type": kinds[i % len(kinds)],
+        }
+        for i in range(column_count)
+    ]
+
+    def value(kind, i):
+        if kind == "integer":
+            return rnd.randint(0, 10 ** 6)
+        if kind == "float":
+            return rnd.random() * 1000
+        if kind == "string":
+            return random_word(rnd, 12)
+        if kind == "category":
+            return rnd.choice(categories)
+        if kind == "datetime":
+            return "2020-01-{:02d}T{:02d}:00:00.000Z".format(i % 28 + 1, i % 24)
+        return i % 2 == 0
+
+    rows = [{c["name"]: value(c["type"], i) for c in columns} for i in range(row_count)]
+    return {"columns": columns, "rows": rows}
+
+
+SHAPES = [
+    ("narrow", 100000, 3),
+    ("wide", 5000, 120),
+    ("long", 1000000, 6),
+]
+
+
+def run():
+    results = []
+    for name, row_count, column_count in SHAPES:
+        text = json_dumps(generate_result(row_count, column_count))
+
+        encoded, encode_time, encode_peak = measure(
+            lambda: columnar.encode(json_loads(text))
+        )
+        _, json_decode_time, json_peak = measure(json_loads, text)
+        _, decode_time, decode_peak = measure(columnar.decode, encoded)
+
+        results.append(
+            (
+                name,
+                row_count,
+                column_count,
+                megabytes(len(text)),
+                megabytes(len(encoded)),
+                "{:.1f}x".format(len(text) / float(len(encoded))),
+                seconds(encode_time),
+                seconds(json_decode_time),
+                seconds(decode_time),
+                megabytes(json_peak),
+                megabytes(decode_peak),
+            )
+        )
+
+    report(
+        "Query result storage ({} compression)".format(
+            "zstd" if columnar.zstandard else "zlib"
+        ),
+        results,
+        [
+            "shape",
+            "rows",
+            "columns",
+            "json size",
+            "columnar size",
+            "ratio",
+            "encode",
+            "json read",
+            "columnar read",
+            "json read peak",
+            "columnar read peak",
+        ],
+    )
+
+
+if __name__ == "__main__":
+    run()
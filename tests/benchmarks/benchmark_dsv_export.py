@@ -0,0 +1,118 @@
+"""
+Compares the streaming CSV export with the previous implementation, which decoded the
+whole result and built the file in memory before responding.
+
+    python -m tests.benchmarks.benchmark_dsv_export [row_count ...]
+"""
+import csv
+import io
+import sys
+import time
+
+from redash.serializers.query_result import (
+    _get_column_lists,
+    serialize_query_result_to_dsv_stream,
+)
+from redash.utils import json_dumps, json_loads
+from tests.benchmarks import benchmark_environment, measure, megabytes, report, seconds
+
+
+def generate_result(row_count):
+    columns = [
+        {"name": "id", "friendly_name": "id", "type": "integer"},
+        {"name": "name", "friendly_name": "name", "type": "string"},
+        {"name": "active", "friendly_name": "active", "type": "boolean"},
+        {"name": "created_at", "friendly_name": "created_at", "type": "datetime"},
+        {"name": "amount", "friendly_name": "amount", "type": "float"},
+    ]
+    rows = [
+        {
+            "id": i,
+            "name": "customer {}".format(i),
+            "active": i % 3 == 0,
+            "created_at": "2020-01-01T12:00:00.000Z",
+            "amount": i * 1.5,
+        }
+        for i in range(row_count)
+    ]
+    return json_dumps({"columns": columns, "rows": rows})
+
+
+def legacy_dsv(text, delimiter):
+    s = io.StringIO()
+    query_data = json_loads(text)
+    fieldnames, special_columns = _get_column_lists(query_data["columns"] or [])
+    writer = csv.DictWriter(
+        s, extrasaction="ignore", fieldnames=fieldnames, delimiter=delimiter
+    )
+    writer.writeheader()
+    for row in query_data["rows"]:
+        for col_name, converter in special_columns.items():
+            if col_name in row:
+                row[col_name] = converter(row[col_name])
+        writer.writerow(row)
+    return [s.getvalue()]
+
+
+def consume(chunks):
+    started_at = time.perf_counter()
+    first_byte = None
+    size = 0
+    for chunk in chunks:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started_at
+        size += len(chunk)
+    return first_byte, size
+
+
+def run(row_counts):
+    results = []
+    with benchmark_environment() as env:
+        for row_count in row_counts:
+            query_result = env.factory.create_query_result(
+                data=generate_result(row_count)
+            )
+            text = query_result._data
+
+            with env.app.test_request_context("/"):
+                # the legacy path builds the whole file before the first byte is sent,
+                # so its time to first byte is its total time.
+                (_, size), elapsed, peak = measure(
+                    lambda: consume(legacy_dsv(text, ","))
+                )
+                results.append(
+                    (
+                        "legacy",
+                        row_count,
+                        seconds(elapsed),
+                        seconds(elapsed),
+                        megabytes(peak),
+                        megabytes(size),
+                    )
+                )
+
+                (ttfb, size), elapsed, peak = measure(
+                    lambda: consume(
+                        serialize_query_result_to_dsv_stream(query_result, ",")
+                    )
+                )
+                results.append(
+                    (
+                        "streaming",
+                        row_count,
+                        seconds(ttfb),
+                        seconds(elapsed),
+                        megabytes(peak),
+                        megabytes(size),
+                    )
+                )
+
+    report(
+        "CSV export",
+        results,
+        ["path", "rows", "first byte", "total", "peak memory", "output"],
+    )
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 500000])
@@ -0,0 +1,79 @@
+"""
+Compares the enqueue throughput of scheduled refreshes when every query is enqueued with
+`enqueue_query` and when all of them are enqueued at once with `enqueue_queries`.
+
+    python -m tests.benchmarks.benchmark_enqueue [query_count]
+"""
+import sys
+import time
+
+from rq import Connection
+
+from redash import rq_redis_connection
+from redash.tasks.queries.execution import enqueue_queries, enqueue_query
+from tests.benchmarks import benchmark_environment, report, seconds
+
+
+def requests_for(query, query_count, prefix):
+    return [
+        {
+            "query": "SELECT {} /* {} */".format(i, prefix),
+            "data_source": query.data_source,
+            "user_id": query.user_id,
+            "scheduled_query": query,
+            "metadata": {"Query ID": query.id, "Username": "Scheduled"},
+        }
+        for i in range(query_count)
+    ]
+
+
+def one_by_one(requests):
+    for r in requests:
+        enqueue_query(
+            r["query"],
+            r["data_source"],
+            r["user_id"],
+            scheduled_query=r["scheduled_query"],
+            metadata=r["metadata"],
+        )
+
+
+def run(query_count):
+    results = []
+
+    with benchmark_environment() as env, Connection(rq_redis_connection):
+        query = env.factory.create_query()
+
+        for name, enqueue, prefix in [
+            ("enqueue_query", one_by_one, "single"),
+            ("enqueue_queries", enqueue_queries, "bulk"),
+        ]:
+            requests = requests_for(query, query_count, prefix)
+            started_at = time.perf_counter()
+            enqueue(requests)
+            elapsed = time.perf_counter() - started_at
+            results.append(
+                (name, seconds(elapsed), "{:.0f}".format(query_count / elapsed))
+            )
+
+            # the same queries again: every lock points to a pending job
+            started_at = time.perf_counter()
+            enqueue(requests)
+            elapsed = time.perf_counter() - started_at
+            results.append(
+                (
+                    "{} (already enqueued)".format(name),
+                    seconds(elapsed),
+                    "{:.0f}".format(query_count / elapsed),
+                )
+            )
+
+    report(
+        "Enqueueing {} scheduled queries".format(query_count),
+        results,
+        ["", "duration", "jobs/sec"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,83 @@
+"""
+Compares the throughput of recording events with a job per event (the way events used to be
+recorded) and by buffering them in Redis and recording them in batches.
+
+The "request" stage is the work done while serving the API call, the "worker" stage the
+work done by the workers to record the events. The job per event worker stage leaves out
+the cost of dequeuing and running every job, so it's a lower bound.
+
+    python -m tests.benchmarks.benchmark_events [event_count]
+"""
+import sys
+
+from redash import rq_redis_connection
+from redash.models import Event, db
+from redash.tasks import enqueue_event, flush_events, record_event
+from redash.tasks.worker import Queue
+from tests.benchmarks import benchmark_environment, measure, report, seconds
+
+
+def raw_events(factory, count):
+    return [
+        {
+            "action": "view",
+            "object_type": "dashboard",
+            "object_id": i,
+            "org_id": factory.org.id,
+            "user_id": factory.user.id,
+            "user_name": factory.user.name,
+            "user_agent": "Mozilla/5.0",
+            "ip": "127.0.0.1",
+            "timestamp": 1577836800 + i,
+        }
+        for i in range(count)
+    ]
+
+
+def enqueue_jobs(events):
+    for event in events:
+        record_event.delay(event)
+
+
+def run_jobs(events):
+    for event in events:
+        record_event(event)
+
+
+def buffer_events(events):
+    for event in events:
+        enqueue_event(event)
+
+
+def run(event_count):
+    results = []
+
+    with benchmark_environment() as env:
+        db.session.commit()
+        events = raw_events(env.factory, event_count)
+
+        stages = [
+            ("job per event", "request", enqueue_jobs),
+            ("job per event", "worker", run_jobs),
+            ("buffered", "request", buffer_events),
+            ("buffered", "worker", flush_events),
+        ]
+        for mode, stage, fn in stages:
+            args = [] if fn is flush_events else [[dict(e) for e in events]]
+            _, elapsed, _ = measure(fn, *args)
+            results.append(
+                (mode, stage, seconds(elapsed), "{:.0f}".format(event_count / elapsed))
+            )
+
+        Queue("default", connection=rq_redis_connection).empty()
+        assert Event.query.count() == 2 * event_count
+
+    report(
+        "Recording {} events".format(event_count),
+        results,
+        ["", "stage", "duration", "events/sec"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
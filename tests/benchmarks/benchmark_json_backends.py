@@ -0,0 +1,83 @@
+"""
+Compares `json_dumps`/`json_loads` with the simplejson and orjson backends over payloads
+like the ones Redash handles: query results as built by query runners (with datetimes and
+decimals), the same results as stored, and data source schemas.
+
+    python -m tests.benchmarks.benchmark_json_backends [row_count]
+"""
+import datetime
+import decimal
+import sys
+
+from mock import patch
+
+from redash import utils
+from redash.utils import json_dumps, json_loads
+from tests.benchmarks import measure, megabytes, report, seconds
+
+
+def query_runner_result(row_count):
+    started_at = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    return {
+        "columns": [
+            {"name": "id", "friendly_name": "id", "type": "integer"},
+            {"name": "name", "friendly_name": "name", "type": "string"},
+            {"name": "amount", "friendly_name": "amount", "type": "float"},
+            {"name": "created_at", "friendly_name": "created_at", "type": "datetime"},
+        ],
+        "rows": [
+            {
+                "id": i,
+                "name": "customer {}".format(i % 1000),
+                "amount": decimal.Decimal(i) / 100,
+                "created_at": started_at + datetime.timedelta(seconds=i),
+            }
+            for i in range(row_count)
+        ],
+    }
+
+
+def schema(table_count):
+    return [
+        {
+            "name": "public.table_{}".format(i),
+            "columns": ["column_{}".format(c) for c in range(30)],
+        }
+        for i in range(table_count)
+    ]
+
+
+def run(row_count):
+    result = query_runner_result(row_count)
+    stored_result = json_dumps(result)
+    tables = schema(row_count // 100)
+    stored_schema = json_dumps(tables)
+
+    cases = [
+        ("dumps query runner result", json_dumps, result),
+        ("loads stored result", json_loads, stored_result),
+        ("dumps schema", json_dumps, tables),
+        ("loads schema", json_loads, stored_schema),
+    ]
+
+    results = []
+    for case, fn, payload in cases:
+        for backend in ("simplejson", "orjson"):
+            if backend == "orjson" and utils.orjson is None:
+                continue
+
+            with patch.object(utils, "JSON_BACKEND", backend):
+                _, elapsed, peak = measure(fn, payload)
+            results.append((case, backend, seconds(elapsed), megabytes(peak)))
+
+    report(
+        "JSON backends over a {} rows result ({})".format(
+            row_count, megabytes(len(stored_result))
+        ),
+        results,
+        ["payload", "backend", "duration", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,76 @@
+"""
+Compares the latency and peak memory of rendering the JSON response of a stored result by
+decoding and encoding it again, and by splicing the stored JSON text into the response.
+
+    python -m tests.benchmarks.benchmark_json_response [size_in_mb ...]
+"""
+import sys
+
+from redash.models import QueryResult
+from redash.serializers import serialize_query_result_to_json
+from redash.utils import json_dumps, utcnow
+from tests.benchmarks import measure, megabytes, report, seconds
+
+COLUMNS = [
+    {"name": "id", "friendly_name": "id", "type": "integer"},
+    {"name": "name", "friendly_name": "name", "type": "string"},
+    {"name": "value", "friendly_name": "value", "type": "float"},
+    {"name": "created_at", "friendly_name": "created_at", "type": "datetime"},
+]
+
+
+def row(i):
+    return {
+        "id": i,
+        "name": "row {}".format(i),
+        "value": i / 7.0,
+        "created_at": "2020-01-01T00:00:{:02d}.000Z".format(i % 60),
+    }
+
+
+def generate_result(size):
+    row_size = len(json_dumps(row(10 ** 6))) + 2
+    row_count = size // row_size
+    return json_dumps({"columns": COLUMNS, "rows": [row(i) for i in range(row_count)]})
+
+
+def stored_result(text):
+    return QueryResult(
+        id=1,
+        query_hash="hash",
+        query_text="SELECT * FROM rows",
+        data=text,
+        data_source_id=1,
+        runtime=1.0,
+        retrieved_at=utcnow(),
+    )
+
+
+def reencode(query_result):
+    return json_dumps({"query_result": query_result.to_dict()})
+
+
+def run(sizes):
+    results = []
+
+    for size in sizes:
+        text = generate_result(size * 1024 * 1024)
+
+        for name, render in [
+            ("decode and encode", reencode),
+            ("stored JSON spliced", serialize_query_result_to_json),
+        ]:
+            _, elapsed, peak = measure(render, stored_result(text))
+            results.append(
+                (megabytes(len(text)), name, seconds(elapsed), megabytes(peak))
+            )
+
+    report(
+        "Rendering query result JSON responses",
+        results,
+        ["result size", "rendering", "latency", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run([int(size) for size in sys.argv[1:]] or [10, 100])
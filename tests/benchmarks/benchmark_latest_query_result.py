@@ -0,0 +1,117 @@
+"""
+Seeds a large query_results table and reports the p50/p99 latency of the
+`QueryResult.get_latest` lookup with the previous (non sargable) freshness predicate and
+without the composite index, and with the current predicate and index.
+
+    python -m tests.benchmarks.benchmark_latest_query_result [result_count] [lookups]
+"""
+import hashlib
+import random
+import sys
+import time
+
+from redash.models import QueryResult, db
+from tests.benchmarks import benchmark_environment, percentile, report
+
+INDEX_NAME = "query_results_data_source_id_query_hash_retrieved_at"
+
+LEGACY_LOOKUP = """
+SELECT id FROM query_results
+WHERE query_hash = :query_hash AND data_source_id = :data_source_id
+  AND timezone('utc', retrieved_at) + :max_age * interval '1 second' >= timezone('utc', now())
+ORDER BY retrieved_at DESC
+LIMIT 1
+"""
+
+LOOKUP = """
+SELECT id FROM query_results
+WHERE query_hash = :query_hash AND data_source_id = :data_source_id
+  AND retrieved_at >= now() - :max_age * interval '1 second'
+ORDER BY retrieved_at DESC
+LIMIT 1
+"""
+
+
+def seed(org_id, data_source_id, result_count, hash_count):
+    db.session.execute(
+        """
+        INSERT INTO query_results (org_id, data_source_id, query_hash, query, data, runtime, retrieved_at)
+        SELECT :org_id, :data_source_id, md5((i % :hash_count)::text), 'SELECT ' || (i % :hash_count),
+               '{"columns": [], "rows": []}', 0.1, now() - (i || ' seconds')::interval
+        FROM generate_series(1, :result_count) AS i
+        """,
+        {
+            "org_id": org_id,
+            "data_source_id": data_source_id,
+            "hash_count": hash_count,
+            "result_count": result_count,
+        },
+    )
+    db.session.commit()
+    db.session.execute("ANALYZE query_results")
+
+
+def time_lookups(sql, data_source_id, hash_count, lookups):
+    rnd = random.Random(0)
+    timings = []
+    for _ in range(lookups):
+        params = {
+            "query_hash": hashlib.md5(
+                str(rnd.randrange(hash_count)).encode()
+            ).hexdigest(),
+            "data_source_id": data_source_id,
+            "max_age": rnd.choice([60, 3600, 86400]),
+        }
+        started_at = time.perf_counter()
+        db.session.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return timings
+
+
+def run(result_count, lookups):
+    hash_count = max(1, result_count // 100)
+    results = []
+
+    with benchmark_environment() as env:
+        data_source = env.factory.data_source
+        seed(data_source.org_id, data_source.id, result_count, hash_count)
+
+        db.session.execute("DROP INDEX IF EXISTS {}".format(INDEX_NAME))
+        db.session.commit()
+        timings = time_lookups(LEGACY_LOOKUP, data_source.id, hash_count, lookups)
+        results.append(
+            (
+                "before",
+                "{:.2f}ms".format(percentile(timings, 50)),
+                "{:.2f}ms".format(percentile(timings, 99)),
+            )
+        )
+
+        for index in QueryResult.__table__.indexes:
+            if index.name == INDEX_NAME:
+                index.create(db.engine)
+        db.session.execute("ANALYZE query_results")
+        db.session.commit()
+        timings = time_lookups(LOOKUP, data_source.id, hash_count, lookups)
+        results.append(
+            (
+                "after",
+                "{:.2f}ms".format(percentile(timings, 50)),
+                "{:.2f}ms".format(percentile(timings, 99)),
+            )
+        )
+
+    report(
+        "QueryResult.get_latest lookup over {} results ({} query hashes)".format(
+            result_count, hash_count
+        ),
+        results,
+        ["", "p50", "p99"],
+    )
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
@@ -0,0 +1,122 @@
+"""
+Measures joining the cached results of three queries with the Query Results data source:
+loading the results the way the data source used to (decoding them and inserting one row at
+a time), bulk loading them, and attaching them from the on-disk cache, cold and warm, with
+and without index hints.
+
+    python -m tests.benchmarks.benchmark_query_results_join [row_count]
+"""
+import sqlite3
+import sys
+import tempfile
+
+from mock import patch
+
+from redash.query_runner.query_results import Results, fix_column_name, flatten
+from redash.utils import json_dumps, json_loads
+from tests.benchmarks import benchmark_environment, measure, megabytes, report, seconds
+
+JOIN = """
+SELECT a.customer, count(*), sum(b.amount), max(c.day)
+FROM cached_query_{} a
+JOIN cached_query_{} b ON b.id = a.id
+JOIN cached_query_{} c ON c.id = b.id
+GROUP BY a.customer
+"""
+INDEX_HINTS = "-- index: cached_query_{}(id)\n-- index: cached_query_{}(id)\n"
+
+
+def generate_result(row_count):
+    return json_dumps(
+        {
+            "columns": [
+                {"name": "id", "friendly_name": "id", "type": "integer"},
+                {"name": "customer", "friendly_name": "customer", "type": "string"},
+                {"name": "amount", "friendly_name": "amount", "type": "float"},
+                {"name": "day", "friendly_name": "day", "type": "date"},
+            ],
+            "rows": [
+                {
+                    "id": i,
+                    "customer": "customer {}".format(i % 100),
+                    "amount": i / 7.0,
+                    "day": "2020-01-{:02d}".format(i % 28 + 1),
+                }
+                for i in range(row_count)
+            ],
+        }
+    )
+
+
+def join_legacy(query_results, query):
+    """Loads every result the way the data source used to, and runs the query."""
+    connection = sqlite3.connect(":memory:")
+    for query_result, query_id in query_results:
+        data = json_loads(query_result._data)
+        columns = [column["name"] for column in data["columns"]]
+        table_name = "cached_query_{}".format(query_id)
+        connection.execute(
+            "CREATE TABLE {} ({})".format(
+                table_name, ", ".join(fix_column_name(c) for c in columns)
+            )
+        )
+        insert = "insert into {} values ({})".format(
+            table_name, ",".join(["?"] * len(columns))
+        )
+        for row in data["rows"]:
+            connection.execute(insert, [flatten(row.get(c)) for c in columns])
+
+    rows = connection.execute(query).fetchall()
+    connection.close()
+    return rows
+
+
+def run_query(user, query):
+    data, error = Results({}).run_query(query, user)
+    assert error is None, error
+    return data
+
+
+def run(row_count):
+    results = []
+
+    with benchmark_environment() as env, tempfile.TemporaryDirectory() as cache_path:
+        factory = env.factory
+        queries = []
+        for _ in range(3):
+            query_result = factory.create_query_result(data=generate_result(row_count))
+            queries.append(factory.create_query(latest_query_data=query_result))
+
+        ids = [query.id for query in queries]
+        join = JOIN.format(*ids)
+        hinted_join = INDEX_HINTS.format(ids[1], ids[2]) + join
+
+        def timed(name, fn, *args):
+            # every stage reads the stored results from the database again
+            env.db.session.expire_all()
+            _, elapsed, peak = measure(fn, *args)
+            results.append((name, seconds(elapsed), megabytes(peak)))
+
+        timed(
+            "before",
+            join_legacy,
+            [(query.latest_query_data, query.id) for query in queries],
+            join,
+        )
+        timed("bulk load", run_query, factory.user, join)
+
+        with patch("redash.settings.QUERY_RESULTS_RUNNER_CACHE_PATH", cache_path):
+            timed("cache (cold)", run_query, factory.user, join)
+            timed("cache (warm)", run_query, factory.user, join)
+            timed("cache (warm) + index hints", run_query, factory.user, hinted_join)
+            timed("cache (warm, indexed)", run_query, factory.user, hinted_join)
+
+    report(
+        "Joining three {} rows query results".format(row_count),
+        results,
+        ["", "duration", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,65 @@
+"""
+Measures the latency of reading a page of rows from a stored result, compared with
+deserializing the whole result.
+
+    python -m tests.benchmarks.benchmark_result_slices [row_count]
+"""
+import sys
+
+from redash.models import ColumnarPersistence, DBPersistence
+from redash.utils import json_dumps
+from tests.benchmarks import measure, megabytes, report, seconds
+
+
+def generate_result(row_count):
+    return json_dumps(
+        {
+            "columns": [
+                {"name": "id", "friendly_name": "id", "type": "integer"},
+                {"name": "name", "friendly_name": "name", "type": "string"},
+                {"name": "value", "friendly_name": "value", "type": "float"},
+            ],
+            "rows": [
+                {"id": i, "name": "row {}".format(i), "value": i / 7.0}
+                for i in range(row_count)
+            ],
+        }
+    )
+
+
+def stored(persistence_class, text):
+    result = persistence_class()
+    result.data = text
+    return result
+
+
+def run(row_count):
+    text = generate_result(row_count)
+    results = []
+
+    for name, persistence_class in (
+        ("json", DBPersistence),
+        ("columnar", ColumnarPersistence),
+    ):
+        cases = [
+            ("full deserialization", lambda r: r.data),
+            ("columns", lambda r: r.columns),
+            ("first 100 rows", lambda r: r.rows_slice(0, 100)),
+            ("100 rows at the middle", lambda r: r.rows_slice(row_count // 2, 100)),
+            ("last 100 rows", lambda r: r.rows_slice(row_count - 100, 100)),
+            ("row count", lambda r: r.row_count),
+        ]
+        for case, read in cases:
+            result = stored(persistence_class, text)
+            _, elapsed, peak = measure(read, result)
+            results.append((name, case, seconds(elapsed), megabytes(peak)))
+
+    report(
+        "Reading slices of a {} rows result".format(row_count),
+        results,
+        ["storage", "read", "latency", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,78 @@
+"""
+Compares the peak memory of serializing query results the way query runners used to (fetching
+every row into a list of dicts and dumping it at once) with streaming the rows through
+`ResultStream`, for results of growing size.
+
+    python -m tests.benchmarks.benchmark_result_stream [max_row_count]
+"""
+import datetime
+import sys
+
+from redash.query_runner import FETCH_BATCH_SIZE, ResultStream
+from redash.utils import json_dumps
+from tests.benchmarks import measure, megabytes, report, seconds
+
+COLUMNS = [
+    {"name": "id", "friendly_name": "id", "type": "integer"},
+    {"name": "name", "friendly_name": "name", "type": "string"},
+    {"name": "amount", "friendly_name": "amount", "type": "float"},
+    {"name": "created_at", "friendly_name": "created_at", "type": "datetime"},
+]
+
+
+def cursor_batches(row_count):
+    """Row batches like the ones a database cursor returns, generated as they're fetched."""
+    started_at = datetime.datetime(2020, 1, 1)
+    for start in range(0, row_count, FETCH_BATCH_SIZE):
+        yield [
+            (
+                i,
+                "customer {}".format(i % 1000),
+                i / 100.0,
+                started_at + datetime.timedelta(seconds=i),
+            )
+            for i in range(start, min(start + FETCH_BATCH_SIZE, row_count))
+        ]
+
+
+def serialize_legacy(row_count):
+    names = [column["name"] for column in COLUMNS]
+    rows = [
+        dict(zip(names, row)) for batch in cursor_batches(row_count) for row in batch
+    ]
+    return json_dumps({"columns": COLUMNS, "rows": rows}, ignore_nan=True)
+
+
+def serialize_stream(row_count):
+    return ResultStream(COLUMNS, cursor_batches(row_count)).to_json()
+
+
+def run(max_row_count):
+    results = []
+    row_count = 1000
+    while row_count <= max_row_count:
+        for name, serialize in [
+            ("before", serialize_legacy),
+            ("after", serialize_stream),
+        ]:
+            data, elapsed, peak = measure(serialize, row_count)
+            results.append(
+                (
+                    row_count,
+                    name,
+                    seconds(elapsed),
+                    megabytes(peak),
+                    megabytes(len(data)),
+                )
+            )
+        row_count *= 10
+
+    report(
+        "Serializing query results",
+        results,
+        ["rows", "", "duration", "peak memory", "result size"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,77 @@
+"""
+Compares results with rows as objects keyed by column name and as arrays of values, over
+the whole path of a result: serializing what the query runner fetched, the size of the
+stored result, serving it in either row format and exporting it as CSV.
+
+    python -m tests.benchmarks.benchmark_row_format [row_count]
+"""
+import sys
+
+from redash.query_runner import ResultStream
+from redash.serializers import (
+    serialize_query_result_to_dsv,
+    serialize_query_result_to_json,
+)
+from redash.utils import result_rows
+from tests.benchmarks import benchmark_environment, measure, report
+from tests.benchmarks.benchmark_result_stream import COLUMNS, cursor_batches
+
+
+def per_row(value, row_count, unit):
+    return "{:.1f} {}".format(value / row_count, unit)
+
+
+def run(row_count):
+    results = []
+
+    with benchmark_environment() as env:
+        for stored_format in result_rows.ROW_FORMATS:
+            stream = ResultStream(COLUMNS, cursor_batches(row_count))
+            text, elapsed, _ = measure(stream.to_json, row_format=stored_format)
+            results.append(
+                (
+                    stored_format,
+                    "store",
+                    per_row(elapsed * 1e6, row_count, "us"),
+                    per_row(len(text), row_count, "B"),
+                )
+            )
+
+            query_result = env.factory.create_query_result(data=text)
+            for row_format in result_rows.ROW_FORMATS:
+                query_result.data = text  # drop the deserialized data of the last run
+                response, elapsed, _ = measure(
+                    serialize_query_result_to_json, query_result, row_format=row_format
+                )
+                results.append(
+                    (
+                        stored_format,
+                        "serve as {}".format(row_format),
+                        per_row(elapsed * 1e6, row_count, "us"),
+                        per_row(len(response), row_count, "B"),
+                    )
+                )
+
+            with env.app.test_request_context("/"):
+                query_result.data = text
+                csv, elapsed, _ = measure(
+                    serialize_query_result_to_dsv, query_result, ","
+                )
+            results.append(
+                (
+                    stored_format,
+                    "export CSV",
+                    per_row(elapsed * 1e6, row_count, "us"),
+                    per_row(len(csv), row_count, "B"),
+                )
+            )
+
+    report(
+        "Row formats over a {} rows result".format(row_count),
+        results,
+        ["stored rows", "stage", "time per row", "bytes per row"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
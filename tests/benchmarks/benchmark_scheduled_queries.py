@@ -0,0 +1,131 @@
+"""
+Seeds a large number of scheduled queries and compares the duration of a scheduler tick
+evaluating every scheduled query (the previous `Query.outdated_queries`) with the current
+implementation, which only evaluates the queries its due index reports.
+
+    python -m tests.benchmarks.benchmark_scheduled_queries [query_count]
+"""
+import random
+import sys
+import time
+
+from sqlalchemy.orm import joinedload
+
+from redash import models, redis_connection
+from redash.models import Query, db
+from redash.utils import utcnow
+from tests.benchmarks import benchmark_environment, measure, megabytes, report, seconds
+
+INTERVALS = ["60", "300", "3600", "86400"]
+
+
+def seed(org_id, data_source_id, user_id, query_count):
+    db.session.execute(
+        """
+        INSERT INTO queries (version, org_id, data_source_id, user_id, name, description, query,
+                             query_hash, api_key, is_archived, is_draft, schedule,
+                             schedule_failures, options, created_at, updated_at)
+        SELECT 1, :org_id, :data_source_id, :user_id, 'Query ' || i, '', 'SELECT ' || i,
+               md5('SELECT ' || i), md5(i::text), false, false,
+               '{{"interval": "' || (ARRAY[{intervals}])[1 + i % {interval_count}]
+                   || '", "time": null, "until": null, "day_of_week": null}}',
+               0, '{{}}', now(), now()
+        FROM generate_series(1, :query_count) AS i
+        """.format(
+            intervals=", ".join("'{}'".format(interval) for interval in INTERVALS),
+            interval_count=len(INTERVALS),
+        ),
+        {
+            "org_id": org_id,
+            "data_source_id": data_source_id,
+            "user_id": user_id,
+            "query_count": query_count,
+        },
+    )
+    db.session.commit()
+
+    # every query ran sometime during the last day
+    rnd = random.Random(0)
+    now = time.time()
+    query_ids = [query_id for (query_id,) in db.session.query(Query.id)]
+    pipe = redis_connection.pipeline()
+    for start in range(0, len(query_ids), 10000):
+        pipe.hmset(
+            models.ScheduledQueriesExecutions.KEY_NAME,
+            {
+                query_id: now - rnd.randint(0, 86400)
+                for query_id in query_ids[start : start + 10000]
+            },
+        )
+    pipe.execute()
+
+    return query_ids
+
+
+def full_scan():
+    """The scheduler tick as it was before the due index."""
+    queries = (
+        Query.query.options(
+            joinedload(Query.latest_query_data).load_only("retrieved_at")
+        )
+        .filter(Query.schedule.isnot(None))
+        .order_by(Query.id)
+    )
+
+    now = utcnow()
+    outdated_queries = {}
+    models.scheduled_queries_executions.refresh()
+
+    for query in queries:
+        retrieved_at = models.scheduled_queries_executions.get(query.id) or (
+            query.latest_query_data and query.latest_query_data.retrieved_at
+        )
+        if models.should_schedule_next(
+            retrieved_at or now,
+            now,
+            query.schedule["interval"],
+            query.schedule["time"],
+            query.schedule["day_of_week"],
+            query.schedule_failures,
+        ):
+            outdated_queries[
+                "{}:{}".format(query.query_hash, query.data_source_id)
+            ] = query
+
+    return list(outdated_queries.values())
+
+
+def tick(fn):
+    result, elapsed, peak = measure(fn)
+    db.session.expunge_all()
+    return len(result), seconds(elapsed), megabytes(peak)
+
+
+def run(query_count):
+    results = []
+
+    with benchmark_environment() as env:
+        factory = env.factory
+        query_ids = seed(
+            factory.org.id, factory.data_source.id, factory.user.id, query_count
+        )
+
+        results.append(("full scan",) + tick(full_scan))
+        results.append(("due index, first tick",) + tick(Query.outdated_queries))
+        results.append(("due index, next tick",) + tick(Query.outdated_queries))
+
+        # a steady state tick: 1% of the queries were executed since the last one
+        executed = random.Random(1).sample(query_ids, len(query_ids) // 100)
+        for query_id in executed:
+            models.scheduled_queries_executions.update(query_id)
+        results.append(("due index, 1% executed",) + tick(Query.outdated_queries))
+
+    report(
+        "Scheduler tick over {} scheduled queries".format(query_count),
+        results,
+        ["", "outdated", "duration", "peak memory"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,125 @@
+"""
+Compares guessing the column types of a result with `ColumnTypes` with the previous per value
+loop of the Query Results runner, over rows like the ones SQLite returns for a result with
+integer, float, date, numeric text and free text columns.
+
+    python -m tests.benchmarks.benchmark_type_inference [cell_count]
+"""
+import datetime
+import sys
+
+from dateutil import parser
+
+from redash.query_runner import (
+    FETCH_BATCH_SIZE,
+    TYPE_BOOLEAN,
+    TYPE_DATETIME,
+    TYPE_FLOAT,
+    TYPE_INTEGER,
+    TYPE_STRING,
+    ColumnTypes,
+)
+from tests.benchmarks import measure, report, seconds
+
+COLUMN_COUNT = 5
+
+
+def generate_rows(row_count):
+    started_at = datetime.datetime(2020, 1, 1)
+    return [
+        (
+            i,
+            i / 3.0,
+            (started_at + datetime.timedelta(minutes=i)).isoformat(),
+            str(i % 5000),
+            "customer {}".format(i % 1000) if i % 10 else None,
+        )
+        for i in range(row_count)
+    ]
+
+
+def legacy_guess_type(value):
+    if isinstance(value, bool):
+        return TYPE_BOOLEAN
+    elif isinstance(value, int):
+        return TYPE_INTEGER
+    elif isinstance(value, float):
+        return TYPE_FLOAT
+
+    if value == "" or value is None:
+        return TYPE_STRING
+
+    try:
+        int(value)
+        return TYPE_INTEGER
+    except (ValueError, OverflowError):
+        pass
+
+    try:
+        float(value)
+        return TYPE_FLOAT
+    except (ValueError, OverflowError):
+        pass
+
+    if str(value).lower() in ("true", "false"):
+        return TYPE_BOOLEAN
+
+    try:
+        parser.parse(value)
+        return TYPE_DATETIME
+    except (ValueError, OverflowError):
+        pass
+
+    return TYPE_STRING
+
+
+def batches(rows):
+    for start in range(0, len(rows), FETCH_BATCH_SIZE):
+        yield rows[start : start + FETCH_BATCH_SIZE]
+
+
+def guess_legacy(rows):
+    types = [None] * COLUMN_COUNT
+    for batch in batches(rows):
+        for row in batch:
+            for j, col in enumerate(row):
+                guess = legacy_guess_type(col)
+
+                if types[j] is None:
+                    types[j] = guess
+                elif types[j] != guess:
+                    types[j] = TYPE_STRING
+    return types
+
+
+def guess_column_types(rows):
+    column_types = ColumnTypes(COLUMN_COUNT)
+    for batch in batches(rows):
+        column_types.update(batch)
+    return column_types.types
+
+
+def run(cell_count):
+    rows = generate_rows(cell_count // COLUMN_COUNT)
+    cells = len(rows) * COLUMN_COUNT
+
+    results = []
+    verdicts = []
+    for name, guess in [("before", guess_legacy), ("after", guess_column_types)]:
+        types, elapsed, _ = measure(guess, rows)
+        verdicts.append(types)
+        results.append(
+            (name, seconds(elapsed), "{:.0f}".format(cells / elapsed), ", ".join(types))
+        )
+
+    assert verdicts[0] == verdicts[1]
+
+    report(
+        "Guessing the column types of {} cells".format(cells),
+        results,
+        ["", "duration", "cells/sec", "types"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
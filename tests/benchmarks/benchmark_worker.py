@@ -0,0 +1,49 @@
+"""
+Measures query execution throughput (jobs/sec) for short `SELECT 1` style queries, with
+the default worker that forks a work horse for every job and with the non forking worker.
+
+    python -m tests.benchmarks.benchmark_worker [job_count]
+"""
+import sys
+import time
+
+from rq import Connection
+
+from redash import rq_redis_connection
+from redash.tasks import NonForkingWorker, Worker
+from redash.tasks.queries.execution import enqueue_query
+from tests.benchmarks import benchmark_environment, report, seconds
+
+
+def run(job_count):
+    results = []
+
+    with benchmark_environment() as env, Connection(rq_redis_connection):
+        query = env.factory.create_query()
+
+        for name, worker_class in [("fork", Worker), ("no fork", NonForkingWorker)]:
+            for i in range(job_count):
+                enqueue_query(
+                    "SELECT {} /* {} */".format(i, name),
+                    query.data_source,
+                    query.user_id,
+                    metadata={"Query ID": query.id, "Username": "Benchmark"},
+                )
+
+            started_at = time.perf_counter()
+            worker_class(["queries"], job_monitoring_interval=1).work(burst=True)
+            elapsed = time.perf_counter() - started_at
+
+            results.append(
+                (name, seconds(elapsed), "{:.1f}".format(job_count / elapsed))
+            )
+
+    report(
+        "Executing {} SELECT queries".format(job_count),
+        results,
+        ["worker", "duration", "jobs/sec"],
+    )
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -1,3 +1,5 @@
+from sqlalchemy import event
+
 from tests import BaseTestCase
 
 from redash.models import ApiKey, Dashboard, AccessPermission, db
@@ -81,6 +83,44 @@ class TestDashboardResourceGet(BaseTestCase):
         self.assertTrue(rv.json["widgets"][0]["restricted"])
         self.assertNotIn("restricted", rv.json["widgets"][1])
 
+    def test_get_dashboard_loads_widgets_with_a_fixed_number_of_statements(self):
+        def statement_count(widget_count):
+            dashboard = self.factory.create_dashboard()
+            for _ in range(widget_count):
+                data_source = self.factory.create_data_source(
+                    group=self.factory.default_group
+                )
+                query = self.factory.create_query(
+                    data_source=data_source, user=self.factory.create_user()
+                )
+                vis = self.factory.create_visualization(query_rel=query)
+                self.factory.create_widget(visualization=vis, dashboard=dashboard)
+            self.factory.create_widget(
+                dashboard=dashboard, visualization=None, text="Text"
+            )
+            db.session.commit()
+            # make sure nothing is served from the session's identity map
+            db.session.expire_all()
+
+            statements = []
+
+            def count(conn, cursor, statement, *args):
+                statements.append(statement)
+
+            event.listen(db.engine, "before_cursor_execute", count)
+            try:
+                rv = self.make_request(
+                    "get", "/api/dashboards/{0}".format(dashboard.slug)
+                )
+            finally:
+                event.remove(db.engine, "before_cursor_execute", count)
+
+            self.assertEqual(rv.status_code, 200)
+            self.assertEqual(len(rv.json["widgets"]), widget_count + 1)
+            return len(statements)
+
+        self.assertEqual(statement_count(20), statement_count(1))
+
     def test_get_non_existing_dashboard(self):
         rv = self.make_request("get", "/api/dashboards/not_existing")
         self.assertEqual(rv.status_code, 404)
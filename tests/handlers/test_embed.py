@@ -1,4 +1,7 @@
+from mock import patch
+
 from tests import BaseTestCase
+from redash import models
 from redash.models import db
 
 
@@ -116,6 +119,94 @@ class TestAPIPublicDashboard(BaseTestCase):
         )
         self.assertEqual(res.status_code, 404)
 
+    def test_returns_not_modified_for_matching_etag(self):
+        dashboard = self.factory.create_dashboard()
+        api_key = self.factory.create_api_key(object=dashboard)
+        path = "/api/dashboards/public/{}".format(api_key.api_key)
+
+        res = self.get_request(path, org=self.factory.org)
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers["ETag"]
+
+        res = self.get_request(
+            path, org=self.factory.org, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(res.status_code, 304)
+
+    def test_serves_snapshot_until_results_change(self):
+        widget = self.factory.create_widget()
+        query = widget.visualization.query_rel
+        api_key = self.factory.create_api_key(object=widget.dashboard)
+        db.session.commit()
+        path = "/api/dashboards/public/{}".format(api_key.api_key)
+
+        res = self.get_request(path, org=self.factory.org)
+        etag = res.headers["ETag"]
+
+        with patch("redash.handlers.dashboards.public_dashboard") as public_dashboard:
+            res = self.get_request(path, org=self.factory.org)
+            public_dashboard.assert_not_called()
+        self.assertEqual(res.headers["ETag"], etag)
+
+        query_result = self.factory.create_query_result(query_text=query.query_text)
+        query.latest_query_data = query_result
+        db.session.commit()
+
+        res = self.get_request(
+            path, org=self.factory.org, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res.json["widgets"][0]["visualization"]["query"]["latest_query_data_id"],
+            query_result.id,
+        )
+
+    def test_rebuilds_snapshot_when_widgets_change(self):
+        dashboard = self.factory.create_dashboard()
+        api_key = self.factory.create_api_key(object=dashboard)
+        db.session.commit()
+        path = "/api/dashboards/public/{}".format(api_key.api_key)
+
+        res = self.get_request(path, org=self.factory.org)
+        self.assertEqual(res.json["widgets"], [])
+
+        self.factory.create_widget(dashboard=dashboard)
+        db.session.commit()
+
+        res = self.get_request(path, org=self.factory.org)
+        self.assertEqual(len(res.json["widgets"]), 1)
+
+    def test_invalidates_snapshot_once_changes_commit(self):
+        dashboard = self.factory.create_dashboard()
+        api_key = self.factory.create_api_key(object=dashboard)
+        db.session.commit()
+        self.get_request(
+            "/api/dashboards/public/{}".format(api_key.api_key), org=self.factory.org
+        )
+
+        with patch.object(
+            models.public_dashboard_snapshots, "invalidate"
+        ) as invalidate:
+            dashboard.name = "Renamed"
+            db.session.flush()
+            invalidate.assert_not_called()
+
+            db.session.commit()
+
+        self.assertIn(dashboard.id, invalidate.call_args[0][0])
+
+    def test_invalidates_snapshots_when_data_source_is_deleted(self):
+        widget = self.factory.create_widget()
+        query = widget.visualization.query_rel
+        db.session.commit()
+
+        with patch.object(
+            models.public_dashboard_snapshots, "invalidate"
+        ) as invalidate:
+            query.data_source.delete()
+
+        self.assertIn(query.id, invalidate.call_args[0][1])
+
     # Not relevant for now, as tokens in api_keys table are only created for dashboards. Once this changes, we should
     # add this test.
     # def test_token_doesnt_belong_to_dashboard(self):
@@ -1,4 +1,4 @@
-from tests import BaseTestCase
+from tests import BaseTestCase, authenticate_request
 
 from redash.models import db
 from redash.utils import json_dumps
@@ -29,6 +29,58 @@ class TestQueryResultsCacheHeaders(BaseTestCase):
         self.assertEqual(404, rv.status_code)
 
 
+class TestQueryResultsETags(BaseTestCase):
+    def test_returns_not_modified_for_matching_etag(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+        path = "/api/queries/{}/results.json".format(query.id)
+
+        rv = self.make_request("get", path)
+        self.assertEqual(rv.status_code, 200)
+        etag = rv.headers["ETag"]
+
+        rv = self.get_request(path, org=self.factory.org, headers={"If-None-Match": etag})
+        self.assertEqual(rv.status_code, 304)
+        self.assertEqual(rv.data, b"")
+        self.assertEqual(rv.headers["ETag"], etag)
+
+    def test_returns_result_when_latest_result_changed(self):
+        query_result = self.factory.create_query_result()
+        query = self.factory.create_query(latest_query_data=query_result)
+        path = "/api/queries/{}/results.json".format(query.id)
+
+        etag = self.make_request("get", path).headers["ETag"]
+
+        query.latest_query_data = self.factory.create_query_result()
+        db.session.commit()
+
+        rv = self.get_request(path, org=self.factory.org, headers={"If-None-Match": etag})
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.json["query_result"]["id"], query.latest_query_data_id)
+
+    def test_uses_different_etags_for_each_format_and_page(self):
+        query_result = self.factory.create_query_result()
+        path = "/api/query_results/{}".format(query_result.id)
+
+        etags = set(
+            self.make_request("get", path + suffix).headers["ETag"]
+            for suffix in [".json", ".csv", ".json?offset=0&limit=10"]
+        )
+
+        self.assertEqual(len(etags), 3)
+
+    def test_checks_access_before_returning_not_modified(self):
+        query_result = self.factory.create_query_result()
+        path = "/api/query_results/{}".format(query_result.id)
+        etag = self.make_request("get", path).headers["ETag"]
+
+        user = self.factory.create_user(group_ids=[self.factory.create_group().id])
+        authenticate_request(self.client, user)
+
+        rv = self.get_request(path, org=self.factory.org, headers={"If-None-Match": etag})
+        self.assertEqual(rv.status_code, 403)
+
+
 class TestQueryResultsContentDispositionHeaders(BaseTestCase):
     def test_supports_unicode(self):
         query_result = self.factory.create_query_result()
@@ -42,6 +94,80 @@ class TestQueryResultsContentDispositionHeaders(BaseTestCase):
             self.fail(repr(e))            
 
 
+class TestQueryResultsPagination(BaseTestCase):
+    def create_result(self):
+        data = {
+            "rows": [{"id": i} for i in range(10)],
+            "columns": [{"name": "id", "type": "integer"}],
+        }
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+        query = self.factory.create_query(latest_query_data=query_result)
+        return query, query_result
+
+    def test_returns_requested_rows(self):
+        query, query_result = self.create_result()
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}?offset=3&limit=2".format(query_result.id)
+        )
+        self.assertEqual(rv.status_code, 200)
+        data = rv.json["query_result"]["data"]
+        self.assertEqual(data["rows"], [{"id": 3}, {"id": 4}])
+        self.assertEqual(data["columns"], [{"name": "id", "type": "integer"}])
+
+    def test_pages_query_results(self):
+        query, _ = self.create_result()
+
+        rv = self.make_request(
+            "get", "/api/queries/{}/results.json?offset=8&limit=5".format(query.id)
+        )
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.json["query_result"]["data"]["rows"], [{"id": 8}, {"id": 9}])
+
+    def test_rejects_invalid_values(self):
+        _, query_result = self.create_result()
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}?offset=-1".format(query_result.id)
+        )
+        self.assertEqual(rv.status_code, 400)
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}?limit=all".format(query_result.id)
+        )
+        self.assertEqual(rv.status_code, 400)
+
+
+class TestQueryResultsRowFormat(BaseTestCase):
+    def test_returns_rows_in_requested_format(self):
+        data = {
+            "rows": [{"id": i, "name": "row {}".format(i)} for i in range(3)],
+            "columns": [{"name": "id"}, {"name": "name"}],
+        }
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+        path = "/api/query_results/{}".format(query_result.id)
+
+        rv = self.make_request("get", path)
+        self.assertEqual(rv.json["query_result"]["data"]["rows"], data["rows"])
+
+        rv = self.make_request("get", path + "?row_format=arrays")
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(
+            rv.json["query_result"]["data"]["rows"], [[i, "row {}".format(i)] for i in range(3)]
+        )
+        self.assertNotEqual(
+            rv.headers["ETag"], self.make_request("get", path).headers["ETag"]
+        )
+
+    def test_rejects_unknown_formats(self):
+        query_result = self.factory.create_query_result()
+
+        rv = self.make_request(
+            "get", "/api/query_results/{}?row_format=columns".format(query_result.id)
+        )
+        self.assertEqual(rv.status_code, 400)
+
+
 class TestQueryResultListAPI(BaseTestCase):
     def test_get_existing_result(self):
         query_result = self.factory.create_query_result()
@@ -445,3 +571,25 @@ class TestQueryResultExcelResponse(BaseTestCase):
             is_json=False,
         )
         self.assertEqual(rv.status_code, 200)
+
+
+class TestQueryResultCsvResponse(BaseTestCase):
+    def test_streams_csv_file(self):
+        query = self.factory.create_query()
+        data = {
+            "rows": [{"test": 1, "flag": True}, {"test": 2}],
+            "columns": [
+                {"name": "test", "type": "integer"},
+                {"name": "flag", "type": "boolean"},
+            ],
+        }
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+
+        rv = self.make_request(
+            "get",
+            "/api/queries/{}/results/{}.csv".format(query.id, query_result.id),
+            is_json=False,
+        )
+        self.assertEqual(rv.status_code, 200)
+        self.assertTrue(rv.is_streamed)
+        self.assertEqual(rv.data.decode("utf-8"), "test,flag\r\n1,true\r\n2,\r\n")
@@ -1,4 +1,7 @@
 from unittest import TestCase
+
+from mock import PropertyMock, patch
+
 from tests import BaseTestCase
 from redash.models import Alert, db, next_state, OPERATORS
 from redash.utils import json_dumps
@@ -75,6 +78,59 @@ class TestAlertEvaluate(BaseTestCase):
         self.assertEqual(alert.evaluate(), Alert.UNKNOWN_STATE)
 
 
+class TestAlertRenderTemplate(BaseTestCase):
+    def create_alert(self, results):
+        result = self.factory.create_query_result(data=results)
+        query = self.factory.create_query(latest_query_data_id=result.id)
+        return self.factory.create_alert(
+            query_rel=query, options={"op": "equals", "column": "foo", "value": "1"}
+        )
+
+    def test_renders_result_value(self):
+        alert = self.create_alert(get_results(5))
+
+        self.assertEqual(alert.render_template("value: {{QUERY_RESULT_VALUE}}"), "value: 5")
+
+    def test_renders_result_rows_and_columns(self):
+        alert = self.create_alert(get_results(5))
+
+        rendered = alert.render_template(
+            "{{#QUERY_RESULT_COLS}}{{name}}{{/QUERY_RESULT_COLS}}:"
+            "{{#QUERY_RESULT_ROWS}}{{foo}}{{/QUERY_RESULT_ROWS}}"
+        )
+
+        self.assertEqual(rendered, "foo:5")
+
+    def test_doesnt_read_whole_result_unless_rendered(self):
+        alert = self.create_alert(get_results(5))
+        query_result = alert.query_rel.latest_query_data
+
+        with patch.object(
+            type(query_result), "data", new_callable=PropertyMock
+        ) as data, patch.object(type(query_result), "iter_rows") as iter_rows:
+            alert.evaluate()
+            alert.render_template("{{ALERT_NAME}}: {{QUERY_RESULT_VALUE}}")
+
+            data.assert_not_called()
+            iter_rows.assert_not_called()
+
+    def test_alerts_of_a_query_share_the_first_row(self):
+        alert = self.create_alert(get_results(1))
+        other_alert = self.factory.create_alert(
+            query_rel=alert.query_rel,
+            options={"op": "equals", "column": "foo", "value": "1"},
+        )
+        query_result = alert.query_rel.latest_query_data
+
+        with patch.object(
+            type(query_result), "rows_slice", return_value=[{"foo": 1}]
+        ) as rows_slice:
+            self.assertEqual(alert.evaluate(), Alert.TRIGGERED_STATE)
+            self.assertEqual(other_alert.evaluate(), Alert.TRIGGERED_STATE)
+
+        rows_slice.assert_called_once_with(0, 1)
+
+
 class TestNextState(TestCase):
     def test_numeric_value(self):
         self.assertEqual(Alert.TRIGGERED_STATE, next_state(OPERATORS.get("=="), 1, "1"))
@@ -5,7 +5,8 @@ from tests import BaseTestCase
 from mock import patch
 
 from redash import models
-from redash.models import DBPersistence
+from redash.models import ColumnarPersistence, DBPersistence
+from redash.utils import columnar
 from redash.utils import utcnow, json_dumps
 
 
@@ -93,6 +94,116 @@ class QueryResultTest(BaseTestCase):
         self.assertEqual(original_updated_at, query.updated_at)
 
 
+class LatestQueryResultsCacheTest(BaseTestCase):
+    def test_caches_latest_result(self):
+        qr = self.factory.create_query_result()
+        models.QueryResult.get_latest(qr.data_source, qr.query_text, 60)
+
+        cached = models.latest_query_results.get(qr.data_source.id, qr.query_hash)
+        self.assertEqual(cached[0], qr.id)
+
+        with patch.object(models.QueryResult, "_get_latest_from_db") as db_lookup:
+            found_query_result = models.QueryResult.get_latest(
+                qr.data_source, qr.query_text, 60
+            )
+            db_lookup.assert_not_called()
+
+        self.assertEqual(found_query_result, qr)
+
+    def test_cached_result_respects_max_age(self):
+        qr = self.factory.create_query_result(
+            retrieved_at=utcnow() - datetime.timedelta(seconds=90)
+        )
+        models.QueryResult.get_latest(qr.data_source, qr.query_text, -1)
+
+        self.assertIsNone(
+            models.QueryResult.get_latest(qr.data_source, qr.query_text, 60)
+        )
+        self.assertEqual(
+            models.QueryResult.get_latest(qr.data_source, qr.query_text, 120), qr
+        )
+
+    def test_caches_stored_result_once_committed(self):
+        qr = self.factory.create_query_result()
+        models.QueryResult.get_latest(qr.data_source, qr.query_text, -1)
+
+        new_qr = models.QueryResult.store_result(
+            qr.org_id, qr.data_source, qr.query_hash, qr.query_text, "{}", 1, utcnow()
+        )
+        models.db.session.flush()
+        self.assertEqual(
+            models.latest_query_results.get(qr.data_source.id, qr.query_hash)[0], qr.id
+        )
+
+        models.db.session.commit()
+
+        self.assertEqual(
+            models.latest_query_results.get(qr.data_source.id, qr.query_hash)[0],
+            new_qr.id,
+        )
+        self.assertEqual(
+            models.QueryResult.get_latest(qr.data_source, qr.query_text, -1), new_qr
+        )
+
+    def test_lookup_racing_a_new_result_does_not_cache_the_result_it_replaced(self):
+        qr = self.factory.create_query_result(
+            retrieved_at=utcnow() - datetime.timedelta(seconds=60)
+        )
+        models.db.session.commit()
+
+        new_qr = models.QueryResult.store_result(
+            qr.org_id, qr.data_source, qr.query_hash, qr.query_text, "{}", 1, utcnow()
+        )
+        models.db.session.flush()
+        new_qr_id = new_qr.id
+
+        # a lookup that read the database before the new result was committed
+        stale_lookup = (qr.data_source.id, qr.query_hash, qr.id, qr.retrieved_at)
+        models.latest_query_results.set(*stale_lookup)
+        models.db.session.commit()
+        models.latest_query_results.set(*stale_lookup)
+
+        self.assertEqual(
+            models.latest_query_results.get(qr.data_source.id, qr.query_hash)[0],
+            new_qr_id,
+        )
+
+    def test_rolled_back_results_are_not_cached(self):
+        qr = self.factory.create_query_result()
+        models.db.session.commit()
+
+        models.QueryResult.store_result(
+            qr.org_id, qr.data_source, qr.query_hash, qr.query_text, "{}", 1, utcnow()
+        )
+        models.db.session.flush()
+        models.db.session.rollback()
+        models.db.session.commit()
+
+        self.assertEqual(
+            models.latest_query_results.get(qr.data_source.id, qr.query_hash)[0], qr.id
+        )
+
+    def test_falls_back_to_database_when_cached_result_was_removed(self):
+        qr = self.factory.create_query_result()
+        models.latest_query_results.set(
+            qr.data_source.id, qr.query_hash, qr.id + 1000, utcnow()
+        )
+
+        self.assertEqual(
+            models.QueryResult.get_latest(qr.data_source, qr.query_text, 60), qr
+        )
+
+    def test_disabled_with_zero_ttl(self):
+        qr = self.factory.create_query_result()
+
+        with patch("redash.settings.QUERY_RESULTS_LATEST_CACHE_TTL", 0):
+            models.QueryResult.get_latest(qr.data_source, qr.query_text, 60)
+
+        self.assertIsNone(
+            models.latest_query_results.get(qr.data_source.id, qr.query_hash)
+        )
+
+
 class TestDBPersistence(TestCase):
     def test_updating_data_removes_cached_result(self):
         p = DBPersistence()
@@ -110,3 +221,168 @@ class TestDBPersistence(TestCase):
         a = p.data
         b = p.data
         json_loads_patch.assert_called_once_with(json_data)
+
+
+class TestResultAccessors(TestCase):
+    data = {
+        "columns": [{"name": "id", "type": "integer"}],
+        "rows": [{"id": i} for i in range(10)],
+    }
+
+    def persistence(self):
+        p = DBPersistence()
+        p.data = json_dumps(self.data)
+        return p
+
+    def test_reads_columns(self):
+        self.assertEqual(self.persistence().columns, self.data["columns"])
+
+    def test_counts_rows(self):
+        self.assertEqual(self.persistence().row_count, 10)
+
+    def test_iterates_rows(self):
+        self.assertEqual(list(self.persistence().iter_rows()), self.data["rows"])
+
+    def test_slices_rows(self):
+        p = self.persistence()
+        self.assertEqual(p.rows_slice(2, 3), self.data["rows"][2:5])
+        self.assertEqual(p.rows_slice(8, 5), self.data["rows"][8:])
+        self.assertEqual(p.rows_slice(20, 5), [])
+        self.assertEqual(p.rows_slice(7), self.data["rows"][7:])
+
+    @patch("redash.models.json_loads")
+    def test_accessors_dont_deserialize_whole_result(self, json_loads_patch):
+        p = self.persistence()
+        p.columns
+        p.row_count
+        p.rows_slice(0, 1)
+        list(p.iter_rows())
+        json_loads_patch.assert_not_called()
+
+    def test_uses_deserialized_data_when_available(self):
+        p = self.persistence()
+        p.data["rows"].append({"id": 10})
+
+        self.assertEqual(p.row_count, 11)
+        self.assertEqual(p.rows_slice(10, 1), [{"id": 10}])
+
+
+class TestResultPages(BaseTestCase):
+    def setUp(self):
+        super(TestResultPages, self).setUp()
+        self.data = {
+            "columns": [{"name": "id", "type": "integer"}],
+            "rows": [{"id": i} for i in range(25)],
+        }
+        self.query_result = self.factory.create_query_result(data=json_dumps(self.data))
+
+    def test_paged_result_includes_row_count(self):
+        d = self.query_result.to_dict(offset=10, limit=5)
+
+        self.assertEqual(d["data"]["rows"], self.data["rows"][10:15])
+        self.assertEqual(d["data"]["row_count"], 25)
+
+    @patch.object(models.QueryResultRowIndexes, "STEP", 4)
+    def test_reads_pages_from_the_row_index(self):
+        self.assertEqual(self.query_result.row_count, 25)
+        self.assertEqual(
+            models.query_result_row_indexes.get(self.query_result.id)["row_count"], 25
+        )
+
+        query_result = models.QueryResult.query.get(self.query_result.id)
+        db_rows_slice = "redash.utils.incremental_json.StoredResultReader.rows_slice"
+        with patch(db_rows_slice, autospec=True) as rows_slice:
+            rows_slice.return_value = []
+            query_result.rows_slice(10, 5)
+
+        row_index = rows_slice.call_args[0][3]
+        self.assertEqual(row_index["step"], 4)
+        self.assertEqual(len(row_index["offsets"]), 7)
+
+    @patch.object(models.QueryResultRowIndexes, "STEP", 4)
+    def test_slices_indexed_rows(self):
+        self.query_result.row_count
+        query_result = models.QueryResult.query.get(self.query_result.id)
+
+        for offset, limit in ((0, 5), (3, 2), (4, 4), (10, 100), (30, 5)):
+            self.assertEqual(
+                query_result.rows_slice(offset, limit),
+                self.data["rows"][offset : offset + limit],
+            )
+
+
+class TestArrayRows(TestCase):
+    columns = [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}]
+    stored = json_dumps(
+        {"row_format": "arrays", "columns": columns, "rows": [[1, "a"], [2, None]]}
+    )
+    rows = [{"id": 1, "name": "a"}, {"id": 2, "name": None}]
+
+    def persistence(self):
+        p = DBPersistence()
+        p.data = self.stored
+        return p
+
+    def test_returns_row_objects(self):
+        p = self.persistence()
+
+        self.assertEqual(p.row_format, "arrays")
+        self.assertEqual(list(p.iter_rows()), self.rows)
+        self.assertEqual(p.rows_slice(1, 1), self.rows[1:])
+        self.assertEqual(p.first_row, self.rows[0])
+        self.assertEqual(p.data, {"columns": self.columns, "rows": self.rows})
+
+    def test_returns_rows_in_requested_format(self):
+        p = self.persistence()
+        self.assertEqual(list(p.iter_rows("arrays")), [[1, "a"], [2, None]])
+
+        p = DBPersistence()
+        p.data = json_dumps({"columns": self.columns, "rows": [{"id": 3}]})
+        self.assertEqual(p.row_format, "objects")
+        self.assertEqual(p.rows_slice(0, 1, "arrays"), [[3, None]])
+
+    def test_columnar_persistence_encodes_row_objects(self):
+        p = ColumnarPersistence()
+        p.data = self.stored
+
+        self.assertTrue(columnar.is_encoded(p._data))
+        self.assertEqual(p.data, {"columns": self.columns, "rows": self.rows})
+
+
+class TestColumnarPersistence(TestCase):
+    data = {
+        "columns": [
+            {"name": "id", "type": "integer"},
+            {"name": "name", "type": "string"},
+        ],
+        "rows": [{"id": 1, "name": "a"}, {"id": 2, "name": "a"}, {"id": 3}],
+    }
+
+    def test_stores_encoded_data(self):
+        p = ColumnarPersistence()
+        p.data = json_dumps(self.data)
+
+        self.assertTrue(columnar.is_encoded(p._data))
+        self.assertDictEqual(p.data, self.data)
+
+    def test_reads_rows_and_columns_without_full_decode(self):
+        p = ColumnarPersistence()
+        p.data = json_dumps(self.data)
+
+        self.assertEqual(p.columns, self.data["columns"])
+        self.assertEqual(list(p.iter_rows()), self.data["rows"])
+
+    def test_reads_results_stored_as_json(self):
+        p = ColumnarPersistence()
+        p._data = json_dumps(self.data)
+
+        self.assertDictEqual(p.data, self.data)
+        self.assertEqual(list(p.iter_rows()), self.data["rows"])
+
+    def test_keeps_data_that_cant_be_encoded(self):
+        p = ColumnarPersistence()
+        p.data = ""
+        self.assertEqual(p._data, "")
+
+        p.data = '{"test": 1}'
+        self.assertEqual(p._data, '{"test": 1}')
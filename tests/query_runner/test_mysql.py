@@ -0,0 +1,15 @@
+from unittest import TestCase
+from redash.query_runner.mysql import _is_single_select
+
+
+class TestIsSingleSelect(TestCase):
+    def test_single_select(self):
+        self.assertTrue(_is_single_select("SELECT 1"))
+        self.assertTrue(_is_single_select("-- comment\nselect * from t;\n"))
+        self.assertTrue(_is_single_select("WITH a AS (SELECT 1) SELECT * FROM a"))
+
+    def test_other_queries(self):
+        self.assertFalse(_is_single_select("SELECT 1; SELECT 2"))
+        self.assertFalse(_is_single_select("SET @a = 1; SELECT @a"))
+        self.assertFalse(_is_single_select("CALL report()"))
+        self.assertFalse(_is_single_select("SHOW TABLES"))
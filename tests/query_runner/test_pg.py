@@ -1,5 +1,5 @@
 from unittest import TestCase
-from redash.query_runner.pg import build_schema
+from redash.query_runner.pg import build_schema, _is_single_select
 
 
 class TestBuildSchema(TestCase):
@@ -24,3 +24,20 @@ class TestBuildSchema(TestCase):
         self.assertListEqual(schema["main.users"]["columns"], ["id", "name"])
         self.assertIn('public."main.users"', schema.keys())
         self.assertListEqual(schema['public."main.users"']["columns"], ["id"])
+
+
+class TestIsSingleSelect(TestCase):
+    def test_single_select(self):
+        self.assertTrue(_is_single_select("SELECT 1"))
+        self.assertTrue(_is_single_select("-- comment\nselect * from t;\n"))
+        self.assertTrue(_is_single_select("WITH a AS (SELECT 1) SELECT * FROM a"))
+        self.assertTrue(_is_single_select("SELECT 'insert' AS action"))
+
+    def test_other_queries(self):
+        self.assertFalse(_is_single_select("SELECT 1; SELECT 2"))
+        self.assertFalse(_is_single_select("INSERT INTO t VALUES (1); SELECT * FROM t"))
+        self.assertFalse(_is_single_select("UPDATE t SET a = 1"))
+        self.assertFalse(_is_single_select("SELECT * INTO t2 FROM t"))
+        self.assertFalse(
+            _is_single_select("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d")
+        )
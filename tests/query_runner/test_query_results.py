@@ -1,4 +1,6 @@
+import os
 import sqlite3
+import tempfile
 from unittest import TestCase
 
 import pytest
@@ -8,8 +10,11 @@ from redash.query_runner.query_results import (
     CreateTableError,
     PermissionError,
     _load_query,
+    create_indexes,
     create_table,
+    create_tables_from_query_ids,
     extract_cached_query_ids,
+    extract_index_hints,
     extract_query_ids,
     get_query_results,
     fix_column_name,
@@ -130,6 +135,97 @@ class TestCreateTable(TestCase):
         self.assertEqual(len(list(connection.execute("SELECT * FROM query_123"))), 2)
 
 
+    def test_creates_typed_columns(self):
+        connection = sqlite3.connect(":memory:")
+        results = {
+            "columns": [{"name": "id", "type": "integer"}, {"name": "code", "type": "string"}],
+            "rows": [{"id": "1", "code": "007"}],
+        }
+        create_table(connection, "query_123", results)
+
+        self.assertEqual(
+            list(connection.execute("SELECT id, code FROM query_123")), [(1, "007")]
+        )
+
+
+class TestIndexHints(TestCase):
+    def test_extracts_index_hints(self):
+        query = "-- index: cached_query_1(id)\n--INDEX: query_2 (user_id, day)\nSELECT 1"
+        self.assertEqual(
+            extract_index_hints(query),
+            [("cached_query_1", ["id"]), ("query_2", ["user_id", "day"])],
+        )
+
+    def test_creates_indexes(self):
+        connection = sqlite3.connect(":memory:")
+        create_table(connection, "query_1", {"columns": [{"name": "id"}], "rows": []})
+
+        create_indexes(connection, {"query_1": ("main", "query_1")}, [("query_1", ["id"])])
+
+        plan = list(connection.execute("EXPLAIN QUERY PLAN SELECT * FROM query_1 WHERE id = 1"))
+        self.assertIn("USING COVERING INDEX", plan[0][-1])
+
+    def test_rejects_hints_for_tables_not_in_the_query(self):
+        connection = sqlite3.connect(":memory:")
+
+        with pytest.raises(Exception):
+            create_indexes(connection, {}, [("query_1", ["id"])])
+
+
+class TestCachedTables(BaseTestCase):
+    def setUp(self):
+        super(TestCachedTables, self).setUp()
+        self.cache_path = tempfile.mkdtemp()
+        patcher = mock.patch(
+            "redash.settings.QUERY_RESULTS_RUNNER_CACHE_PATH", self.cache_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_query(self, row_count):
+        data = {
+            "columns": [{"name": "id", "type": "integer"}],
+            "rows": [{"id": i} for i in range(row_count)],
+        }
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+        return self.factory.create_query(latest_query_data=query_result)
+
+    def load(self, *query_ids):
+        connection = sqlite3.connect(":memory:")
+        tables = create_tables_from_query_ids(self.factory.user, connection, [], query_ids)
+        return connection, tables
+
+    def test_reuses_cached_results(self):
+        query = self.create_query(5)
+        table_name = "cached_query_{}".format(query.id)
+
+        connection, tables = self.load(query.id)
+        self.assertEqual(tables[table_name], ("{}_db".format(table_name), "result"))
+        self.assertEqual(
+            list(connection.execute("SELECT count(*) FROM {}".format(table_name))), [(5,)]
+        )
+
+        with mock.patch("redash.models.QueryResult.iter_rows") as iter_rows:
+            connection, _ = self.load(query.id)
+            iter_rows.assert_not_called()
+
+        self.assertEqual(
+            list(connection.execute("SELECT max(id) FROM {}".format(table_name))), [(4,)]
+        )
+
+    def test_evicts_least_recently_used_results(self):
+        first, second = self.create_query(1000), self.create_query(1000)
+        self.load(first.id)
+
+        with mock.patch("redash.settings.QUERY_RESULTS_RUNNER_CACHE_MAX_SIZE", 0):
+            self.load(second.id)
+
+        self.assertEqual(
+            os.listdir(self.cache_path),
+            ["query_result_{}.sqlite".format(second.latest_query_data_id)],
+        )
+
+
 class TestGetQuery(BaseTestCase):
     # test query from different account
     def test_raises_exception_for_query_from_different_account(self):
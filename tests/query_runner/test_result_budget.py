@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from redash.query_runner import ResultBudget
+from redash.utils import json_dumps, json_loads
+
+COLUMNS = [{"name": "id"}, {"name": "name"}]
+
+
+def cursor(row_count):
+    rows = iter([(i, "row {}".format(i)) for i in range(row_count)])
+    cursor = Mock()
+    cursor.fetchmany.side_effect = lambda size: [
+        row for _, row in zip(range(size), rows)
+    ]
+    return cursor
+
+
+class TestResultBudget(TestCase):
+    def test_fetches_all_rows_without_limits(self):
+        budget = ResultBudget()
+        rows = budget.fetch(cursor(25), COLUMNS, batch_size=10)
+
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0], {"id": 0, "name": "row 0"})
+        self.assertFalse(budget.truncated)
+        self.assertEqual(budget.mark({"rows": rows}), {"rows": rows})
+
+    def test_stops_fetching_at_max_rows(self):
+        budget = ResultBudget(max_rows=15)
+        c = cursor(1000)
+        rows = budget.fetch(c, COLUMNS, batch_size=10)
+
+        self.assertEqual(len(rows), 15)
+        self.assertTrue(budget.truncated)
+        self.assertEqual(c.fetchmany.call_count, 2)
+        self.assertEqual(budget.mark({})["metadata"], {"truncated": True})
+
+    def test_isnt_truncated_when_rows_match_max_rows(self):
+        budget = ResultBudget(max_rows=20)
+        rows = budget.fetch(cursor(20), COLUMNS, batch_size=10)
+
+        self.assertEqual(len(rows), 20)
+        self.assertFalse(budget.truncated)
+
+    def test_stops_fetching_at_max_bytes(self):
+        row_size = len(json_dumps({"id": 10, "name": "row 10"})) + 2
+        budget = ResultBudget(max_bytes=row_size * 30)
+        rows = budget.fetch(cursor(1000), COLUMNS, batch_size=100)
+
+        self.assertTrue(budget.truncated)
+        self.assertLessEqual(len(json_dumps(rows)), row_size * 30)
+        self.assertGreater(len(rows), 25)
+
+    def test_enforces_limits_on_serialized_results(self):
+        data = json_dumps({"columns": COLUMNS, "rows": [{"id": i} for i in range(5)]})
+
+        self.assertEqual(ResultBudget(max_rows=5).enforce(data), data)
+
+        truncated = json_loads(ResultBudget(max_rows=2).enforce(data))
+        self.assertEqual(truncated["rows"], [{"id": 0}, {"id": 1}])
+        self.assertTrue(truncated["metadata"]["truncated"])
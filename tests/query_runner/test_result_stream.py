@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from redash.query_runner import BaseQueryRunner, ResultBudget, ResultStream
+from redash.utils import json_dumps, json_loads
+
+COLUMNS = [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}]
+
+
+def batches(row_count, batch_size=10):
+    rows = [(i, "row {}".format(i)) for i in range(row_count)]
+    for start in range(0, row_count, batch_size):
+        yield rows[start : start + batch_size]
+
+
+class TestResultStream(TestCase):
+    def test_serializes_like_json_dumps(self):
+        stream = ResultStream(COLUMNS, batches(25), {"data_scanned": 10})
+        expected = json_dumps(
+            {
+                "columns": COLUMNS,
+                "rows": [{"id": i, "name": "row {}".format(i)} for i in range(25)],
+                "metadata": {"data_scanned": 10},
+            }
+        )
+
+        self.assertEqual(stream.to_json(), expected)
+
+    def test_serializes_rows_as_arrays(self):
+        stream = ResultStream(COLUMNS, batches(3))
+        expected = json_dumps(
+            {
+                "row_format": "arrays",
+                "columns": COLUMNS,
+                "rows": [[i, "row {}".format(i)] for i in range(3)],
+            }
+        )
+
+        self.assertEqual(stream.to_json(row_format="arrays"), expected)
+
+    def test_leaves_out_empty_metadata(self):
+        data = json_loads(ResultStream(COLUMNS, []).to_json())
+
+        self.assertEqual(data, {"columns": COLUMNS, "rows": []})
+
+    def test_stops_at_the_budget_and_closes_the_batches(self):
+        rows = batches(1000)
+        data = json_loads(
+            ResultStream(COLUMNS, rows).to_json(ResultBudget(max_rows=15))
+        )
+
+        self.assertEqual(len(data["rows"]), 15)
+        self.assertTrue(data["metadata"]["truncated"])
+        with self.assertRaises(StopIteration):
+            next(rows)
+
+    def test_uses_columns_updated_while_streaming(self):
+        columns = [{"name": "id", "type": None}]
+
+        def typed_batches():
+            yield [(1,)]
+            columns[0]["type"] = "integer"
+
+        data = json_loads(ResultStream(columns, typed_batches()).to_json())
+
+        self.assertEqual(data["columns"], [{"name": "id", "type": "integer"}])
+
+
+class TestRunQueryStream(TestCase):
+    def test_adapts_run_query(self):
+        runner = BaseQueryRunner({})
+        data = {"columns": COLUMNS, "rows": [{"id": 1, "name": "a"}, {"id": 2}]}
+        runner.run_query = Mock(return_value=(json_dumps(data), None))
+
+        stream = runner.run_query_stream("SELECT 1", None)
+
+        self.assertEqual(stream.columns, COLUMNS)
+        self.assertEqual(list(stream.batches), [[(1, "a"), (2, None)]])
+
+    def test_raises_run_query_errors(self):
+        runner = BaseQueryRunner({})
+        runner.run_query = Mock(return_value=(None, "syntax error"))
+
+        with self.assertRaisesRegex(Exception, "syntax error"):
+            runner.run_query_stream("SELECT 1", None)
+
+    def test_run_query_from_stream_returns_errors(self):
+        runner = BaseQueryRunner({})
+        runner.run_query_stream = Mock(side_effect=Exception("connection refused"))
+
+        self.assertEqual(
+            runner.run_query_from_stream("SELECT 1", None), (None, "connection refused")
+        )
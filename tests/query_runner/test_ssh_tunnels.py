@@ -0,0 +1,195 @@
+import threading
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from redash.query_runner import ResultStream, SSHTunnelManager, with_ssh_tunnel
+
+DETAILS = {"ssh_host": "bastion", "ssh_port": 22, "ssh_username": "redash"}
+
+
+def fake_open_tunnel(*args, **kwargs):
+    server = Mock()
+    server.is_active = True
+    server.local_bind_address = ("127.0.0.1", 10000 + len(fake_open_tunnel.servers))
+    fake_open_tunnel.servers.append(server)
+    return server
+
+
+@patch("redash.query_runner.open_tunnel", side_effect=fake_open_tunnel)
+class TestSSHTunnelManager(TestCase):
+    def setUp(self):
+        fake_open_tunnel.servers = []
+        self.manager = SSHTunnelManager(idle_timeout=300, max_tunnels=2)
+
+    def test_reuses_open_tunnels(self, open_tunnel):
+        with self.manager.tunnel(DETAILS, ("db", 5432)) as address:
+            pass
+        with self.manager.tunnel(DETAILS, ("db", 5432)) as other_address:
+            pass
+
+        self.assertEqual(address, other_address)
+        self.assertEqual(open_tunnel.call_count, 1)
+
+    def test_keeps_a_tunnel_per_remote_address(self, open_tunnel):
+        with self.manager.tunnel(DETAILS, ("db", 5432)) as address:
+            pass
+        with self.manager.tunnel(DETAILS, ("other-db", 5432)) as other_address:
+            pass
+
+        self.assertNotEqual(address, other_address)
+        self.assertEqual(open_tunnel.call_count, 2)
+
+    def test_replaces_inactive_tunnels(self, open_tunnel):
+        with self.manager.tunnel(DETAILS, ("db", 5432)):
+            pass
+        server = fake_open_tunnel.servers[0]
+        server.is_active = False
+
+        with self.manager.tunnel(DETAILS, ("db", 5432)):
+            pass
+
+        server.stop.assert_called_once_with()
+        self.assertEqual(open_tunnel.call_count, 2)
+
+    def test_closes_idle_tunnels(self, open_tunnel):
+        with patch("time.time", return_value=0):
+            with self.manager.tunnel(DETAILS, ("db", 5432)):
+                pass
+        server = fake_open_tunnel.servers[0]
+
+        with patch("time.time", return_value=301):
+            with self.manager.tunnel(DETAILS, ("other-db", 5432)):
+                pass
+
+        server.stop.assert_called_once_with()
+        self.assertEqual(len(self.manager._tunnels), 1)
+
+    def test_opens_single_use_tunnels_over_the_limit(self, open_tunnel):
+        with self.manager.tunnel(DETAILS, ("db", 1)), self.manager.tunnel(
+            DETAILS, ("db", 2)
+        ), self.manager.tunnel(DETAILS, ("db", 3)):
+            self.assertEqual(len(self.manager._tunnels), 2)
+
+        self.assertEqual(open_tunnel.call_count, 3)
+        fake_open_tunnel.servers[2].stop.assert_called_once_with()
+        self.assertEqual(len(self.manager._tunnels), 2)
+
+    def test_closes_all_unused_tunnels(self, open_tunnel):
+        with self.manager.tunnel(DETAILS, ("db", 1)):
+            pass
+        with self.manager.tunnel(DETAILS, ("db", 2)):
+            self.manager.close_all()
+
+        fake_open_tunnel.servers[0].stop.assert_called_once_with()
+        fake_open_tunnel.servers[1].stop.assert_not_called()
+        self.assertEqual(len(self.manager._tunnels), 1)
+
+    def test_opens_tunnels_without_blocking_other_keys(self, open_tunnel):
+        handshaking = threading.Event()
+        handshake_done = threading.Event()
+        slow_tunnel_opened = threading.Event()
+
+        def slow_open_tunnel(*args, **kwargs):
+            if kwargs["remote_bind_address"] != ("slow-db", 5432):
+                return fake_open_tunnel(*args, **kwargs)
+
+            handshaking.set()
+            handshake_done.wait(5)
+            server = fake_open_tunnel(*args, **kwargs)
+            slow_tunnel_opened.set()
+            return server
+
+        open_tunnel.side_effect = slow_open_tunnel
+
+        def open_slow_tunnel():
+            with self.manager.tunnel(DETAILS, ("slow-db", 5432)):
+                pass
+
+        thread = threading.Thread(target=open_slow_tunnel)
+        thread.start()
+        handshaking.wait(5)
+
+        with self.manager.tunnel(DETAILS, ("db", 5432)):
+            opened_while_handshaking = not slow_tunnel_opened.is_set()
+
+        handshake_done.set()
+        thread.join(5)
+
+        self.assertTrue(opened_while_handshaking)
+        self.assertEqual(len(self.manager._tunnels), 2)
+
+    def test_opens_a_tunnel_per_call_without_idle_timeout(self, open_tunnel):
+        manager = SSHTunnelManager(idle_timeout=0, max_tunnels=2)
+        with manager.tunnel(DETAILS, ("db", 5432)):
+            pass
+        with manager.tunnel(DETAILS, ("db", 5432)):
+            pass
+
+        self.assertEqual(open_tunnel.call_count, 2)
+        for server in fake_open_tunnel.servers:
+            server.stop.assert_called_once_with()
+
+
+class FakeQueryRunner(object):
+    host = "db"
+    port = 5432
+
+    def run_query(self, query, user):
+        return (self.host, self.port), None
+
+    def get_schema(self, get_stats=False):
+        return self.run_query("SELECT 1", None)[0]
+
+    def run_query_stream(self, query, user):
+        # connects when it's called, then fetches rows lazily
+        address = (self.host, self.port)
+        return ResultStream([], iter([[address]]))
+
+
+@patch("redash.query_runner.open_tunnel", side_effect=fake_open_tunnel)
+class TestWithSSHTunnel(TestCase):
+    def setUp(self):
+        fake_open_tunnel.servers = []
+
+    def test_runs_queries_and_schema_through_the_tunnel(self, open_tunnel):
+        manager = SSHTunnelManager(idle_timeout=0, max_tunnels=2)
+        runner = FakeQueryRunner()
+        with patch("redash.query_runner.ssh_tunnels", manager):
+            runner = with_ssh_tunnel(runner, DETAILS)
+
+            self.assertEqual(
+                runner.run_query("SELECT 1", None)[0], ("127.0.0.1", 10000)
+            )
+            self.assertEqual(runner.get_schema(), ("127.0.0.1", 10001))
+
+        # get_schema's queries use the tunnel opened for get_schema
+        self.assertEqual(open_tunnel.call_count, 2)
+        self.assertEqual((runner.host, runner.port), ("db", 5432))
+
+    def test_keeps_the_tunnel_of_a_stream_until_it_is_closed(self, open_tunnel):
+        manager = SSHTunnelManager(idle_timeout=300, max_tunnels=2)
+        with patch("redash.query_runner.ssh_tunnels", manager):
+            runner = with_ssh_tunnel(FakeQueryRunner(), DETAILS)
+            stream = runner.run_query_stream("SELECT 1", None)
+
+        self.assertEqual((runner.host, runner.port), ("db", 5432))
+        (tunnel,) = manager._tunnels.values()
+        self.assertEqual(tunnel["users"], 1)
+
+        self.assertEqual(list(stream.batches), [[("127.0.0.1", 10000)]])
+        self.assertEqual(tunnel["users"], 0)
+
+        stream.close()
+        self.assertEqual(tunnel["users"], 0)
+
+    def test_releases_the_tunnel_of_a_stream_closed_early(self, open_tunnel):
+        manager = SSHTunnelManager(idle_timeout=300, max_tunnels=2)
+        with patch("redash.query_runner.ssh_tunnels", manager):
+            runner = with_ssh_tunnel(FakeQueryRunner(), DETAILS)
+            stream = runner.run_query_stream("SELECT 1", None)
+
+        stream.close()
+
+        (tunnel,) = manager._tunnels.values()
+        self.assertEqual(tunnel["users"], 0)
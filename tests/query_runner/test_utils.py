@@ -6,6 +6,7 @@ from redash.query_runner import (
     TYPE_INTEGER,
     TYPE_BOOLEAN,
     TYPE_STRING,
+    ColumnTypes,
     guess_type,
 )
 
@@ -38,3 +39,58 @@ class TestGuessType(TestCase):
 
     def test_detects_date(self):
         self.assertEqual(guess_type("2018-10-31"), TYPE_DATETIME)
+
+    def test_detects_iso_datetimes(self):
+        self.assertEqual(guess_type("2018-10-31T10:20:30.123Z"), TYPE_DATETIME)
+        self.assertEqual(guess_type("2018-10-31 10:20:30+02:00"), TYPE_DATETIME)
+        self.assertEqual(guess_type("2018-13-31"), TYPE_STRING)
+        self.assertEqual(guess_type("2018-10-31T25:00"), TYPE_STRING)
+
+    def test_detects_numbers_in_other_spellings(self):
+        self.assertEqual(guess_type(" 42 "), TYPE_INTEGER)
+        self.assertEqual(guess_type("1_000"), TYPE_INTEGER)
+        self.assertEqual(guess_type("1e-3"), TYPE_FLOAT)
+        self.assertEqual(guess_type("inf"), TYPE_FLOAT)
+
+
+class TestColumnTypes(TestCase):
+    def test_guesses_type_of_each_column(self):
+        column_types = ColumnTypes(4)
+        column_types.update([(1, 1.5, "2018-10-31", "a"), (2, 2.5, "2018-11-01", "b")])
+
+        self.assertEqual(
+            column_types.types, [TYPE_INTEGER, TYPE_FLOAT, TYPE_DATETIME, TYPE_STRING]
+        )
+
+    def test_columns_with_mixed_types_are_strings(self):
+        column_types = ColumnTypes(3)
+        column_types.update([(1, "42", True)])
+        column_types.update([(1.5, "43", True), (2, "x", None)])
+
+        self.assertEqual(column_types.types, [TYPE_STRING, TYPE_STRING, TYPE_STRING])
+
+    def test_matches_guessing_every_value(self):
+        rows = [
+            (1, "1", None, "true"),
+            (2, "2", "2018-10-31", "False"),
+            (3, "3.5", "2018-10-31", "TRUE"),
+        ]
+        column_types = ColumnTypes(4)
+        for row in rows:
+            column_types.update([row])
+
+        expected = []
+        for values in zip(*rows):
+            guesses = set(guess_type(v) for v in values)
+            expected.append(guesses.pop() if len(guesses) == 1 else TYPE_STRING)
+
+        self.assertEqual(column_types.types, expected)
+        self.assertEqual(ColumnTypes(4).update(rows), expected)
+
+    def test_stops_checking_string_columns(self):
+        column_types = ColumnTypes(1)
+        column_types.update([("a",)])
+
+        column_types.update([(object(),)])
+
+        self.assertEqual(column_types.types, [TYPE_STRING])
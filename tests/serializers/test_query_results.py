@@ -5,8 +5,15 @@ import io
 from tests import BaseTestCase
 
 from redash import models
-from redash.utils import utcnow, json_dumps
-from redash.serializers import serialize_query_result, serialize_query_result_to_dsv
+from mock import patch
+
+from redash.utils import utcnow, json_dumps, json_loads, result_rows
+from redash.serializers import (
+    serialize_query_result,
+    serialize_query_result_to_dsv,
+    serialize_query_result_to_dsv_stream,
+    serialize_query_result_to_json,
+)
 
 
 data = {
@@ -37,6 +44,119 @@ class QueryResultSerializationTest(BaseTestCase):
         self.assertSetEqual(set(["data", "retrieved_at"]), set(serialized.keys()))
 
 
+class JsonSerializationTest(BaseTestCase):
+    def test_splices_stored_result_without_decoding_it(self):
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+
+        with patch("redash.models.json_loads") as json_loads_mock:
+            serialized = serialize_query_result_to_json(query_result)
+            json_loads_mock.assert_not_called()
+
+        expected = json_loads(
+            json_dumps({"query_result": query_result.to_dict()})
+        )
+        self.assertEqual(json_loads(serialized), expected)
+
+    def test_serializes_pages_of_rows(self):
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+
+        serialized = json_loads(serialize_query_result_to_json(query_result, 1, 2))
+
+        self.assertEqual(serialized["query_result"]["data"]["rows"], data["rows"][1:3])
+
+    def test_replaces_nan_in_results_stored_by_older_versions(self):
+        query_result = self.factory.create_query_result(
+            data='{"columns": [], "rows": [{"value": NaN}]}'
+        )
+
+        serialized = serialize_query_result_to_json(query_result)
+
+        self.assertNotIn("NaN", serialized)
+        self.assertEqual(
+            json_loads(serialized)["query_result"]["data"]["rows"], [{"value": None}]
+        )
+
+    def test_replaces_infinity_in_results_stored_by_older_versions(self):
+        query_result = self.factory.create_query_result(
+            data='{"columns": [], "rows": [{"a": -Infinity}, {"a":Infinity}]}'
+        )
+
+        serialized = serialize_query_result_to_json(query_result)
+
+        self.assertNotIn("Infinity", serialized)
+        self.assertEqual(
+            json_loads(serialized)["query_result"]["data"]["rows"],
+            [{"a": None}, {"a": None}],
+        )
+
+    def test_splices_results_with_nan_and_infinity_in_strings(self):
+        query_result = self.factory.create_query_result(
+            data=json_dumps(
+                {"columns": [], "rows": [{"title": "Infinity War", "note": "NaN"}]}
+            )
+        )
+
+        with patch("redash.models.json_loads") as json_loads_mock:
+            serialized = serialize_query_result_to_json(query_result)
+            json_loads_mock.assert_not_called()
+
+        self.assertEqual(
+            json_loads(serialized)["query_result"]["data"]["rows"],
+            [{"title": "Infinity War", "note": "NaN"}],
+        )
+
+
+class ArrayRowsSerializationTest(BaseTestCase):
+    def test_serializes_rows_as_arrays(self):
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+
+        serialized = json_loads(
+            serialize_query_result_to_json(query_result, row_format="arrays")
+        )["query_result"]["data"]
+
+        self.assertEqual(serialized["row_format"], "arrays")
+        self.assertEqual(serialized["columns"], data["columns"])
+        self.assertEqual(serialized["rows"][0], [True, "2019-05-26T12:39:23.026Z", "2019-05-26"])
+
+        page = json_loads(
+            serialize_query_result_to_json(query_result, 1, 1, row_format="arrays")
+        )["query_result"]["data"]
+        self.assertEqual(page["rows"], [[False, "", ""]])
+
+    def test_splices_results_stored_with_array_rows(self):
+        stored = json_dumps(result_rows.convert(data, "arrays"))
+        query_result = self.factory.create_query_result(data=stored)
+
+        with patch("redash.models.json_loads") as json_loads_mock:
+            serialized = serialize_query_result_to_json(query_result, row_format="arrays")
+            json_loads_mock.assert_not_called()
+
+        self.assertEqual(
+            json_loads(serialized)["query_result"]["data"], json_loads(stored)
+        )
+
+    def test_serializes_results_stored_with_array_rows_as_objects(self):
+        stored = json_dumps(result_rows.convert(data, "arrays"))
+        query_result = self.factory.create_query_result(data=stored)
+
+        serialized = json_loads(serialize_query_result_to_json(query_result))
+
+        self.assertEqual(serialized["query_result"]["data"], data)
+
+    def test_exports_results_stored_with_array_rows(self):
+        stored = json_dumps(result_rows.convert(data, "arrays"))
+        query_result = self.factory.create_query_result(data=stored)
+
+        with self.app.test_request_context("/"):
+            rows = list(
+                csv.DictReader(io.StringIO(serialize_query_result_to_dsv(query_result, ",")))
+            )
+
+        self.assertEqual(rows[0]["bool"], "true")
+        self.assertEqual(rows[0]["datetime"], "26/05/19 12:39")
+        self.assertEqual(rows[2]["date"], "")
+
+
 class DsvSerializationTest(BaseTestCase):
     def delimited_content(self, delimiter):
         query_result = self.factory.create_query_result(data=json_dumps(data))
@@ -81,3 +201,29 @@ class DsvSerializationTest(BaseTestCase):
         self.assertEqual(rows[1]["bool"], "false")
         self.assertEqual(rows[2]["date"], "")
         self.assertEqual(rows[3]["datetime"], "459")
+
+    def test_stream_yields_same_content_in_chunks(self):
+        rows = [{"bool": i % 2 == 0, "datetime": None, "date": None, "text": "x" * 100} for i in range(2000)]
+        columns = data["columns"] + [{"friendly_name": "text", "type": "string", "name": "text"}]
+        query_result = self.factory.create_query_result(data=json_dumps({"rows": rows, "columns": columns}))
+
+        with self.app.test_request_context("/"):
+            chunks = list(serialize_query_result_to_dsv_stream(query_result, ","))
+            content = serialize_query_result_to_dsv(query_result, ",")
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), content)
+
+        parsed = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(parsed), 2000)
+        self.assertEqual(parsed[1]["bool"], "false")
+        self.assertEqual(parsed[1]["text"], "x" * 100)
+
+    def test_stream_doesnt_modify_query_result_data(self):
+        query_result = self.factory.create_query_result(data=json_dumps(data))
+        expected_rows = query_result.data["rows"][0].copy()
+
+        with self.app.test_request_context("/"):
+            list(serialize_query_result_to_dsv_stream(query_result, ","))
+
+        self.assertEqual(query_result.data["rows"][0], expected_rows)
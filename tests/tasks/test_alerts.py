@@ -1,13 +1,16 @@
+import datetime
+
 from tests import BaseTestCase
-from mock import MagicMock, ANY
+from mock import MagicMock, ANY, patch
 
 import redash.tasks.alerts
 from redash.tasks.alerts import (
     check_alerts_for_query,
+    deliver_notification,
     notify_subscriptions,
     should_notify,
 )
-from redash.models import Alert
+from redash.models import Alert, AlertSubscription
 
 
 class TestCheckAlertsForQuery(BaseTestCase):
@@ -40,11 +43,31 @@ class TestCheckAlertsForQuery(BaseTestCase):
 
 
 class TestNotifySubscriptions(BaseTestCase):
-    def test_calls_notify_for_subscribers(self):
+    def test_enqueues_a_delivery_per_subscription(self):
         subscription = self.factory.create_alert_subscription()
-        subscription.notify = MagicMock()
-        notify_subscriptions(subscription.alert, Alert.OK_STATE)
-        subscription.notify.assert_called_with(
+        other_subscription = self.factory.create_alert_subscription(
+            alert=subscription.alert, destination=self.factory.create_destination(),
+        )
+
+        with patch("redash.tasks.alerts.deliver_notification") as deliver:
+            notify_subscriptions(subscription.alert, Alert.OK_STATE)
+
+        self.assertEqual(
+            sorted(call[0] for call in deliver.delay.call_args_list),
+            [
+                (subscription.id, Alert.OK_STATE),
+                (other_subscription.id, Alert.OK_STATE),
+            ],
+        )
+
+
+class TestDeliverNotification(BaseTestCase):
+    def test_calls_notify_for_subscriber(self):
+        subscription = self.factory.create_alert_subscription()
+        with patch.object(AlertSubscription, "notify") as notify:
+            deliver_notification(subscription.id, Alert.OK_STATE)
+
+        notify.assert_called_with(
             subscription.alert,
             subscription.alert.query_rel,
             subscription.user,
@@ -52,3 +75,29 @@ class TestNotifySubscriptions(BaseTestCase):
             ANY,
             ANY,
         )
+
+    def test_retries_failed_deliveries_with_backoff(self):
+        subscription = self.factory.create_alert_subscription()
+        with patch.object(
+            AlertSubscription, "notify", side_effect=Exception("timeout")
+        ), patch("redash.tasks.schedule.rq_scheduler.enqueue_in") as enqueue_in:
+            deliver_notification(subscription.id, Alert.OK_STATE, attempt=2)
+
+        enqueue_in.assert_called_once_with(
+            datetime.timedelta(seconds=60),
+            deliver_notification,
+            subscription.id,
+            Alert.OK_STATE,
+            attempt=3,
+            queue_name="default",
+            timeout=ANY,
+        )
+
+    def test_gives_up_after_the_last_retry(self):
+        subscription = self.factory.create_alert_subscription()
+        with patch.object(
+            AlertSubscription, "notify", side_effect=Exception("timeout")
+        ), patch("redash.tasks.schedule.rq_scheduler.enqueue_in") as enqueue_in:
+            deliver_notification(subscription.id, Alert.OK_STATE, attempt=4)
+
+        enqueue_in.assert_not_called()
@@ -0,0 +1,245 @@
+import datetime
+
+from mock import patch
+from sqlalchemy.exc import OperationalError
+
+from tests import BaseTestCase
+from redash import redis_connection
+from redash.models import Event, db
+from redash.tasks import (
+    backfill_event_object_ids,
+    cleanup_events,
+    enqueue_event,
+    flush_events,
+)
+from redash.tasks.general import (
+    EVENTS_BACKFILL_KEY,
+    EVENTS_BUFFER_KEY,
+    EVENTS_FAILED_KEY,
+)
+from redash.utils import json_loads, utcnow
+
+
+class TestFlushEvents(BaseTestCase):
+    def raw_event(self, **kwargs):
+        raw_event = {
+            "action": "view",
+            "object_type": "dashboard",
+            "object_id": 1,
+            "org_id": self.factory.org.id,
+            "user_id": self.factory.user.id,
+            "timestamp": 1411778709,
+        }
+        raw_event.update(kwargs)
+        return raw_event
+
+    def test_records_buffered_events(self):
+        enqueue_event(self.raw_event(action="view"))
+        enqueue_event(self.raw_event(action="edit"))
+
+        flush_events()
+
+        events = Event.query.order_by(Event.id).all()
+        self.assertEqual([e.action for e in events], ["view", "edit"])
+
+    def test_records_events_in_batches(self):
+        for i in range(5):
+            enqueue_event(self.raw_event(object_id=i))
+
+        with patch("redash.settings.EVENTS_FLUSH_BATCH_SIZE", 2), patch.object(
+            Event, "record_many", wraps=Event.record_many
+        ) as record_many:
+            flush_events()
+
+        self.assertEqual(record_many.call_count, 3)
+        self.assertEqual(Event.query.count(), 5)
+
+    def test_keeps_events_when_database_is_unavailable(self):
+        enqueue_event(self.raw_event())
+        error = OperationalError("INSERT", {}, Exception("connection refused"))
+
+        with patch.object(Event, "record_many", side_effect=error):
+            with self.assertRaises(OperationalError):
+                flush_events()
+
+        flush_events()
+        self.assertEqual(Event.query.count(), 1)
+
+    def test_moves_events_that_fail_aside(self):
+        enqueue_event(self.raw_event(action="view"))
+        enqueue_event(self.raw_event(action="edit", user_id=-1))
+        enqueue_event(self.raw_event(action="delete"))
+
+        flush_events()
+        flush_events()
+
+        events = Event.query.order_by(Event.id).all()
+        self.assertEqual([e.action for e in events], ["view", "delete"])
+        self.assertEqual(redis_connection.llen(EVENTS_BUFFER_KEY), 0)
+        failed = [
+            json_loads(e) for e in redis_connection.lrange(EVENTS_FAILED_KEY, 0, -1)
+        ]
+        self.assertEqual([e["action"] for e in failed], ["edit"])
+
+    def test_forwards_events_to_webhooks(self):
+        enqueue_event(self.raw_event())
+        enqueue_event(self.raw_event())
+
+        with patch(
+            "redash.settings.EVENT_REPORTING_WEBHOOKS", ["https://example.com/hook"]
+        ), patch("redash.tasks.general.requests_session.post") as post:
+            flush_events()
+
+        self.assertEqual(post.call_count, 2)
+
+
+class TestCleanupEvents(BaseTestCase):
+    def create_event(self, days_ago):
+        event = Event(
+            org=self.factory.org,
+            action="view",
+            object_type="query",
+            created_at=utcnow() - datetime.timedelta(days=days_ago),
+        )
+        db.session.add(event)
+        return event
+
+    def test_keeps_events_without_retention(self):
+        self.create_event(days_ago=1000)
+
+        cleanup_events()
+
+        self.assertEqual(Event.query.count(), 1)
+
+    def test_deletes_events_older_than_retention(self):
+        self.create_event(days_ago=100)
+        new_event = self.create_event(days_ago=10)
+        db.session.flush()
+        new_event_id = new_event.id
+
+        with patch("redash.settings.EVENTS_RETENTION_DAYS", 90):
+            cleanup_events()
+
+        self.assertEqual([e.id for e in Event.query], [new_event_id])
+
+    def partition_events_table(self):
+        """Partitions the events table the way the partition_events_by_month migration does."""
+        if db.engine.dialect.server_version_info < (11,):
+            self.skipTest("Partitioning requires PostgreSQL 11 or later.")
+
+        statements = [
+            "ALTER TABLE events RENAME TO events_legacy",
+            """CREATE TABLE events (LIKE events_legacy INCLUDING DEFAULTS)
+               PARTITION BY RANGE (created_at)""",
+            "ALTER SEQUENCE events_id_seq OWNED BY events.id",
+            """ALTER TABLE events ATTACH PARTITION events_legacy
+               FOR VALUES FROM (MINVALUE) TO (date_trunc('month', now()) + interval '1 month')""",
+            "CREATE TABLE events_default PARTITION OF events DEFAULT",
+        ]
+        for statement in statements:
+            db.session.execute(statement)
+        db.session.commit()
+
+    def partition_names(self):
+        return [name for name, end in Event.partitions()]
+
+    def months_from_now(self, months):
+        now = utcnow().replace(day=1)
+        return now + datetime.timedelta(days=32 * months)
+
+    def test_creates_partitions_of_coming_months(self):
+        self.partition_events_table()
+
+        cleanup_events()
+        # the partitions exist already
+        cleanup_events()
+
+        self.assertEqual(
+            self.partition_names(),
+            [
+                "events_legacy",
+                "events_{:%Y_%m}".format(self.months_from_now(1)),
+                "events_{:%Y_%m}".format(self.months_from_now(2)),
+            ],
+        )
+
+    def test_creates_partition_of_current_month_after_legacy_partition(self):
+        self.partition_events_table()
+        later = self.months_from_now(1)
+
+        with patch("redash.utils.utcnow", return_value=later):
+            cleanup_events()
+
+        self.assertIn("events_{:%Y_%m}".format(later), self.partition_names())
+        self.assertEqual(len(self.partition_names()), 4)
+
+    def test_drops_old_partitions(self):
+        self.partition_events_table()
+        cleanup_events()
+        self.create_event(days_ago=0)
+        db.session.commit()
+
+        later = self.months_from_now(6)
+        with patch("redash.settings.EVENTS_RETENTION_DAYS", 90), patch(
+            "redash.utils.utcnow", return_value=later
+        ):
+            cleanup_events()
+
+        self.assertEqual(
+            self.partition_names(),
+            [
+                "events_{:%Y_%m}".format(self.months_from_now(months))
+                for months in range(6, 9)
+            ],
+        )
+        self.assertEqual(Event.query.count(), 0)
+
+
+class TestBackfillEventObjectIds(BaseTestCase):
+    def create_event(self, object_id):
+        event = Event(
+            org=self.factory.org,
+            action="view",
+            object_type="query",
+            object_id=object_id,
+        )
+        db.session.add(event)
+        db.session.flush()
+        # as recorded before the column was added
+        db.session.execute(
+            "UPDATE events SET numeric_object_id = NULL WHERE id = :id",
+            {"id": event.id},
+        )
+        return event
+
+    def numeric_object_ids(self):
+        return [
+            numeric_object_id
+            for (numeric_object_id,) in db.session.query(
+                Event.numeric_object_id
+            ).order_by(Event.id)
+        ]
+
+    def test_backfills_newest_events_first_in_batches(self):
+        for object_id in ["1", "2", "3", "4", "abc"]:
+            self.create_event(object_id)
+        db.session.commit()
+
+        with patch("redash.tasks.general.EVENTS_BACKFILL_BATCH_SIZE", 2), patch(
+            "redash.tasks.general.EVENTS_BACKFILL_MAX_BATCHES", 2
+        ):
+            backfill_event_object_ids()
+            self.assertEqual(self.numeric_object_ids(), [None, 2, 3, 4, None])
+
+            backfill_event_object_ids()
+            self.assertEqual(self.numeric_object_ids(), [1, 2, 3, 4, None])
+
+        self.assertEqual(redis_connection.hget(EVENTS_BACKFILL_KEY, "done"), "1")
+        with patch.object(Event, "backfill_numeric_object_ids") as backfill:
+            backfill_event_object_ids()
+            backfill.assert_not_called()
+
+    def test_finishes_without_events(self):
+        backfill_event_object_ids()
+
+        self.assertEqual(redis_connection.hget(EVENTS_BACKFILL_KEY, "done"), "1")
@@ -8,14 +8,20 @@ from rq.exceptions import NoSuchJobError
 
 from tests import BaseTestCase
 from redash import redis_connection, rq_redis_connection, models
-from redash.utils import json_dumps
+from redash.utils import gen_query_hash, json_dumps
+from redash.utils.configuration import ConfigurationContainer
+from redash.query_runner import ResultStream, SSHTunnelManager
 from redash.query_runner.pg import PostgreSQL
 from redash.tasks.queries.execution import (
     QueryExecutionError,
+    _job_lock_id,
+    QueryRunnerCache,
     enqueue_query,
+    enqueue_queries,
     execute_query,
 )
 from redash.tasks import Job
+from redash.tasks.worker import Queue
 
 
 def fetch_job(*args, **kwargs):
@@ -177,7 +183,125 @@ class TestEnqueueTask(BaseTestCase):
         self.assertEqual(3, enqueue.call_count)
 
 
+class TestEnqueueQueries(BaseTestCase):
+    def enqueue_request(self, query, query_text=None):
+        return {
+            "query": query_text or query.query_text,
+            "data_source": query.data_source,
+            "user_id": query.user_id,
+            "scheduled_query": query,
+            "metadata": {"Username": "Scheduled", "Query ID": query.id},
+        }
+
+    def test_creates_a_job_per_query(self):
+        query = self.factory.create_query()
+
+        with Connection(rq_redis_connection):
+            jobs = enqueue_queries(
+                [self.enqueue_request(query), self.enqueue_request(query, "SELECT 2")]
+            )
+
+            self.assertEqual(len(set(job.id for job in jobs)), 2)
+            for job in jobs:
+                fetched = Job.fetch(job.id)
+                self.assertEqual(fetched.get_status(), "queued")
+                self.assertEqual(fetched.origin, query.data_source.scheduled_queue_name)
+                self.assertEqual(fetched.kwargs["scheduled_query_id"], query.id)
+
+    def test_deduplicates_queries(self):
+        query = self.factory.create_query()
+        query2 = self.factory.create_query(query_text=query.query_text)
+
+        with Connection(rq_redis_connection):
+            jobs = enqueue_queries(
+                [self.enqueue_request(query), self.enqueue_request(query2)]
+            )
+
+        self.assertEqual(jobs[0].id, jobs[1].id)
+
+    def test_reuses_pending_jobs(self):
+        query = self.factory.create_query()
+
+        with Connection(rq_redis_connection):
+            job = enqueue_query(
+                query.query_text, query.data_source, query.user_id, False, query, {}
+            )
+            jobs = enqueue_queries([self.enqueue_request(query)])
+
+        self.assertEqual(jobs[0].id, job.id)
+
+    def test_replaces_finished_and_expired_jobs(self):
+        query = self.factory.create_query()
+        query2 = self.factory.create_query(query_text="SELECT 2")
+
+        with Connection(rq_redis_connection):
+            finished, expired = enqueue_queries(
+                [self.enqueue_request(query), self.enqueue_request(query2)]
+            )
+            finished.set_status("finished")
+            expired.delete()
+
+            jobs = enqueue_queries(
+                [self.enqueue_request(query), self.enqueue_request(query2)]
+            )
+
+        self.assertNotEqual(jobs[0].id, finished.id)
+        self.assertNotEqual(jobs[1].id, expired.id)
+
+    def test_enqueues_jobs_once_when_locks_change(self):
+        query = self.factory.create_query()
+        lock_id = _job_lock_id(gen_query_hash(query.query_text), query.data_source.id)
+        fetch_many = Job.fetch_many
+        fetched = []
+
+        def change_lock(job_ids, connection):
+            # another process takes the lock during the first attempt
+            if not fetched:
+                redis_connection.set(lock_id, "another-job")
+            fetched.append(job_ids)
+            return fetch_many(job_ids, connection=connection)
+
+        with Connection(rq_redis_connection), patch.object(
+            Job, "fetch_many", side_effect=change_lock
+        ):
+            jobs = enqueue_queries(
+                [self.enqueue_request(query), self.enqueue_request(query, "SELECT 2")]
+            )
+            queue = Queue(query.data_source.scheduled_queue_name)
+
+            self.assertEqual(len(fetched), 2)
+            self.assertEqual(sorted(queue.job_ids), sorted(job.id for job in jobs))
+
+    @patch("redash.settings.dynamic_settings.query_time_limit", return_value=60)
+    def test_limits_query_time(self, _):
+        query = self.factory.create_query()
+
+        with Connection(rq_redis_connection):
+            (job,) = enqueue_queries([self.enqueue_request(query)])
+
+            self.assertEqual(Job.fetch(job.id).timeout, 60)
+
+
+class TestQueryRunnerCache(BaseTestCase):
+    def test_reuses_runners(self):
+        cache = QueryRunnerCache()
+        data_source = self.factory.data_source
+
+        self.assertIs(cache.get(data_source), cache.get(data_source))
+
+    def test_rebuilds_runners_of_changed_data_sources(self):
+        cache = QueryRunnerCache()
+        data_source = self.factory.data_source
+        runner = cache.get(data_source)
+
+        data_source.options["dbname"] = "other"
+
+        self.assertIsNot(cache.get(data_source), runner)
+        self.assertEqual(cache.get(data_source).configuration["dbname"], "other")
+
+
 @patch("redash.tasks.queries.execution.get_current_job", side_effect=fetch_job)
+@patch.object(PostgreSQL, "streams_results", False)
 class QueryExecutorTests(BaseTestCase):
     def test_success(self, _):
         """
@@ -191,6 +315,19 @@ class QueryExecutorTests(BaseTestCase):
             result = models.QueryResult.query.get(result_id)
             self.assertEqual(result.data, query_result_data)
 
+    def test_truncates_results_over_the_limits(self, _):
+        with patch.object(PostgreSQL, "run_query") as qr, patch.object(
+            PostgreSQL, "limits_results", False
+        ), patch(
+            "redash.settings.dynamic_settings.query_result_limits", return_value=(2, 0)
+        ):
+            query_result_data = {"columns": [], "rows": [{"a": 1}, {"a": 2}, {"a": 3}]}
+            qr.return_value = (json_dumps(query_result_data), None)
+            result_id = execute_query("SELECT 1, 2", self.factory.data_source.id, {})
+            result = models.QueryResult.query.get(result_id)
+            self.assertEqual(result.data["rows"], [{"a": 1}, {"a": 2}])
+            self.assertTrue(result.data["metadata"]["truncated"])
+
     def test_success_scheduled(self, _):
         """
         Scheduled queries remember their latest results.
@@ -255,3 +392,46 @@ class QueryExecutorTests(BaseTestCase):
             )
             q = models.Query.get_by_id(q.id)
             self.assertEqual(q.schedule_failures, 0)
+
+
+@patch("redash.tasks.queries.execution.get_current_job", side_effect=fetch_job)
+class QueryExecutorStreamingTests(BaseTestCase):
+    @patch("redash.query_runner.open_tunnel")
+    def test_streams_results_of_tunneled_data_sources_through_the_tunnel(
+        self, open_tunnel, _
+    ):
+        server = open_tunnel.return_value
+        server.local_bind_address = ("127.0.0.1", 10000)
+        options = {
+            "dbname": "test",
+            "host": "db",
+            "port": 5432,
+            "ssh_tunnel": {"ssh_host": "bastion", "ssh_username": "redash"},
+        }
+        data_source = self.factory.create_data_source(
+            options=ConfigurationContainer.from_json(json_dumps(options))
+        )
+        connected_to = []
+
+        def run_query_stream(runner, query, user):
+            connected_to.append((runner.host, runner.port))
+
+            def batches():
+                # rows are fetched through the tunnel
+                server.stop.assert_not_called()
+                yield [(1,)]
+
+            return ResultStream([{"name": "a", "type": None}], batches())
+
+        with patch.object(
+            PostgreSQL, "run_query_stream", autospec=True, side_effect=run_query_stream
+        ), patch(
+            "redash.query_runner.ssh_tunnels",
+            SSHTunnelManager(idle_timeout=0, max_tunnels=1),
+        ):
+            result_id = execute_query("SELECT 1", data_source.id, {})
+
+        self.assertEqual(connected_to, [("127.0.0.1", 10000)])
+        server.stop.assert_called_once_with()
+        result = models.QueryResult.query.get(result_id)
+        self.assertEqual(result.data["rows"], [{"a": 1}])
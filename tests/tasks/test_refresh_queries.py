@@ -1,9 +1,19 @@
-from mock import patch, call, ANY
+from mock import patch, ANY
 from tests import BaseTestCase
 from redash.tasks.queries.maintenance import refresh_queries
 from redash.models import Query
 
-ENQUEUE_QUERY = "redash.tasks.queries.maintenance.enqueue_query"
+ENQUEUE_QUERIES = "redash.tasks.queries.maintenance.enqueue_queries"
+
+
+def enqueue_request(query, query_text=None):
+    return {
+        "query": query_text or query.query_text,
+        "data_source": query.data_source,
+        "user_id": query.user_id,
+        "scheduled_query": query,
+        "metadata": ANY,
+    }
 
 
 class TestRefreshQuery(BaseTestCase):
@@ -17,29 +27,12 @@ class TestRefreshQuery(BaseTestCase):
             query_text="select 42;", data_source=self.factory.create_data_source()
         )
         oq = staticmethod(lambda: [query1, query2])
-        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+        with patch(ENQUEUE_QUERIES) as add_job_mock, patch.object(
             Query, "outdated_queries", oq
         ):
             refresh_queries()
-            self.assertEqual(add_job_mock.call_count, 2)
-            add_job_mock.assert_has_calls(
-                [
-                    call(
-                        query1.query_text,
-                        query1.data_source,
-                        query1.user_id,
-                        scheduled_query=query1,
-                        metadata=ANY,
-                    ),
-                    call(
-                        query2.query_text,
-                        query2.data_source,
-                        query2.user_id,
-                        scheduled_query=query2,
-                        metadata=ANY,
-                    ),
-                ],
-                any_order=True,
+            add_job_mock.assert_called_once_with(
+                [enqueue_request(query1), enqueue_request(query2)]
             )
 
     def test_doesnt_enqueue_outdated_queries_for_paused_data_source(self):
@@ -51,21 +44,15 @@ class TestRefreshQuery(BaseTestCase):
         oq = staticmethod(lambda: [query])
         query.data_source.pause()
         with patch.object(Query, "outdated_queries", oq):
-            with patch(ENQUEUE_QUERY) as add_job_mock:
+            with patch(ENQUEUE_QUERIES) as add_job_mock:
                 refresh_queries()
-                add_job_mock.assert_not_called()
+                add_job_mock.assert_called_once_with([])
 
             query.data_source.resume()
 
-            with patch(ENQUEUE_QUERY) as add_job_mock:
+            with patch(ENQUEUE_QUERIES) as add_job_mock:
                 refresh_queries()
-                add_job_mock.assert_called_with(
-                    query.query_text,
-                    query.data_source,
-                    query.user_id,
-                    scheduled_query=query,
-                    metadata=ANY,
-                )
+                add_job_mock.assert_called_with([enqueue_request(query)])
 
     def test_enqueues_parameterized_queries(self):
         """
@@ -86,17 +73,11 @@ class TestRefreshQuery(BaseTestCase):
             },
         )
         oq = staticmethod(lambda: [query])
-        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+        with patch(ENQUEUE_QUERIES) as add_job_mock, patch.object(
             Query, "outdated_queries", oq
         ):
             refresh_queries()
-            add_job_mock.assert_called_with(
-                "select 42",
-                query.data_source,
-                query.user_id,
-                scheduled_query=query,
-                metadata=ANY,
-            )
+            add_job_mock.assert_called_with([enqueue_request(query, "select 42")])
 
     def test_doesnt_enqueue_parameterized_queries_with_invalid_parameters(self):
         """
@@ -117,11 +98,11 @@ class TestRefreshQuery(BaseTestCase):
             },
         )
         oq = staticmethod(lambda: [query])
-        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+        with patch(ENQUEUE_QUERIES) as add_job_mock, patch.object(
             Query, "outdated_queries", oq
         ):
             refresh_queries()
-            add_job_mock.assert_not_called()
+            add_job_mock.assert_called_once_with([])
 
     def test_doesnt_enqueue_parameterized_queries_with_dropdown_queries_that_are_detached_from_data_source(
         self
@@ -147,8 +128,8 @@ class TestRefreshQuery(BaseTestCase):
         dropdown_query = self.factory.create_query(id=100, data_source=None)
 
         oq = staticmethod(lambda: [query])
-        with patch(ENQUEUE_QUERY) as add_job_mock, patch.object(
+        with patch(ENQUEUE_QUERIES) as add_job_mock, patch.object(
             Query, "outdated_queries", oq
         ):
             refresh_queries()
-            add_job_mock.assert_not_called()
+            add_job_mock.assert_called_once_with([])
@@ -1,11 +1,15 @@
+import signal
+import time
+
 from mock import patch, call
 from rq import Connection
 from rq.job import JobStatus
-from redash.tasks import Worker
+from redash.tasks import NonForkingWorker, Worker
 
 from tests import BaseTestCase
 from redash import rq_redis_connection
-from redash.tasks.worker import Queue
+from redash.tasks.worker import Queue, query_concurrency_limits
+from redash.tasks.queries import execution
 from redash.tasks.queries.execution import (
     enqueue_query,
 )
@@ -100,3 +104,129 @@ class TestQueueMetrics(BaseTestCase):
 
         foo.delay()
         incr.assert_called_with("rq.jobs.created.default")
+
+
+class TestQueryConcurrencyLimits(BaseTestCase):
+    def tearDown(self):
+        with Connection(rq_redis_connection):
+            for queue_name in default_queues:
+                Queue(queue_name).empty()
+        super().tearDown()
+
+    def enqueue(self, query):
+        return enqueue_query(
+            query.query_text,
+            query.data_source,
+            query.user_id,
+            False,
+            None,
+            {"Username": "Patrick", "Query ID": query.id},
+        )
+
+    @patch(
+        "redash.settings.dynamic_settings.query_concurrency_limits",
+        return_value=(1, 0),
+    )
+    def test_limits_running_jobs_per_data_source(self, _):
+        query = self.factory.create_query()
+        query2 = self.factory.create_query(query_text="SELECT 2")
+
+        with Connection(rq_redis_connection):
+            job = self.enqueue(query)
+            job2 = self.enqueue(query2)
+
+            self.assertTrue(query_concurrency_limits.acquire(job))
+            self.assertTrue(query_concurrency_limits.acquire(job))
+            self.assertFalse(query_concurrency_limits.acquire(job2))
+
+            query_concurrency_limits.release(job)
+            self.assertTrue(query_concurrency_limits.acquire(job2))
+
+    @patch(
+        "redash.settings.dynamic_settings.query_concurrency_limits",
+        return_value=(0, 1),
+    )
+    def test_limits_running_jobs_per_org(self, _):
+        query = self.factory.create_query()
+        query2 = self.factory.create_query(
+            query_text="SELECT 2", data_source=self.factory.create_data_source()
+        )
+
+        with Connection(rq_redis_connection):
+            job = self.enqueue(query)
+            job2 = self.enqueue(query2)
+
+            self.assertTrue(query_concurrency_limits.acquire(job))
+            self.assertFalse(query_concurrency_limits.acquire(job2))
+
+    @patch(
+        "redash.settings.dynamic_settings.query_concurrency_limits",
+        return_value=(1, 0),
+    )
+    def test_expired_slots_are_released(self, _):
+        query = self.factory.create_query()
+        query2 = self.factory.create_query(query_text="SELECT 2")
+
+        with Connection(rq_redis_connection):
+            job = self.enqueue(query)
+            job2 = self.enqueue(query2)
+
+            with patch("time.time", return_value=time.time() - 3600 * 24):
+                self.assertTrue(query_concurrency_limits.acquire(job))
+            self.assertTrue(query_concurrency_limits.acquire(job2))
+
+    @patch("rq.Worker.execute_job")
+    @patch(
+        "redash.settings.dynamic_settings.query_concurrency_limits",
+        return_value=(1, 0),
+    )
+    def test_worker_defers_jobs_over_the_limit(self, _, execute_job):
+        busy_query = self.factory.create_query()
+        query = self.factory.create_query(query_text="SELECT 2")
+        other_query = self.factory.create_query(
+            query_text="SELECT 3", data_source=self.factory.create_data_source()
+        )
+
+        with Connection(rq_redis_connection):
+            busy_job = self.enqueue(busy_query)
+            job = self.enqueue(query)
+            other_job = self.enqueue(other_query)
+            Queue("queries").remove(busy_job)
+            query_concurrency_limits.acquire(busy_job)
+
+            Worker(["queries"]).work(max_jobs=1)
+
+            executed_job, _ = execute_job.call_args[0]
+            self.assertEqual(executed_job.id, other_job.id)
+            self.assertEqual(Queue("queries").job_ids, [job.id])
+
+
+class TestNonForkingWorker(BaseTestCase):
+    def tearDown(self):
+        with Connection(rq_redis_connection):
+            for queue_name in default_queues:
+                Queue(queue_name).empty()
+        super().tearDown()
+
+    def test_executes_jobs_in_process(self):
+        query = self.factory.create_query()
+        sigint_handler = signal.getsignal(signal.SIGINT)
+        self.addCleanup(signal.signal, signal.SIGINT, sigint_handler)
+
+        with Connection(rq_redis_connection), patch("os.fork") as fork:
+            job = enqueue_query(
+                query.query_text,
+                query.data_source,
+                query.user_id,
+                False,
+                None,
+                {"Username": "Patrick", "Query ID": query.id},
+            )
+
+            NonForkingWorker(["queries"]).work(max_jobs=1)
+
+            fork.assert_not_called()
+            self.assertEqual(job.get_status(), JobStatus.FINISHED)
+
+        # the handler installed while executing the query doesn't outlive the job
+        self.assertNotEqual(signal.getsignal(signal.SIGINT), execution.signal_handler)
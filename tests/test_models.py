@@ -4,6 +4,7 @@ from unittest import TestCase
 
 import pytz
 from dateutil.parser import parse as date_parse
+from mock import patch
 from tests import BaseTestCase
 
 from redash import models, redis_connection
@@ -291,6 +292,7 @@ class QueryOutdatedQueriesTest(BaseTestCase):
         self.assertEqual(list(models.Query.outdated_queries()), [])
 
         self.fake_previous_execution(query, minutes=17)
+        db.session.commit()
         self.assertEqual(list(models.Query.outdated_queries()), [query])
 
     def test_schedule_until_after(self):
@@ -334,6 +336,115 @@ class QueryOutdatedQueriesTest(BaseTestCase):
         queries = models.Query.outdated_queries()
         self.assertNotIn(query, queries)
 
+    def test_skips_queries_that_are_not_due(self):
+        query = self.create_scheduled_query(interval="3600")
+        self.fake_previous_execution(query, minutes=30)
+        models.Query.outdated_queries()
+
+        next_run_at = redis_connection.zscore(
+            models.ScheduledQueriesIndex.KEY_NAME, query.id
+        )
+        expected = query.latest_query_data.retrieved_at + datetime.timedelta(hours=1)
+        self.assertAlmostEqual(next_run_at, expected.timestamp(), places=3)
+        self.assertNotIn(query.id, models.scheduled_queries_index.due(utcnow()))
+
+    def test_reevaluates_executed_queries(self):
+        query = self.create_scheduled_query(interval="3600")
+        self.fake_previous_execution(query, minutes=30)
+        models.Query.outdated_queries()
+
+        models.scheduled_queries_executions.update(query.id)
+
+        self.assertIn(query.id, models.scheduled_queries_index.due(utcnow()))
+
+    def test_removes_unscheduled_queries_from_index(self):
+        query = self.create_scheduled_query(interval="60")
+        self.fake_previous_execution(query, minutes=10)
+        self.assertEqual(models.Query.outdated_queries(), [query])
+
+        query.schedule = None
+        db.session.commit()
+        self.assertEqual(models.Query.outdated_queries(), [])
+        self.assertIsNone(
+            redis_connection.zscore(models.ScheduledQueriesIndex.KEY_NAME, query.id)
+        )
+
+    def test_reevaluates_queries_once_changes_commit(self):
+        query = self.create_scheduled_query(interval="3600")
+        self.fake_previous_execution(query, minutes=30)
+        db.session.commit()
+        self.assertEqual(models.Query.outdated_queries(), [])
+
+        query.schedule = self.schedule(interval="60")
+        db.session.flush()
+        self.assertNotIn(query.id, models.scheduled_queries_index.due(utcnow()))
+
+        db.session.commit()
+        self.assertEqual(models.Query.outdated_queries(), [query])
+
+    def test_adds_queries_missing_from_index(self):
+        query = self.create_scheduled_query(interval="60")
+        self.fake_previous_execution(query, minutes=10)
+        db.session.flush()
+        redis_connection.delete(
+            models.ScheduledQueriesIndex.KEY_NAME,
+            models.ScheduledQueriesIndex.INVALIDATED_KEY_NAME,
+        )
+
+        self.assertEqual(models.Query.outdated_queries(), [query])
+
+    def test_matches_full_evaluation_over_time(self):
+        """
+        The queries reported by Query.outdated_queries() are exactly the ones
+        should_schedule_next() reports when evaluating every scheduled query.
+        """
+        start = utcnow()
+        queries = []
+        for i, (schedule, age, failures) in enumerate(
+            [
+                (self.schedule(interval="60"), dict(minutes=5), 0),
+                (self.schedule(interval="600"), dict(minutes=5), 0),
+                (self.schedule(interval="3600"), dict(minutes=50), 0),
+                (self.schedule(interval="3600"), dict(minutes=50), 3),
+                (self.schedule(interval="300"), None, 0),
+                (self.schedule(interval="86400", time=start.strftime("%H:%M")), dict(hours=20), 0),
+                (self.schedule(interval="86400", time="00:00"), dict(hours=30), 0),
+                (self.schedule(interval="604800", time="12:00", day_of_week="Monday"), dict(days=3), 0),
+                (self.schedule(interval="60", disabled=True), dict(minutes=5), 0),
+            ]
+        ):
+            query = self.factory.create_query(
+                query_text="SELECT {}".format(i),
+                schedule=schedule,
+                schedule_failures=failures,
+            )
+            if age:
+                self.fake_previous_execution(query, **age)
+            queries.append(query)
+        db.session.flush()
+
+        def expected(now):
+            return [
+                query
+                for query in queries
+                if not query.schedule.get("disabled")
+                and query.latest_query_data
+                and models.should_schedule_next(
+                    query.latest_query_data.retrieved_at,
+                    now,
+                    query.schedule["interval"],
+                    query.schedule["time"],
+                    query.schedule["day_of_week"],
+                    query.schedule_failures,
+                )
+            ]
+
+        for minutes in [0, 1, 5, 30, 45, 61, 180, 60 * 24, 60 * 24 * 8]:
+            now = start + datetime.timedelta(minutes=minutes)
+            with patch("redash.utils.utcnow", return_value=now):
+                outdated = models.Query.outdated_queries()
+            self.assertEqual(outdated, expected(now), "after {} minutes".format(minutes))
+
 
 class QueryArchiveTest(BaseTestCase):
     def test_archive_query_sets_flag(self):
@@ -364,6 +475,7 @@ class QueryArchiveTest(BaseTestCase):
         self.assertIn(query, models.Query.outdated_queries())
         db.session.flush()
         query.archive()
+        db.session.commit()
 
         self.assertNotIn(query, list(models.Query.all_queries([g.id for g in groups])))
         self.assertNotIn(query, models.Query.outdated_queries())
@@ -559,6 +671,29 @@ class TestEvents(BaseTestCase):
 
         self.assertDictEqual(event.additional_properties, additional_properties)
 
+    def test_records_numeric_object_ids(self):
+        raw_event, _, _ = self.raw_event()
+
+        event = models.Event.record(raw_event)
+        self.assertEqual(event.numeric_object_id, 1)
+
+        event = models.Event(object_id="not a number")
+        self.assertIsNone(event.numeric_object_id)
+
+    def test_records_many_events(self):
+        raw_event, user, created_at = self.raw_event()
+        other_event = dict(raw_event, action="edit", object_id="abc", test=1)
+
+        models.Event.record_many([raw_event, other_event])
+
+        events = models.Event.query.order_by(models.Event.id).all()
+        self.assertEqual([e.action for e in events], ["view", "edit"])
+        self.assertEqual([e.object_id for e in events], ["1", "abc"])
+        self.assertEqual([e.numeric_object_id for e in events], [1, None])
+        self.assertEqual(events[0].user, user)
+        self.assertEqual(events[0].created_at, created_at)
+        self.assertDictEqual(events[1].additional_properties, {"test": 1})
+
 
 def _set_up_dashboard_test(d):
     d.g1 = d.factory.create_group(name="First", permissions=["create", "view"])
@@ -1,7 +1,9 @@
 from tests import BaseTestCase
 from collections import namedtuple
 from unittest import TestCase
-from redash.permissions import has_access
+from flask import g
+from mock import Mock, call, patch
+from redash.permissions import DataSourcePermissionsCache, has_access
 from redash import models
 
 
@@ -71,3 +73,83 @@ class TestHasAccess(BaseTestCase):
         user = models.ApiUser(api_key, None, [])
 
         self.assertTrue(has_access(query, user, view_only))
+
+
+class TestDataSourcePermissionsCache(BaseTestCase):
+    def test_loads_data_sources_once_per_request(self):
+        cache = DataSourcePermissionsCache(ttl=0)
+        load = Mock(side_effect=lambda ids: {i: {1: view_only} for i in ids})
+
+        with self.app.test_request_context("/"):
+            self.assertEqual(cache.get_many([1, 2], load), {1: {1: True}, 2: {1: True}})
+            self.assertEqual(cache.get_many([2, 3], load), {2: {1: True}, 3: {1: True}})
+
+            load.assert_has_calls([call([1, 2]), call([3])])
+            self.assertEqual(g.permission_cache_hits, 1)
+            self.assertEqual(g.permission_cache_misses, 3)
+
+        with self.app.test_request_context("/"):
+            cache.reset_request_cache()
+            cache.get_many([1], load)
+
+        self.assertEqual(load.call_count, 3)
+
+    def test_doesnt_cache_outside_of_requests_without_ttl(self):
+        cache = DataSourcePermissionsCache(ttl=0)
+        load = Mock(return_value={1: {}})
+
+        cache.get_many([1], load)
+        cache.get_many([1], load)
+
+        self.assertEqual(load.call_count, 2)
+
+    def test_caches_across_requests_until_ttl_expires(self):
+        cache = DataSourcePermissionsCache(ttl=60)
+        load = Mock(return_value={1: {}})
+
+        with patch("time.time", return_value=0):
+            cache.get_many([1], load)
+        with patch("time.time", return_value=59):
+            cache.get_many([1], load)
+        self.assertEqual(load.call_count, 1)
+
+        with patch("time.time", return_value=61):
+            cache.get_many([1], load)
+        self.assertEqual(load.call_count, 2)
+
+    def test_returns_copies_of_cached_groups(self):
+        cache = DataSourcePermissionsCache(ttl=60)
+        load = Mock(return_value={1: {1: view_only}})
+
+        cache.get_many([1], load)[1][2] = view_only
+
+        self.assertEqual(cache.get_many([1], load), {1: {1: view_only}})
+
+    def test_invalidated_when_data_source_groups_change(self):
+        data_source = self.factory.create_data_source()
+        group = self.factory.create_group()
+
+        with self.app.test_request_context("/"):
+            self.assertEqual(data_source.groups, {})
+
+            data_source.add_group(group, view_only=True)
+            self.assertEqual(data_source.groups, {group.id: True})
+
+            data_source.update_group_permission(group, False)
+            self.assertEqual(data_source.groups, {group.id: False})
+
+            data_source.remove_group(group)
+            self.assertEqual(data_source.groups, {})
+
+    def test_invalidated_again_once_changes_commit(self):
+        data_source = self.factory.create_data_source()
+        group = self.factory.create_group()
+        cache = models.data_source_permissions
+
+        with patch.object(cache, "ttl", 60):
+            data_source.add_group(group, view_only=True)
+            # another request caches the groups before the change commits
+            cache.get_many([data_source.id], lambda ids: {data_source.id: {}})
+            models.db.session.commit()
+
+            self.assertEqual(data_source.groups, {group.id: True})
@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from redash.utils import columnar, json_dumps, json_loads
+
+
+class TestColumnarEncoding(TestCase):
+    def assertRoundTrips(self, data):
+        # go through JSON first, like results returned by query runners
+        data = json_loads(json_dumps(data))
+        encoded = columnar.encode(data)
+
+        self.assertTrue(columnar.is_encoded(encoded))
+        self.assertEqual(columnar.decode(encoded), data)
+
+    def test_empty_result(self):
+        self.assertRoundTrips({"columns": [], "rows": []})
+
+    def test_typed_columns(self):
+        self.assertRoundTrips(
+            {
+                "columns": [{"name": "i"}, {"name": "f"}, {"name": "s"}, {"name": "b"}],
+                "rows": [
+                    {
+                        "i": i,
+                        "f": i / 3.0,
+                        "s": "value {}".format(i % 4),
+                        "b": i % 2 == 0,
+                    }
+                    for i in range(100)
+                ],
+            }
+        )
+
+    def test_mixed_and_nested_values(self):
+        self.assertRoundTrips(
+            {
+                "columns": [{"name": "v"}],
+                "rows": [
+                    {"v": 1},
+                    {"v": "1"},
+                    {"v": None},
+                    {"v": [1, {"a": 2}]},
+                    {"v": 2 ** 80},
+                ],
+            }
+        )
+
+    def test_missing_and_extra_keys(self):
+        self.assertRoundTrips(
+            {
+                "columns": [{"name": "a"}],
+                "rows": [{"a": 1}, {"b": "x"}, {}, {"a": 2, "b": None}],
+                "metadata": {"data_scanned": 10},
+            }
+        )
+
+    def test_rows_without_keys(self):
+        self.assertRoundTrips({"columns": [], "rows": [{}, {}]})
+
+    def test_reader_gives_access_to_columns(self):
+        data = {"columns": [{"name": "a"}], "rows": [{"a": 1}, {"a": 2}]}
+        reader = columnar.ColumnarReader(columnar.encode(data))
+
+        self.assertEqual(reader.columns, data["columns"])
+        self.assertEqual(reader.row_count, 2)
+        self.assertEqual(list(reader.iter_rows()), data["rows"])
+
+    def test_reader_slices_rows(self):
+        data = {
+            "columns": [{"name": "a"}, {"name": "b"}],
+            "rows": [{"a": i, "b": "x" * (i % 3), "c": [i]} for i in range(10)],
+        }
+        data = json_loads(json_dumps(data))
+        reader = columnar.ColumnarReader(columnar.encode(data))
+
+        self.assertEqual(reader.rows_slice(3, 4), data["rows"][3:7])
+        self.assertEqual(reader.rows_slice(8, 5), data["rows"][8:])
+        self.assertEqual(reader.rows_slice(20, 5), [])
+        self.assertEqual(reader.rows_slice(7), data["rows"][7:])
+
+    def test_only_encodes_row_documents(self):
+        self.assertTrue(columnar.can_encode({"rows": [{"a": 1}]}))
+        self.assertFalse(columnar.can_encode({"rows": [[1]]}))
+        self.assertFalse(columnar.can_encode({"test": 1}))
+        self.assertFalse(columnar.can_encode(None))
+
+    def test_dictionary_encodes_repeating_strings(self):
+        rows = [{"country": "US" if i % 2 else "IL"} for i in range(1000)]
+        encoded = columnar.encode({"columns": [], "rows": rows})
+
+        self.assertLess(len(encoded), len(json_dumps(rows)) / 10)
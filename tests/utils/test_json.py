@@ -0,0 +1,100 @@
+import datetime
+import decimal
+import uuid
+from unittest import TestCase, skipIf
+
+import pytz
+import simplejson
+from mock import patch
+
+from redash import utils
+from redash.utils import JSONEncoder, json_dumps, json_loads
+
+VALUES = [
+    {"columns": [{"name": "a", "type": "integer"}], "rows": [{"a": 1}, {"a": None}]},
+    {"nested": {"list": [1, 2.5, "three", True, None], "unicode": "שלום"}},
+    {1: "integer key", None: "null key", 2.5: "float key"},
+    (1, 2, 3),
+    decimal.Decimal("1.10"),
+    decimal.Decimal("12345678.90123"),
+    decimal.Decimal("12345678901234567890.123456789"),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, 123456, tzinfo=pytz.utc),
+    datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=pytz.timezone("US/Eastern")),
+    datetime.datetime(2020, 1, 2, 3, 4, 5),
+    datetime.date(2020, 1, 2),
+    datetime.time(1, 2, 3, 456789),
+    datetime.timedelta(days=1, seconds=5),
+    uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    b"\x00\xff",
+    memoryview(b"test"),
+    float("nan"),
+    float("inf"),
+    -float("inf"),
+    1e-7,
+    2 ** 70,
+    "\ud800",
+]
+
+
+class CustomEncoder(JSONEncoder):
+    def default(self, o):
+        if isinstance(o, set):
+            return sorted(o)
+        return super(CustomEncoder, self).default(o)
+
+
+@skipIf(utils.orjson is None, "orjson is not installed")
+class TestOrjsonBackend(TestCase):
+    def dumps(self, backend, value, **kwargs):
+        with patch.object(utils, "JSON_BACKEND", backend):
+            return json_dumps(value, **kwargs)
+
+    def assertConforms(self, value, **kwargs):
+        expected = self.dumps("simplejson", value, **kwargs)
+        actual = self.dumps("orjson", value, **kwargs)
+        # the formatting differs (separators, escaping), the documents don't
+        self.assertEqual(simplejson.loads(actual), simplejson.loads(expected), value)
+
+    def test_encodes_like_simplejson(self):
+        for value in VALUES:
+            self.assertConforms(value)
+
+    def test_formats_dates_like_simplejson(self):
+        for value in VALUES:
+            if isinstance(value, (datetime.date, datetime.time)):
+                self.assertEqual(
+                    self.dumps("orjson", value), self.dumps("simplejson", value)
+                )
+
+    def test_writes_decimals_exactly(self):
+        for value in VALUES:
+            if isinstance(value, decimal.Decimal):
+                self.assertEqual(
+                    self.dumps("orjson", value), self.dumps("simplejson", value)
+                )
+
+        self.assertEqual(
+            self.dumps("orjson", {"a": [decimal.Decimal("12345678901234567890.5")]}),
+            '{"a":[12345678901234567890.5]}',
+        )
+
+    def test_uses_custom_encoders(self):
+        self.assertConforms({"set": {3, 1, 2}}, cls=CustomEncoder)
+
+    def test_sorts_keys(self):
+        self.assertEqual(
+            self.dumps("orjson", {"b": 1, "a": 2}, sort_keys=True), '{"a":2,"b":1}'
+        )
+
+    def test_uses_simplejson_for_other_options(self):
+        self.assertEqual(self.dumps("orjson", {"a": 1}, indent=2), '{\n  "a": 1\n}')
+
+    def test_raises_for_unsupported_values(self):
+        with self.assertRaises(TypeError):
+            self.dumps("orjson", {"value": object()})
+
+    def test_decodes_like_simplejson(self):
+        with patch.object(utils, "JSON_BACKEND", "orjson"):
+            for value in VALUES:
+                text = self.dumps("simplejson", value)
+                self.assertEqual(json_loads(text), simplejson.loads(text))
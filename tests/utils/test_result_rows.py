@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from redash.utils import json_dumps, result_rows
+
+COLUMNS = [{"name": "id", "type": "integer"}, {"name": "name", "type": "string"}]
+
+
+class TestResultRows(TestCase):
+    def test_tells_format_of_stored_results(self):
+        arrays = json_dumps({"row_format": "arrays", "columns": [], "rows": []})
+
+        self.assertEqual(result_rows.stored_row_format(arrays), "arrays")
+        self.assertEqual(
+            result_rows.stored_row_format('{"row_format":"arrays"}'), "arrays"
+        )
+        self.assertEqual(result_rows.stored_row_format('{"columns": []}'), "objects")
+        self.assertEqual(result_rows.stored_row_format(""), "objects")
+
+    def test_converts_between_formats(self):
+        objects = {
+            "columns": COLUMNS,
+            "rows": [{"id": 1, "name": "a"}, {"id": 2}],
+            "metadata": {"truncated": True},
+        }
+
+        arrays = result_rows.convert(objects, "arrays")
+        self.assertEqual(
+            json_dumps(arrays),
+            json_dumps(
+                {
+                    "row_format": "arrays",
+                    "columns": COLUMNS,
+                    "rows": [[1, "a"], [2, None]],
+                    "metadata": {"truncated": True},
+                }
+            ),
+        )
+
+        self.assertEqual(
+            result_rows.convert(arrays, "objects")["rows"],
+            [{"id": 1, "name": "a"}, {"id": 2, "name": None}],
+        )
+
+    def test_leaves_documents_in_target_format_as_is(self):
+        objects = {"columns": COLUMNS, "rows": []}
+
+        self.assertIs(result_rows.convert(objects, "objects"), objects)
+        self.assertIs(result_rows.convert(None, "arrays"), None)
+        self.assertEqual(result_rows.convert({"test": 1}, "arrays"), {"test": 1})